@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.surge.SurgeProtectionMiddleware',
+    'api.replica.ReplicaRoutingMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,13 +81,47 @@ WSGI_APPLICATION = 'BantayAyuda.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Tuned SQLite connection profile, applied on every connection:
+# - WAL: readers keep reading while a writer commits
+# - synchronous=NORMAL: with WAL, only an OS crash (not an app crash) can lose the last commits
+# - mmap_size / cache_size (negative = KiB): fewer read syscalls on the map and list queries
+# - busy_timeout: wait up to 20s for a lock instead of failing with "database is locked"
+# - IMMEDIATE transactions take the write lock at BEGIN, so two writers can't deadlock
+#   upgrading read locks (which busy_timeout can't resolve)
+SQLITE_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA cache_size=-65536;'
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
     }
 }
 
+# Read replica for read-only endpoints (api.replica.PrimaryReplicaRouter). Set
+# BANTAYAYUDA_REPLICA_DB to a second SQLite file and keep it current with
+# `python manage.py sync_replica --interval 5`. Unset, everything reads from the primary.
+if os.environ.get('BANTAYAYUDA_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BANTAYAYUDA_REPLICA_DB'],
+        'OPTIONS': SQLITE_OPTIONS,
+        # Tests read and write one database
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.replica.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,16 +159,132 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Dashboard scripts (static/js) and images
+STATICFILES_DIRS = [BASE_DIR / 'static']
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Uploaded hazard-mapping rasters (flood depth grids) are kept here
+FLOOD_RASTER_ROOT = BASE_DIR / 'media' / 'flood_rasters'
+
+# Damage heatmap: tile zoom levels with a precomputed grid, and cells per tile side
+HEATMAP_ZOOM_LEVELS = (0, 2, 4, 6, 8, 10, 12, 14)
+HEATMAP_TILE_BINS = 32
+
+# Map change feed (/api/households/geojson/changes/)
+CHANGE_FEED_OVERLAP_SECONDS = 2  # cursors lag behind "now" so in-flight commits are not skipped
+CHANGE_FEED_MAX_CHANGES = 5000  # beyond this the client is told to reload the full GeoJSON
+CHANGE_FEED_TOMBSTONE_RETENTION_DAYS = 30
+
+# Live assessment events (/api/disasters/{id}/events/). Use 'api.events.RedisBroker'
+# with ASSESSMENT_EVENT_REDIS_URL when running more than one ASGI worker.
+ASSESSMENT_EVENT_BROKER = 'api.events.LocalBroker'
+ASSESSMENT_EVENT_QUEUE_SIZE = 100  # per subscriber; slow clients lose the oldest events and get a resync
+ASSESSMENT_EVENT_HEARTBEAT_SECONDS = 15
+
+# Offline assessor sync (/api/assessments/sync/)
+SYNC_MAX_BATCH_SIZE = 10000
+SYNC_MAX_SERVER_CHANGES = 5000  # beyond this the device is told to re-download
+
+# Payout manifest export: rows fetched from the database per round trip
+MANIFEST_CHUNK_SIZE = 2000
+
+# Columnar analytics snapshots: 'auto' writes Arrow IPC when pyarrow is installed, else .npz
+SNAPSHOT_ROOT = BASE_DIR / 'media' / 'snapshots'
+SNAPSHOT_FORMAT = 'auto'
+SNAPSHOT_JOB_TIMEOUT_SECONDS = 3600  # a build still pending after this is assumed lost and restarted
+
+# In-process columnar store of households and assessments (api/store.py)
+STORE_REFRESH_INTERVAL_SECONDS = 2  # reads within this window of the last check skip the database
+STORE_MEMORY_BUDGET_MB = 512  # least-recently-used disasters are evicted beyond this
+
+# Response compression (api.middleware.CompressionMiddleware): brotli if installed, else gzip
+COMPRESSION_MIN_BYTES = 200
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Surge protection (api.surge.SurgeProtectionMiddleware), by URL name.
+# Concurrent identical GETs to these views share one computation:
+COALESCED_VIEWS = [
+    'household-geojson', 'async-household-geojson', 'household-geojson-changes', 'disaster-summary',
+]
+# At most `concurrency` requests per view and process; `queue` more wait up to
+# ADMISSION_QUEUE_TIMEOUT_SECONDS, the rest get 503 with Retry-After.
+ADMISSION_LIMITS = {
+    'household-geojson': {'concurrency': 4, 'queue': 32},
+    'async-household-geojson': {'concurrency': 4, 'queue': 32},
+    'assessment-predict': {'concurrency': 2, 'queue': 8},
+    'generate-sms': {'concurrency': 8, 'queue': 32},
+    'async-generate-sms': {'concurrency': 32, 'queue': 128},
+}
+ADMISSION_QUEUE_TIMEOUT_SECONDS = 2
+ADMISSION_RETRY_AFTER_SECONDS = 5
+
+# Views whose GET/HEAD requests read from the replica (by URL name), and how long a client
+# that just wrote keeps reading from the primary
+REPLICA_READ_VIEWS = [
+    'household-list', 'household-geojson', 'async-household-geojson', 'household-geojson-changes',
+    'household-history', 'household-bulk-history',
+    'disaster-list', 'disaster-summary', 'disaster-heatmap-tile', 'disaster-manifest',
+    'assessment-list', 'async-assessment-list',
+]
+REPLICA_PIN_SECONDS = 10
+
+# Archive of closed disasters (api/archive.py): rows per compressed batch and zlib level
+ARCHIVE_BATCH_ROWS = 5000
+ARCHIVE_COMPRESSION_LEVEL = 6
+
+# Near-duplicate households (api/dedup.py): pairs closer than the radius that score at least
+# DEDUP_MIN_SCORE (0.6 name + 0.3 address similarity + 0.1 proximity) are flagged for review.
+# Creating a household that matches one returns 409 unless ?force=true.
+DEDUP_RADIUS_METERS = 30
+DEDUP_MIN_SCORE = 0.8
+DEDUP_CHECK_ON_CREATE = True
+
+# Admin changelists on large tables (api/admin.py): filtered counts stop at this many rows,
+# unfiltered ones use the database's row estimate; bulk actions work in batches of this size
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_BULK_BATCH_SIZE = 5000
+
+# Outbound SMS (api/sms.py). Each provider names a SmsProvider class plus its options; the
+# sender never exceeds rate_per_second (bursts up to `burst`) and sends batch_size per request.
+# Delivery receipts (/api/sms/receipts/{provider}/) are only accepted with the provider's
+# receipt_token in the X-Receipt-Token header.
+# 'stub' is the local gateway from `python manage.py sms_gateway_stub`.
+SMS_PROVIDERS = {
+    'stub': {
+        'class': 'api.sms.HttpGatewayProvider',
+        'url': 'http://127.0.0.1:8025',
+        'receipt_token': os.environ.get('BANTAYAYUDA_SMS_STUB_RECEIPT_TOKEN', 'stub-receipt-token'),
+        'rate_per_second': 200,
+        'burst': 200,
+        'batch_size': 100,
+    },
+}
+SMS_DEFAULT_PROVIDER = 'stub'
+SMS_MAX_ATTEMPTS = 5  # then the message is dead-lettered
+SMS_RETRY_BASE_SECONDS = 2  # doubled per attempt, with jitter
+SMS_RETRY_MAX_SECONDS = 300
+SMS_SENDING_LEASE_SECONDS = 120  # a batch still SENDING after this is assumed lost and resent
+
+# SQLite write-lock acquisitions slower than this count as contended (api/dblocks.py, /api/db-locks/)
+DB_LOCK_WAIT_THRESHOLD_MS = 50
+
+# Bulk ECT prediction (/api/assessments/predict/)
+BULK_PREDICT_MAX_ROWS = 10000
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100
 }
@@ -145,3 +299,5 @@ CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 
 # Gemini API Configuration
 GEMINI_API_KEY = ''  # Set this in environment variable or local settings
+# generateContent endpoint; point it at `python manage.py llm_stub` for load tests
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent'
@@ -21,5 +21,6 @@ from django.views.generic import TemplateView
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('benchmark/map/', TemplateView.as_view(template_name='map_benchmark.html'), name='map-benchmark'),
     path('', TemplateView.as_view(template_name='index.html'), name='index'),
 ]
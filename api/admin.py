@@ -1,12 +1,157 @@
-from django.contrib import admin
-from .models import Household, DisasterEvent, DamageAssessment
+import itertools
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .bulk import bulk_update_rows, db_now, restamp
+from .events import get_broker
+from .heatmap import rebuild_heatmap
+from .manifest import csv_lines
+from .models import Household, DisasterEvent, DamageAssessment, DuplicateHouseholdCandidate, SmsMessage
+
+
+# --- LARGE TABLES ---
+
+
+def estimated_row_count(model):
+    """
+    Cheap row estimate: planner statistics on PostgreSQL; ANALYZE statistics, else the
+    highest rowid, on SQLite. None where neither is available.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] > 0 else None
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+            except Exception:
+                row = None  # no ANALYZE yet
+            if row:
+                return int(row[0].split()[0])
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0]
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator that never counts a whole large table: the unfiltered list uses
+    estimated_row_count(), and filtered counts stop at ADMIN_EXACT_COUNT_LIMIT + 1.
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return self.object_list.order_by()[:limit + 1].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skips the extra unfiltered COUNT(*) the changelist runs for "N of M selected"
+    show_full_result_count = False
+
+
+# --- BULK ACTIONS ---
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+@admin.action(description='Recompute ECT with the allocation model')
+def recompute_ect(modeladmin, request, queryset):
+    """
+    Runs the model over the selection in batches (one predict call per batch), writes the
+    changed amounts with one executemany per batch, then rebuilds each heatmap once.
+    """
+    from .views import predict_ect_amounts
+
+    batch_size = getattr(settings, 'ADMIN_BULK_BATCH_SIZE', 5000)
+    started = timezone.now()
+    now = db_now(started)
+    rows = queryset.order_by('pk').select_related('household').only(
+        'disaster_id', 'damage_status', 'flood_depth_meters', 'recommended_ect_amount',
+        'household__barangay', 'household__latitude', 'household__longitude',
+        'household__house_height_meters', 'household__house_width_meters', 'household__is_4ps_recipient',
+    )
+    checked, disasters, updates_total = 0, set(), 0
+    with transaction.atomic():
+        for batch in _batches(rows.iterator(chunk_size=batch_size), batch_size):
+            changed = [
+                (assessment, amount) for assessment, amount in zip(batch, predict_ect_amounts(batch))
+                if assessment.recommended_ect_amount != amount
+            ]
+            bulk_update_rows(DamageAssessment, ['recommended_ect_amount', 'updated_at'],
+                             [(amount, now, assessment.pk) for assessment, amount in changed])
+            disasters.update(assessment.disaster_id for assessment, _ in changed)
+            checked += len(batch)
+            updates_total += len(changed)
+        # Last, so the change feed sees the rows even when the batches take longer than its overlap
+        restamp(DamageAssessment.objects.filter(disaster_id__in=disasters), started)
+
+    # The raw writes skip the model signals, so refresh derived data per disaster
+    for disaster_id in disasters:
+        rebuild_heatmap(disaster_id)
+        get_broker().publish(disaster_id, {'type': 'bulk_update'})
+    modeladmin.message_user(
+        request, f'Recomputed ECT for {checked:,} assessments; {updates_total:,} amounts changed.', messages.SUCCESS
+    )
+
+
+@admin.action(description='Mark selected assessments as reviewed')
+def mark_reviewed(modeladmin, request, queryset):
+    now = timezone.now()
+    # One UPDATE; updated_at moves so map clients and offline devices pick the change up
+    updated = queryset.filter(is_reviewed=False).update(is_reviewed=True, reviewed_at=now, updated_at=now)
+    modeladmin.message_user(request, f'Marked {updated:,} assessments as reviewed.', messages.SUCCESS)
+
+
+EXPORT_HEADER = (
+    'assessment_id', 'household_id', 'name', 'barangay', 'disaster', 'damage_status',
+    'flood_depth_meters', 'ect_amount', 'is_reviewed', 'assessed_at',
+)
+
+
+@admin.action(description='Export selected assessments as CSV')
+def export_selected(modeladmin, request, queryset):
+    """
+    Streams the selection as CSV, read in chunks with values_list().iterator(); text
+    cells a spreadsheet would run as formulas are escaped, as in the payout manifest.
+    """
+    rows = queryset.order_by('pk').values_list(
+        'pk', 'household_id', 'household__name', 'household__barangay', 'disaster__name', 'damage_status',
+        'flood_depth_meters', 'recommended_ect_amount', 'is_reviewed', 'assessed_at',
+    ).iterator(chunk_size=getattr(settings, 'MANIFEST_CHUNK_SIZE', 2000))
+    response = StreamingHttpResponse(csv_lines(itertools.chain([EXPORT_HEADER], rows)), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="assessments.csv"'
+    return response
+
+
+# --- MODEL ADMINS ---
 
 
 @admin.register(Household)
-class HouseholdAdmin(admin.ModelAdmin):
+class HouseholdAdmin(LargeTableAdmin):
     list_display = ['name', 'barangay', 'address', 'contact_number', 'created_at']
     list_filter = ['barangay', 'created_at']
     search_fields = ['name', 'address', 'barangay', 'contact_number']
+    # Maintained by api.history
+    readonly_fields = ['assessment_count', 'partial_damage_count', 'total_damage_count']
 
 
 @admin.register(DisasterEvent)
@@ -14,11 +159,47 @@ class DisasterEventAdmin(admin.ModelAdmin):
     list_display = ['name', 'date_occurred', 'is_active', 'created_at']
     list_filter = ['is_active', 'date_occurred']
     search_fields = ['name', 'description']
+    # Set by archive_disaster / restore only
+    readonly_fields = ['archived_at']
 
 
 @admin.register(DamageAssessment)
-class DamageAssessmentAdmin(admin.ModelAdmin):
-    list_display = ['household', 'disaster', 'damage_status', 'recommended_ect_amount', 'assessed_at']
-    list_filter = ['damage_status', 'disaster', 'assessed_at']
+class DamageAssessmentAdmin(LargeTableAdmin):
+    list_display = ['household', 'disaster', 'damage_status', 'recommended_ect_amount', 'is_reviewed', 'assessed_at']
+    # The household / disaster columns (and __str__) read both relations
+    list_select_related = ['household', 'disaster']
+    list_filter = ['damage_status', 'risk_tier', 'is_reviewed', 'disaster', 'assessed_at']
     search_fields = ['household__name', 'household__barangay', 'disaster__name']
-    readonly_fields = ['recommended_ect_amount']
+    # A select box would list every household on the change form
+    raw_id_fields = ['household']
+    readonly_fields = ['recommended_ect_amount', 'flood_height_ratio', 'risk_tier', 'is_reviewed', 'reviewed_at']
+    actions = [recompute_ect, mark_reviewed, export_selected]
+
+
+@admin.register(DuplicateHouseholdCandidate)
+class DuplicateHouseholdCandidateAdmin(admin.ModelAdmin):
+    list_display = ['household', 'duplicate', 'score', 'distance_meters', 'status', 'detected_at']
+    list_select_related = ['household', 'duplicate']
+    list_filter = ['status']
+    search_fields = ['household__name', 'duplicate__name']
+    raw_id_fields = ['household', 'duplicate']
+    readonly_fields = ['distance_meters', 'name_similarity', 'address_similarity', 'score', 'detected_at']
+
+
+@admin.action(description='Requeue selected messages now')
+def requeue_sms(modeladmin, request, queryset):
+    """Gives dead-lettered or undelivered messages a fresh set of attempts."""
+    updated = queryset.filter(status__in=[SmsMessage.Status.DEAD, SmsMessage.Status.UNDELIVERED]).update(
+        status=SmsMessage.Status.QUEUED, attempts=0, next_attempt_at=timezone.now(), last_error='',
+    )
+    modeladmin.message_user(request, f'Requeued {updated:,} messages.', messages.SUCCESS)
+
+
+@admin.register(SmsMessage)
+class SmsMessageAdmin(LargeTableAdmin):
+    list_display = ['phone_number', 'campaign', 'provider', 'status', 'attempts', 'created_at', 'delivered_at']
+    list_filter = ['status', 'provider', 'campaign']
+    search_fields = ['phone_number', 'provider_message_id']
+    raw_id_fields = ['assessment']
+    readonly_fields = ['attempts', 'provider_message_id', 'last_error', 'sent_at', 'delivered_at']
+    actions = [requeue_sms]
@@ -0,0 +1,315 @@
+"""
+Archive of closed disasters' assessments.
+
+Assessments of every past typhoon used to stay in DamageAssessment, so each index
+and each scan of active data grew with history. archive_disaster() moves a closed
+(is_active=False) disaster's assessments into ArchivedAssessmentBatch rows: JSON
+batches of ARCHIVE_BATCH_ROWS rows, zlib-compressed, in household order so each
+batch records the household_id range it covers. restore_disaster() moves them back
+unchanged, except that updated_at becomes the restore time; rows of households
+deleted since archiving are left out, as deleting the household would have done.
+
+Both run as raw SQL inside one transaction, so no per-row model signals fire:
+- heatmap cells are left alone, so an archived disaster's tiles still render
+- archiving records tombstones, so map clients and every process's columnar
+  store drop the rows; restoring bumps updated_at, so they pick them up again
+
+Archived rows stay readable through archived_assessments(); given household ids,
+it only decompresses the batches whose range covers one of them. The paginated
+?include_archived=true listing uses ArchivedAssessmentPages, which decompresses
+only the batches a page overlaps.
+"""
+import json
+import time
+import zlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bulk import bulk_insert_rows, db_now
+from .models import Household, DisasterEvent, DamageAssessment, ArchivedAssessmentBatch, MapFeatureTombstone
+from .risk import refresh_risk
+
+
+# Above this many household ids, batches are picked by the ids' overall range instead of one by one
+HOUSEHOLD_RANGE_LOOKUPS = 100
+
+
+class ArchiveError(ValueError):
+    """Raised when a disaster cannot be archived or restored in its current state."""
+
+
+def _archived_fields():
+    """Every stored DamageAssessment column except disaster_id, which the batch records."""
+    return [field for field in DamageAssessment._meta.concrete_fields if field.attname != 'disaster_id']
+
+
+def _encode(field, value):
+    if value is None:
+        return None
+    if isinstance(field, models.DecimalField):
+        return str(value)
+    if isinstance(field, models.DateTimeField):
+        # isoformat keeps microseconds, which the change feed compares on
+        return value.isoformat()
+    return value
+
+
+def _decode(field, value):
+    if value is None:
+        return None
+    if isinstance(field, models.DecimalField):
+        return Decimal(value)
+    if isinstance(field, models.DateTimeField):
+        return parse_datetime(value)
+    return value
+
+
+def _pack(names, rows):
+    raw = json.dumps({'fields': names, 'rows': rows}, separators=(',', ':')).encode()
+    return zlib.compress(raw, getattr(settings, 'ARCHIVE_COMPRESSION_LEVEL', 6)), len(raw)
+
+
+def _unpack(batch):
+    data = json.loads(zlib.decompress(bytes(batch.payload)))
+    return data['fields'], data['rows']
+
+
+def _detach_references(disaster):
+    """Applies on_delete for rows pointing at the assessments, as a normal delete would."""
+    assessments = DamageAssessment.objects.filter(disaster=disaster)
+    for relation in DamageAssessment._meta.related_objects:
+        related = relation.related_model._default_manager.filter(**{f'{relation.field.name}__in': assessments})
+        if relation.on_delete is models.SET_NULL:
+            related.update(**{relation.field.name: None})
+        elif relation.on_delete is models.CASCADE:
+            related.delete()
+        else:
+            raise ArchiveError(f'{relation.related_model.__name__} rows still reference these assessments')
+
+
+def archive_disaster(disaster):
+    """Moves a closed disaster's assessments into compressed archive batches; returns a report."""
+    if disaster.is_active:
+        raise ArchiveError('Only closed disasters (is_active=False) can be archived')
+    if disaster.archived_at is not None:
+        raise ArchiveError('Disaster is already archived')
+
+    started = time.perf_counter()
+    fields = _archived_fields()
+    names = [field.attname for field in fields]
+    batch_rows = getattr(settings, 'ARCHIVE_BATCH_ROWS', 5000)
+    report = {'rows': 0, 'batches': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+
+    household_column = names.index('household_id')
+
+    def flush(rows):
+        payload, raw_bytes = _pack(names, rows)
+        ArchivedAssessmentBatch.objects.create(
+            disaster=disaster, sequence=report['batches'], row_count=len(rows),
+            min_household_id=rows[0][household_column], max_household_id=rows[-1][household_column],
+            raw_bytes=raw_bytes, payload=payload,
+        )
+        report['rows'] += len(rows)
+        report['batches'] += 1
+        report['raw_bytes'] += raw_bytes
+        report['compressed_bytes'] += len(payload)
+
+    with transaction.atomic():
+        rows = []
+        values = DamageAssessment.objects.filter(disaster=disaster).order_by('household_id').values_list(*names)
+        for row in values.iterator(chunk_size=batch_rows):
+            rows.append([_encode(field, value) for field, value in zip(fields, row)])
+            if len(rows) == batch_rows:
+                flush(rows)
+                rows = []
+        if rows:
+            flush(rows)
+
+        _detach_references(disaster)
+        now = timezone.now()
+        qn = connection.ops.quote_name
+        assessment_table = qn(DamageAssessment._meta.db_table)
+        disaster_column = qn(DamageAssessment._meta.get_field('disaster').column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (%s, %s, %s) SELECT %s, %%s, %%s FROM %s WHERE %s = %%s' % (
+                    qn(MapFeatureTombstone._meta.db_table),
+                    qn('household_id'), qn(MapFeatureTombstone._meta.get_field('disaster').column), qn('deleted_at'),
+                    qn(DamageAssessment._meta.get_field('household').column), assessment_table, disaster_column,
+                ),
+                [disaster.pk, db_now(now), disaster.pk],
+            )
+            cursor.execute('DELETE FROM %s WHERE %s = %%s' % (assessment_table, disaster_column), [disaster.pk])
+        DisasterEvent.objects.filter(pk=disaster.pk).update(archived_at=now)
+        disaster.archived_at = now
+
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+
+def _iter_batch_rows(batches, household_ids=None):
+    """(batch, {field name: decoded value}) for every archived row, batch by batch; optionally of some households only."""
+    fields_by_name = {field.attname: field for field in _archived_fields()}
+    for batch in batches.iterator(chunk_size=20):
+        names, rows = _unpack(batch)
+        fields = [fields_by_name.get(name) for name in names]
+        if household_ids is not None:
+            household_column = names.index('household_id')
+            rows = [row for row in rows if row[household_column] in household_ids]
+        for row in rows:
+            # Columns dropped from the model since the archive was written are ignored
+            yield batch, {
+                name: _decode(field, value) for name, field, value in zip(names, fields, row) if field is not None
+            }
+
+
+def restore_disaster(disaster):
+    """
+    Moves an archived disaster's assessments back into DamageAssessment. Returns a
+    report with the rows restored and the rows skipped because their household was
+    deleted since archiving.
+    """
+    if disaster.archived_at is None:
+        raise ArchiveError('Disaster is not archived')
+    if DamageAssessment.objects.filter(disaster=disaster).exists():
+        raise ArchiveError('Disaster has new assessments since it was archived; resolve them before restoring')
+
+    fields = _archived_fields()
+    names = [field.attname for field in fields] + ['disaster_id']
+    batches = ArchivedAssessmentBatch.objects.filter(disaster=disaster)
+    now = timezone.now()
+    report = {'rows': 0, 'skipped': 0}
+
+    def rows():
+        current = household_ids = None
+        for batch, values in _iter_batch_rows(batches):
+            if batch is not current:
+                current = batch
+                household_ids = set(Household.objects.filter(
+                    pk__range=(batch.min_household_id, batch.max_household_id)
+                ).values_list('pk', flat=True))
+            if values['household_id'] not in household_ids:
+                report['skipped'] += 1
+                continue
+            values['updated_at'] = now
+            report['rows'] += 1
+            # Columns added to the model after archiving get their defaults
+            yield [
+                field.get_db_prep_save(values[field.attname] if field.attname in values else field.get_default(),
+                                       connection)
+                for field in fields
+            ] + [disaster.pk]
+
+    with transaction.atomic():
+        bulk_insert_rows(DamageAssessment, names, rows())
+        # Older archives lack the risk columns, and house heights may have changed since
+        refresh_risk(DamageAssessment.objects.filter(disaster=disaster))
+        ArchivedAssessmentBatch.objects.filter(disaster=disaster).delete()
+        DisasterEvent.objects.filter(pk=disaster.pk).update(archived_at=None)
+        disaster.archived_at = None
+    return report
+
+
+def archived_assessments(disaster_ids=None, household_ids=None, with_related=True):
+    """
+    Archived assessments as unsaved DamageAssessment instances, in archive order.
+    With with_related, household and disaster are attached (rows whose household
+    was deleted since archiving are skipped).
+    """
+    batches = ArchivedAssessmentBatch.objects.order_by('disaster_id', 'sequence')
+    if disaster_ids is not None:
+        batches = batches.filter(disaster_id__in=disaster_ids)
+    if household_ids is not None:
+        household_ids = set(household_ids)
+        if not household_ids:
+            return []
+        if len(household_ids) <= HOUSEHOLD_RANGE_LOOKUPS:
+            covering = models.Q()
+            for household_id in household_ids:
+                covering |= models.Q(min_household_id__lte=household_id, max_household_id__gte=household_id)
+            batches = batches.filter(covering)
+        else:
+            batches = batches.filter(min_household_id__lte=max(household_ids), max_household_id__gte=min(household_ids))
+
+    assessments = [
+        DamageAssessment(disaster_id=batch.disaster_id, **values)
+        for batch, values in _iter_batch_rows(batches, household_ids)
+    ]
+    if not with_related:
+        return assessments
+    households = _attach_related(assessments)
+    return [assessment for assessment in assessments if assessment.household_id in households]
+
+
+def _attach_related(assessments):
+    """Sets household and disaster on archived assessments, except households deleted since; returns the households."""
+    households = Household.objects.in_bulk({assessment.household_id for assessment in assessments})
+    disasters = DisasterEvent.objects.in_bulk({assessment.disaster_id for assessment in assessments})
+    for assessment in assessments:
+        if assessment.household_id in households:
+            assessment.household = households[assessment.household_id]
+        assessment.disaster = disasters[assessment.disaster_id]
+    return households
+
+
+class ArchivedAssessmentPages:
+    """
+    Archived assessments of some disasters (every disaster without disaster_ids), in
+    archive order, as a sequence the API paginates: len() adds up the batches'
+    row_count and a slice decompresses only the batches it overlaps. Household and
+    disaster are attached; rows whose household was deleted since archiving keep
+    their place, with only the household_id.
+    """
+
+    def __init__(self, disaster_ids=None):
+        self.batches = ArchivedAssessmentBatch.objects.order_by('disaster_id', 'sequence')
+        if disaster_ids is not None:
+            self.batches = self.batches.filter(disaster_id__in=disaster_ids)
+
+    def __len__(self):
+        return self.batches.aggregate(rows=models.Sum('row_count'))['rows'] or 0
+
+    def __getitem__(self, page):
+        start, stop = page.start or 0, page.stop
+        overlapping, skip, offset = [], 0, 0
+        for batch_id, row_count in self.batches.values_list('pk', 'row_count').iterator():
+            if offset >= stop:
+                break
+            if offset + row_count > start:
+                if not overlapping:
+                    skip = start - offset
+                overlapping.append(batch_id)
+            offset += row_count
+        if not overlapping or stop <= start:
+            return []
+        assessments = [
+            DamageAssessment(disaster_id=batch.disaster_id, **values)
+            for batch, values in _iter_batch_rows(self.batches.filter(pk__in=overlapping))
+        ]
+        assessments = assessments[skip:skip + stop - start]
+        _attach_related(assessments)
+        return assessments
+
+
+def table_size_bytes(model):
+    """Bytes used by a model's table and its indexes, or None where the database can't tell."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                # dbstat counts pages in use, so rows freed by archiving drop out right away
+                cursor.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)',
+                    [table],
+                )
+            except Exception:
+                return None
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+        else:
+            return None
+        return cursor.fetchone()[0]
@@ -0,0 +1,202 @@
+"""
+Async versions of the busiest endpoints, served under /api/async/ when running on ASGI.
+
+Under BantayAyuda/asgi.py the sync views each occupy a worker thread for the
+whole request, including the Gemini round trip. These views await the database
+through Django's async ORM and the LLM call through an async HTTP client, so one
+worker can hold many slow requests at once.
+
+The async HTTP client is httpx when installed. Without it the existing
+`requests` call runs in a thread via asyncio.to_thread.
+"""
+import asyncio
+import json
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .changes import current_cursor, encode_cursor
+from .columnar import columnar_feed
+from .models import Household, DisasterEvent, DamageAssessment
+from .renderers import FastJsonResponse
+from .serializers import DamageAssessmentSerializer
+from .store import get_store
+from .archive import archived_assessments
+from .views import (
+    GEMINI_API_URL, GEMINI_TIMEOUT_SECONDS, RISK_PARAMS, HotAndArchivedRows, _query_flag, _risk_query, archived_rows,
+    household_feature,
+)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+_http_client = None
+
+
+def _get_http_client():
+    """One pooled httpx client per process, so connections to the LLM are reused."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=GEMINI_TIMEOUT_SECONDS)
+    return _http_client
+
+
+async def _post_json(url, payload):
+    """POSTs JSON and returns (status code, response text)."""
+    if httpx is not None:
+        response = await _get_http_client().post(url, json=payload)
+        return response.status_code, response.text
+    response = await asyncio.to_thread(requests.post, url, json=payload, timeout=GEMINI_TIMEOUT_SECONDS)
+    return response.status_code, response.text
+
+
+@require_GET
+async def geojson(request):
+    """
+    Async /api/async/households/geojson/?disaster_id=1 (same response as the sync endpoint).
+    Reads the disaster's assessments in one query instead of one per household.
+    ?format=columnar is served from the columnar store, like the sync endpoint.
+    """
+    disaster_id = request.GET.get('disaster_id')
+    if not disaster_id:
+        return JsonResponse({'error': 'disaster_id parameter is required'}, status=400)
+    try:
+        disaster = await DisasterEvent.objects.aget(pk=disaster_id)
+    except (DisasterEvent.DoesNotExist, ValueError):
+        return JsonResponse({'error': 'Disaster not found'}, status=404)
+
+    if request.GET.get('format') == 'columnar':
+        encoding = request.GET.get('encoding', 'base64')
+        if encoding not in ('base64', 'json'):
+            return JsonResponse({'error': 'encoding must be base64 or json'}, status=400)
+        frame = await sync_to_async(get_store().frame)(disaster.pk)
+        return FastJsonResponse(columnar_feed(frame, encode_cursor(frame.as_of), encoding))
+
+    cursor = current_cursor()
+    if disaster.archived_at is not None and _query_flag(request, 'include_archived'):
+        rows = await sync_to_async(archived_assessments)([disaster.pk], with_related=False)
+        assessments = {assessment.household_id: assessment for assessment in rows}
+    else:
+        assessments = {
+            assessment.household_id: assessment
+            async for assessment in DamageAssessment.objects.filter(disaster=disaster).aiterator(chunk_size=2000)
+        }
+    features = [
+        household_feature(household, assessments.get(household.id))
+        async for household in Household.objects.all().aiterator(chunk_size=2000)
+    ]
+    return FastJsonResponse({'type': 'FeatureCollection', 'features': features, 'cursor': cursor})
+
+
+@require_GET
+async def assessment_list(request):
+    """
+    Async /api/async/assessments/?disaster_id=1&household_id=2&page=1
+    Same filters (risk ones and include_archived included), page size and response shape
+    as the DRF assessment list.
+    """
+    queryset = DamageAssessment.objects.select_related('household', 'disaster')
+    for param, field in (('disaster_id', 'disaster_id'), ('household_id', 'household_id')):
+        value = request.GET.get(param)
+        if value:
+            if not value.isdigit():
+                return JsonResponse({'error': f'{param} must be an integer'}, status=400)
+            queryset = queryset.filter(**{field: value})
+    try:
+        filters, ordering = _risk_query(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    include_archived = _query_flag(request, 'include_archived')
+    if include_archived and any(name in request.GET for name in RISK_PARAMS):
+        return JsonResponse({'error': 'Risk filters and ordering do not apply to archived assessments'}, status=400)
+    queryset = queryset.filter(**filters)
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 100)
+    page = request.GET.get('page', '1')
+    if not page.isdigit() or int(page) < 1:
+        return JsonResponse({'detail': 'Invalid page.'}, status=404)
+    page = int(page)
+
+    if include_archived:
+        # Archived rows follow the active ones; reading them decompresses batches, so in a thread
+        archived = await sync_to_async(archived_rows)(request.GET.get('disaster_id'), request.GET.get('household_id'))
+        rows = HotAndArchivedRows(queryset, archived, DamageAssessmentSerializer)
+        count = await sync_to_async(rows.count)()
+    else:
+        count = await queryset.acount()
+    if count and (page - 1) * page_size >= count:
+        return JsonResponse({'detail': 'Invalid page.'}, status=404)
+    if include_archived:
+        results = await sync_to_async(rows.__getitem__)(slice((page - 1) * page_size, page * page_size))
+    else:
+        rows = [assessment async for assessment in queryset[(page - 1) * page_size:page * page_size]]
+        # Related rows were selected up front, so serializing does not touch the database
+        results = DamageAssessmentSerializer(rows, many=True).data
+
+    def page_url(number):
+        query = request.GET.copy()
+        query['page'] = number
+        return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+    return FastJsonResponse({
+        'count': count,
+        'next': page_url(page + 1) if page * page_size < count else None,
+        'previous': page_url(page - 1) if page > 1 else None,
+        'results': results,
+    })
+
+
+@csrf_exempt
+@require_POST
+async def generate_sms(request):
+    """
+    Async /api/async/generate-sms/ (same request and response as the sync endpoint).
+    The Gemini call is awaited, so waiting on the LLM does not hold a worker thread.
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+
+    api_key = getattr(settings, 'GEMINI_API_KEY', '')
+    if not api_key:
+        return JsonResponse({
+            'success': False,
+            'error': 'Gemini API key not configured. Please set GEMINI_API_KEY in settings.'
+        }, status=500)
+
+    url = f"{getattr(settings, 'GEMINI_API_URL', GEMINI_API_URL)}?key={api_key}"
+    payload = {'contents': [{'parts': [{'text': data.get('prompt', '')}]}]}
+    try:
+        status_code, text = await _post_json(url, payload)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    if status_code != 200:
+        return JsonResponse({'success': False, 'error': f'Gemini API error: {status_code} - {text}'}, status=500)
+
+    try:
+        candidates = json.loads(text).get('candidates') or []
+        if not candidates:
+            return JsonResponse({'success': False, 'error': 'No response from Gemini API'}, status=500)
+        sms_message = candidates[0]['content']['parts'][0]['text'].strip()
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        # Not JSON, or not shaped like a generateContent response
+        return JsonResponse({'success': False, 'error': f'Unexpected Gemini API response: {e!r}'}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'sms_message': sms_message,
+        'household_name': data.get('household_name', ''),
+        'damage_status': data.get('damage_status', ''),
+        'ect_amount': data.get('ect_amount', 0),
+    })
@@ -0,0 +1,57 @@
+"""
+Set-based write helpers for the ingest paths.
+
+Creating millions of model instances just to call bulk_create() or
+bulk_update() is slower than the database itself, so the bulk ingest paths
+hand plain row tuples to the cursor instead. Callers are responsible for
+filling in auto_now / auto_now_add columns themselves.
+"""
+from django.db import connection
+from django.utils import timezone
+
+
+def _column(model, field_name):
+    return connection.ops.quote_name(model._meta.get_field(field_name).column)
+
+
+def bulk_insert_rows(model, fields, rows):
+    """
+    INSERT every tuple in `rows` into the model's table.
+    Each row must list its values in the same order as `fields`.
+    """
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(_column(model, name) for name in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def bulk_update_rows(model, fields, rows):
+    """
+    UPDATE rows by primary key.
+    Each row lists the new values in the same order as `fields`, followed by the pk.
+    """
+    sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join('%s = %%s' % _column(model, name) for name in fields),
+        connection.ops.quote_name(model._meta.pk.column),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def db_now(now):
+    """Adapts a timezone-aware datetime for use as a raw cursor parameter."""
+    return connection.ops.adapt_datetimefield_value(now)
+
+
+def restamp(queryset, stamped_at):
+    """
+    Moves updated_at from `stamped_at` to now for the rows of `queryset` a bulk write
+    stamped, as the last statement of the write's transaction. The change feed and
+    the columnar store only re-read CHANGE_FEED_OVERLAP_SECONDS behind their cursor,
+    so rows committed long after their stamp would be missed for good.
+    """
+    return queryset.filter(updated_at=stamped_at).update(updated_at=timezone.now())
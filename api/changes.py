@@ -0,0 +1,125 @@
+"""
+Change feed for the map.
+
+A cursor is the number of microseconds since the Unix epoch, as a string. Each
+response hands out a cursor a little in the past (CHANGE_FEED_OVERLAP_SECONDS)
+so rows saved just before a commit are never skipped. Clients may therefore see
+a change twice; applying a feature is idempotent, so that is harmless.
+
+Deleted households and assessments leave MapFeatureTombstone rows behind, and
+`updated_at` is indexed on both tables, so a delta query costs O(changes).
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Household, DamageAssessment, MapFeatureTombstone
+from .replica import replica_synced_at
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class ChangeFeedError(ValueError):
+    """Raised for a malformed cursor."""
+
+
+def encode_cursor(moment):
+    delta = moment - EPOCH
+    return str((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+
+
+def decode_cursor(cursor):
+    try:
+        return EPOCH + timedelta(microseconds=int(cursor))
+    except (TypeError, ValueError, OverflowError):
+        raise ChangeFeedError(f'Invalid cursor: {cursor!r}')
+
+
+def current_cursor():
+    """Cursor to hand out with a response built from the current state."""
+    overlap = getattr(settings, 'CHANGE_FEED_OVERLAP_SECONDS', 2)
+    moment = timezone.now()
+    # A response read from the replica shows the primary only as of the last sync
+    synced_at = replica_synced_at()
+    if synced_at is not None:
+        moment = min(moment, synced_at)
+    return encode_cursor(moment - timedelta(seconds=overlap))
+
+
+def tombstone_cutoff():
+    """Tombstones older than this are pruned; cursors older than this need a full reload."""
+    return timezone.now() - timedelta(days=getattr(settings, 'CHANGE_FEED_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def changed_household_ids(disaster, since):
+    """
+    Returns (ids of households whose feature may have changed, ids of deleted households)
+    for the disaster since the given datetime.
+    """
+    changed = set(Household.objects.filter(updated_at__gt=since).values_list('id', flat=True))
+    changed.update(
+        DamageAssessment.objects.filter(disaster=disaster, updated_at__gt=since).values_list('household_id', flat=True)
+    )
+
+    deleted = set()
+    for household_id, disaster_id in MapFeatureTombstone.objects.filter(
+        Q(disaster=disaster) | Q(disaster__isnull=True), deleted_at__gt=since
+    ).values_list('household_id', 'disaster_id'):
+        if disaster_id is None:
+            deleted.add(household_id)
+        else:
+            # Assessment removed: the household reverts to NONE
+            changed.add(household_id)
+    return changed, deleted
+
+
+def geojson_changes(disaster, since_cursor, build_feature):
+    """
+    Builds the change set for the map since `since_cursor`.
+    `build_feature(household, assessment)` turns a household into a GeoJSON Feature.
+    """
+    since = decode_cursor(since_cursor)
+    cursor = current_cursor()
+
+    reset = {'type': 'FeatureCollectionChanges', 'reset': True, 'cursor': cursor}
+    if since < tombstone_cutoff():
+        return reset
+
+    changed, deleted = changed_household_ids(disaster, since)
+    if len(changed) + len(deleted) > getattr(settings, 'CHANGE_FEED_MAX_CHANGES', 5000):
+        return reset
+
+    households = {household.id: household for household in Household.objects.filter(id__in=changed | deleted)}
+    assessments = {
+        assessment.household_id: assessment
+        for assessment in DamageAssessment.objects.filter(disaster=disaster, household_id__in=households.keys())
+    }
+
+    added, modified = [], []
+    for household in households.values():
+        feature = build_feature(household, assessments.get(household.id))
+        (added if household.created_at > since else modified).append(feature)
+    # A household recreated after its tombstone still exists, so only report real removals
+    removed = sorted((changed | deleted) - households.keys())
+
+    return {
+        'type': 'FeatureCollectionChanges',
+        'reset': False,
+        'cursor': cursor,
+        'added': added,
+        'modified': modified,
+        'removed': removed,
+    }
+
+
+def record_tombstone(household_id, disaster_id=None):
+    MapFeatureTombstone.objects.create(household_id=household_id, disaster_id=disaster_id)
+
+
+def prune_tombstones():
+    """Deletes tombstones older than the retention window. Returns the number removed."""
+    deleted, _ = MapFeatureTombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
+    return deleted
@@ -0,0 +1,73 @@
+"""
+Compact columnar encoding of the map feed.
+
+Instead of one GeoJSON Feature per household (~600 bytes with the popup HTML),
+the map gets parallel typed arrays, one value per household:
+
+- id: household id
+- lon, lat: degrees as fixed-point integers (degrees * COORDINATE_SCALE, exact for
+  the 6 decimal places Household stores)
+- status: index into `status_values`
+- ect_centavos: recommended ECT amount in centavos
+- flood_depth_cm: flood depth in centimeters, -1 when unknown
+- barangay: index into `barangay_values`
+
+With encoding=base64 each column is little-endian binary; with encoding=json it
+is a plain list of integers. Names, addresses and contact numbers are left out;
+the map fetches them per household on click.
+
+Columns come from the in-process columnar store (api/store.py), so building the
+feed reads the database only for the store's incremental refresh.
+"""
+import base64
+
+import numpy as np
+
+from .store import STATUS_VALUES
+
+
+COORDINATE_SCALE = 1_000_000
+
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def household_columns(frame):
+    """Map feed columns from a store.DisasterFrame (every household, joined with its assessment)."""
+    ids = frame['id']
+    depth = frame['flood_depth_meters']
+    return {
+        # float64 holds any id exactly and decodes everywhere; int32 is half the size
+        'id': ids.astype(np.int32 if len(ids) == 0 or ids.max() <= _INT32_MAX else np.float64),
+        'lon': np.rint(frame['longitude'] * COORDINATE_SCALE).astype(np.int32),
+        'lat': np.rint(frame['latitude'] * COORDINATE_SCALE).astype(np.int32),
+        'status': frame['damage_status'].astype(np.uint8),
+        'ect_centavos': np.rint(frame['recommended_ect_amount'] * 100).astype(np.int32),
+        'flood_depth_cm': np.where(np.isnan(depth), -1, np.rint(depth * 100)).astype(np.int32),
+        'barangay': frame['barangay'].astype(np.uint16 if len(frame.barangay_values) <= 65535 else np.uint32),
+    }
+
+
+def encode_columns(columns, encoding='base64'):
+    """Packs each column as {'dtype', 'data'}: base64 little-endian bytes, or a JSON list."""
+    packed = {}
+    for name, values in columns.items():
+        if encoding == 'json':
+            data = values.tolist()
+        else:
+            data = base64.b64encode(values.astype(values.dtype.newbyteorder('<'), copy=False).tobytes()).decode('ascii')
+        packed[name] = {'dtype': values.dtype.name, 'data': data}
+    return packed
+
+
+def columnar_feed(frame, cursor, encoding='base64'):
+    """Map feed for a store.DisasterFrame in the columnar layout."""
+    return {
+        'type': 'HouseholdColumns',
+        'count': len(frame),
+        'cursor': cursor,
+        'encoding': encoding,
+        'coordinate_scale': COORDINATE_SCALE,
+        'status_values': STATUS_VALUES,
+        'barangay_values': frame.barangay_values,
+        'columns': encode_columns(household_columns(frame), encoding),
+    }
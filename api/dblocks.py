@@ -0,0 +1,59 @@
+"""
+SQLite write-lock contention counters.
+
+SQLite has one writer at a time. With busy_timeout (SQLITE_OPTIONS) a writer that
+finds the lock taken waits instead of failing, so contention shows up as latency,
+not errors. This execute wrapper, installed on every SQLite connection, counts:
+- lock_waits / lock_wait_seconds: write-lock acquisitions (BEGIN IMMEDIATE/EXCLUSIVE,
+  or a write outside a transaction) that took longer than DB_LOCK_WAIT_THRESHOLD_MS
+- lock_errors: statements that gave up with "database is locked"
+Counters are per process and cumulative; GET /api/db-locks/ reports them.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+
+
+LOCKING_BEGINS = ('BEGIN IMMEDIATE', 'BEGIN EXCLUSIVE')
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_lock = threading.Lock()
+_counters = {'lock_acquisitions': 0, 'lock_waits': 0, 'lock_wait_seconds': 0.0, 'lock_errors': 0}
+
+
+def lock_stats():
+    with _lock:
+        return dict(_counters)
+
+
+def _monitor(execute, sql, params, many, context):
+    # Inside a transaction the lock was already taken by its BEGIN
+    takes_lock = sql.startswith(LOCKING_BEGINS) or (
+        not context['connection'].in_atomic_block and sql.lstrip()[:7].upper().startswith(WRITES)
+    )
+    if not takes_lock:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError as e:
+        if 'locked' in str(e):
+            with _lock:
+                _counters['lock_errors'] += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            _counters['lock_acquisitions'] += 1
+            if elapsed * 1000 >= getattr(settings, 'DB_LOCK_WAIT_THRESHOLD_MS', 50):
+                _counters['lock_waits'] += 1
+                _counters['lock_wait_seconds'] += elapsed
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: adds the monitor to SQLite connections."""
+    if connection.vendor == 'sqlite' and _monitor not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_monitor)
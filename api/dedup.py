@@ -0,0 +1,255 @@
+"""
+Near-duplicate household detection.
+
+The same family entered twice (registry import plus field enumeration) shows up
+as two households a few metres apart with slightly different names. Each pair
+within DEDUP_RADIUS_METERS gets a score from name similarity, address similarity
+and distance; pairs scoring DEDUP_MIN_SCORE or more are recorded as
+DuplicateHouseholdCandidate rows for review.
+
+Candidate pairs come from a uniform grid with radius-sized cells: a household can
+only match households in its own or the 8 neighbouring cells, so the batch run
+(find_duplicate_households) does a sort and a few searchsorted passes instead
+of comparing every pair. The online check (find_matches) reads a bounding box
+around the new household through the (latitude, longitude) index.
+"""
+import math
+import re
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Household, DuplicateHouseholdCandidate
+
+try:
+    from rapidfuzz.fuzz import ratio as _rapidfuzz_ratio
+except ImportError:
+    _rapidfuzz_ratio = None
+
+
+METERS_PER_DEGREE = 111_320.0
+
+# Score weights; the rest of the score is proximity (1 at 0 m, 0 at the radius)
+NAME_WEIGHT = 0.6
+ADDRESS_WEIGHT = 0.3
+PROXIMITY_WEIGHT = 0.1
+
+# Cell offsets covering each pair of neighbouring cells once
+HALF_NEIGHBOURHOOD = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def radius_meters():
+    return float(getattr(settings, 'DEDUP_RADIUS_METERS', 30))
+
+
+def min_score():
+    return float(getattr(settings, 'DEDUP_MIN_SCORE', 0.8))
+
+
+# --- SCORING ---
+
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_name(name):
+    """Lowercase words in sorted order, so 'Dela Cruz, Juan' matches 'Juan Dela Cruz'."""
+    return ' '.join(sorted(_NON_WORD.sub(' ', (name or '').lower()).split()))
+
+
+def normalize_address(address):
+    return ' '.join(_NON_WORD.sub(' ', (address or '').lower()).split())
+
+
+def similarity(a, b):
+    """0..1 edit similarity of two normalized strings (rapidfuzz when installed, else difflib)."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if _rapidfuzz_ratio is not None:
+        return _rapidfuzz_ratio(a, b) / 100.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score_pair(name_a, name_b, address_a, address_b, distance, radius, threshold):
+    """
+    (score, name similarity, address similarity) of two normalized households, or None
+    when the pair cannot reach the threshold (address is skipped when the name rules it out).
+    """
+    proximity = PROXIMITY_WEIGHT * max(0.0, 1.0 - distance / radius)
+    if NAME_WEIGHT + ADDRESS_WEIGHT + proximity < threshold:
+        return None
+    name_similarity = similarity(name_a, name_b)
+    if NAME_WEIGHT * name_similarity + ADDRESS_WEIGHT + proximity < threshold:
+        return None
+    address_similarity = similarity(address_a, address_b)
+    score = NAME_WEIGHT * name_similarity + ADDRESS_WEIGHT * address_similarity + proximity
+    if score < threshold:
+        return None
+    return score, name_similarity, address_similarity
+
+
+def distances_meters(lat_a, lon_a, lat_b, lon_b):
+    """Equirectangular distance, accurate to well under a metre at these ranges."""
+    cos_lat = np.cos(np.radians((lat_a + lat_b) / 2))
+    dy = (lat_b - lat_a) * METERS_PER_DEGREE
+    dx = (lon_b - lon_a) * METERS_PER_DEGREE * cos_lat
+    return np.hypot(dx, dy)
+
+
+# --- BATCH ---
+
+
+def grid_pairs(latitudes, longitudes, radius, chunk_size=250_000):
+    """
+    Yields (i, j) index arrays of every pair of points within `radius` metres, each pair once.
+    Points are binned into radius-sized cells and matched against their own cell and
+    the neighbouring cells in HALF_NEIGHBOURHOOD.
+    """
+    n = len(latitudes)
+    if n < 2:
+        return
+    # Scale longitude by the smallest cos(latitude) so projected distances never exceed
+    # true ones: a pair within the radius is always in the same or a neighbouring cell
+    cos_min = math.cos(math.radians(float(np.abs(latitudes).max())))
+    cell_y = np.floor(latitudes * METERS_PER_DEGREE / radius).astype(np.int64)
+    cell_x = np.floor(longitudes * METERS_PER_DEGREE * cos_min / radius).astype(np.int64)
+    cell_y -= cell_y.min() - 1
+    cell_x -= cell_x.min() - 1
+    stride = int(cell_y.max()) + 2
+    keys = cell_x * stride + cell_y
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    positions = np.arange(n)
+
+    for start in range(0, n, chunk_size):
+        chunk = positions[start:start + chunk_size]
+        for dx, dy in HALF_NEIGHBOURHOOD:
+            target = sorted_keys[chunk] + dx * stride + dy
+            if (dx, dy) == (0, 0):
+                # Same cell: only points sorted after this one, so each pair comes once
+                low = chunk + 1
+            else:
+                low = np.searchsorted(sorted_keys, target, side='left')
+            high = np.searchsorted(sorted_keys, target, side='right')
+            counts = np.maximum(high - low, 0)
+            total = int(counts.sum())
+            if not total:
+                continue
+            first = np.repeat(chunk, counts)
+            starts = np.repeat(low - np.cumsum(counts) + counts, counts)
+            second = starts + np.arange(total)
+            i, j = order[first], order[second]
+            near = distances_meters(latitudes[i], longitudes[i], latitudes[j], longitudes[j]) <= radius
+            yield i[near], j[near]
+
+
+def find_duplicate_households(radius=None, threshold=None, dry_run=False):
+    """
+    Scores every pair of households within the radius and records the likely duplicates.
+    Pairs already recorded (including dismissed ones) are left as they are.
+    Returns a report with counts and per-phase timings.
+    """
+    radius = radius or radius_meters()
+    threshold = threshold if threshold is not None else min_score()
+    report = {'households': 0, 'pairs_in_radius': 0, 'candidates': 0, 'created': 0}
+
+    started = time.perf_counter()
+    rows = list(Household.objects.order_by().values_list('id', 'latitude', 'longitude', 'name', 'address')
+                .iterator(chunk_size=100_000))
+    report['households'] = len(rows)
+    if not rows:
+        return report
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    latitudes = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    longitudes = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    names = [normalize_name(row[3]) for row in rows]
+    addresses = [normalize_address(row[4]) for row in rows]
+    del rows
+    report['load_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candidates = []
+    for first, second in grid_pairs(latitudes, longitudes, radius):
+        report['pairs_in_radius'] += len(first)
+        distances = distances_meters(latitudes[first], longitudes[first], latitudes[second], longitudes[second])
+        for i, j, distance in zip(first.tolist(), second.tolist(), distances.tolist()):
+            scored = score_pair(names[i], names[j], addresses[i], addresses[j], distance, radius, threshold)
+            if scored is None:
+                continue
+            low, high = sorted((int(ids[i]), int(ids[j])))
+            candidates.append(DuplicateHouseholdCandidate(
+                household_id=low, duplicate_id=high, distance_meters=round(distance, 2),
+                score=round(scored[0], 4), name_similarity=round(scored[1], 4),
+                address_similarity=round(scored[2], 4),
+            ))
+    report['candidates'] = len(candidates)
+    report['match_seconds'] = time.perf_counter() - started
+
+    if not dry_run:
+        started = time.perf_counter()
+        before = DuplicateHouseholdCandidate.objects.count()
+        with transaction.atomic():
+            DuplicateHouseholdCandidate.objects.bulk_create(candidates, ignore_conflicts=True, batch_size=1000)
+        report['created'] = DuplicateHouseholdCandidate.objects.count() - before
+        report['write_seconds'] = time.perf_counter() - started
+    return report
+
+
+# --- ONLINE CHECK ---
+
+
+def find_matches(name, address, latitude, longitude, exclude_id=None, radius=None, threshold=None):
+    """
+    Existing households that look like the same family as the given one, best first,
+    as dicts with household, distance_meters, score, name_similarity, address_similarity.
+    """
+    radius = radius or radius_meters()
+    threshold = threshold if threshold is not None else min_score()
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = radius / METERS_PER_DEGREE
+    lon_delta = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+
+    nearby = Household.objects.filter(
+        latitude__range=(latitude - lat_delta, latitude + lat_delta),
+        longitude__range=(longitude - lon_delta, longitude + lon_delta),
+    )
+    if exclude_id is not None:
+        nearby = nearby.exclude(pk=exclude_id)
+
+    name, address = normalize_name(name), normalize_address(address)
+    matches = []
+    for household in nearby:
+        distance = float(distances_meters(latitude, longitude, float(household.latitude), float(household.longitude)))
+        if distance > radius:
+            continue
+        scored = score_pair(name, normalize_name(household.name), address, normalize_address(household.address),
+                            distance, radius, threshold)
+        if scored is not None:
+            matches.append({
+                'household': household, 'distance_meters': round(distance, 2), 'score': round(scored[0], 4),
+                'name_similarity': round(scored[1], 4), 'address_similarity': round(scored[2], 4),
+            })
+    matches.sort(key=lambda match: -match['score'])
+    return matches
+
+
+def record_matches(household, matches):
+    """Records the matches of a household created despite them, for review."""
+    DuplicateHouseholdCandidate.objects.bulk_create(
+        [
+            DuplicateHouseholdCandidate(
+                household_id=min(household.pk, match['household'].pk),
+                duplicate_id=max(household.pk, match['household'].pk),
+                distance_meters=match['distance_meters'], score=match['score'],
+                name_similarity=match['name_similarity'], address_similarity=match['address_similarity'],
+            )
+            for match in matches
+        ],
+        ignore_conflicts=True,
+    )
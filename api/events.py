@@ -0,0 +1,181 @@
+"""
+Live push of assessment changes to map viewers.
+
+Every change to a DamageAssessment is published as a small event for its
+disaster. Subscribers (the SSE endpoint in views.py) each get a bounded asyncio
+queue. When a slow client's queue is full, its oldest event is dropped and the
+client is sent a `resync` event so it can catch up through the change feed
+instead of holding memory on the server.
+
+The broker class is chosen with the ASSESSMENT_EVENT_BROKER setting:
+- LocalBroker (default): fan-out inside one process
+- RedisBroker: publishes through Redis pub/sub so every worker process
+  receives events from every other one (needs the `redis` package)
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+RESYNC_EVENT = {'type': 'resync'}
+
+
+class Subscription:
+    """One client's bounded event queue, bound to the event loop it was created on."""
+
+    def __init__(self, broker, disaster_id, max_queue):
+        self.broker = broker
+        self.disaster_id = disaster_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._lagging = False
+
+    def offer(self, event):
+        """Queues an event on the subscriber's loop, dropping the oldest if the client is behind."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self._lagging = True
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        event = await self.queue.get()
+        if self._lagging:
+            # The client missed events; tell it to pull the change feed once
+            self._lagging = False
+            return RESYNC_EVENT
+        return event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process asyncio fan-out. publish() is safe to call from any thread."""
+
+    def __init__(self, max_queue=None):
+        self.max_queue = max_queue or getattr(settings, 'ASSESSMENT_EVENT_QUEUE_SIZE', 100)
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, disaster_id):
+        """Must be called from a running event loop."""
+        subscription = Subscription(self, int(disaster_id), self.max_queue)
+        with self._lock:
+            self._subscribers[subscription.disaster_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.disaster_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.disaster_id]
+
+    def subscriber_count(self, disaster_id=None):
+        with self._lock:
+            if disaster_id is None:
+                return sum(len(subscribers) for subscribers in self._subscribers.values())
+            return len(self._subscribers.get(int(disaster_id), ()))
+
+    def publish(self, disaster_id, event):
+        self.deliver(int(disaster_id), event)
+
+    def deliver(self, disaster_id, event):
+        """Hands the event to every local subscriber of the disaster."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(disaster_id, ()))
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        for subscription in subscribers:
+            if subscription.loop is current_loop:
+                subscription.offer(event)
+            elif not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Multi-worker broker over Redis pub/sub.
+    Each process runs one listener task that feeds its local subscribers.
+    Configure with ASSESSMENT_EVENT_REDIS_URL.
+    """
+    channel_prefix = 'bantayayuda:assessments:'
+
+    def __init__(self, max_queue=None, url=None):
+        super().__init__(max_queue)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError('RedisBroker requires the redis package: pip install redis')
+        self.url = url or getattr(settings, 'ASSESSMENT_EVENT_REDIS_URL', 'redis://localhost:6379/0')
+        self._publisher = redis.Redis.from_url(self.url)
+        self._listener = None
+
+    def subscribe(self, disaster_id):
+        subscription = super().subscribe(disaster_id)
+        if self._listener is None or self._listener.done():
+            self._listener = subscription.loop.create_task(self._listen())
+        return subscription
+
+    def publish(self, disaster_id, event):
+        self._publisher.publish(f'{self.channel_prefix}{int(disaster_id)}', json.dumps(event))
+
+    async def _listen(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(f'{self.channel_prefix}*')
+        try:
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                channel = message['channel'].decode() if isinstance(message['channel'], bytes) else message['channel']
+                disaster_id = int(channel[len(self.channel_prefix):])
+                self.deliver(disaster_id, json.loads(message['data']))
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Returns the process-wide broker configured by ASSESSMENT_EVENT_BROKER."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(getattr(settings, 'ASSESSMENT_EVENT_BROKER', 'api.events.LocalBroker'))
+                _broker = broker_class()
+    return _broker
+
+
+def assessment_event(assessment, cursor):
+    """Compact change event for one saved assessment."""
+    return {
+        'type': 'assessment',
+        'household_id': assessment.household_id,
+        'damage_status': assessment.damage_status,
+        'ect_amount': float(assessment.recommended_ect_amount),
+        'flood_depth_meters': float(assessment.flood_depth_meters) if assessment.flood_depth_meters is not None else None,
+        'cursor': cursor,
+    }
+
+
+def format_sse(event):
+    """Serializes an event as one Server-Sent Events message."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
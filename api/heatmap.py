@@ -0,0 +1,231 @@
+"""
+Precomputed damage heatmap grids.
+
+For every disaster we keep sparse aggregate grids (assessment count per damage
+status and ECT sum) at a few zoom levels in DamageHeatmapCell. A map tile at
+zoom z is split into HEATMAP_TILE_BINS x HEATMAP_TILE_BINS cells, so serving a
+tile reads at most that many rows no matter how many households the disaster has.
+
+Grids are rebuilt in one vectorized pass (rebuild_heatmap) and kept current
+by signals that add or subtract a single assessment's contribution.
+"""
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from .bulk import bulk_insert_rows
+from .models import Household, DamageAssessment, DamageHeatmapCell
+
+
+MAX_LATITUDE = 85.05112878
+
+STATUS_COUNT_FIELDS = {
+    DamageAssessment.DamageStatus.TOTAL: 'total_count',
+    DamageAssessment.DamageStatus.PARTIAL: 'partial_count',
+    DamageAssessment.DamageStatus.NONE: 'none_count',
+}
+
+
+def tile_levels():
+    """Tile zoom levels that have a precomputed grid, lowest first."""
+    return sorted(getattr(settings, 'HEATMAP_ZOOM_LEVELS', (0, 2, 4, 6, 8, 10, 12, 14)))
+
+
+def bin_bits():
+    """log2 of the number of cells along one side of a tile."""
+    return int(math.log2(getattr(settings, 'HEATMAP_TILE_BINS', 32)))
+
+
+def cell_coordinates(latitudes, longitudes, cell_zoom):
+    """Web Mercator cell indices of the given coordinates at 2**cell_zoom cells per side."""
+    n = 2 ** cell_zoom
+    latitudes = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    x = np.floor((np.asarray(longitudes) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(latitudes)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+# --- INCREMENTAL MAINTENANCE ---
+
+
+# Pending per-cell deltas while inside deferred(); None when updates apply immediately
+_pending = ContextVar('heatmap_pending', default=None)
+
+
+@contextmanager
+def deferred():
+    """
+    Collects heatmap deltas for a batch of writes and applies them once per cell on exit.
+    Use around loops that save many assessments.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    pending = defaultdict(lambda: [0, 0, 0, 0])
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    apply_cell_deltas(pending)
+
+
+def apply_cell_deltas(deltas):
+    """
+    Applies {(disaster_id, zoom, cell_x, cell_y): [total, partial, none, ect]} increments.
+    Missing cells are created first, except where the delta only subtracts
+    (there is nothing to subtract from a cell that was never built).
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    DamageHeatmapCell.objects.bulk_create(
+        [
+            DamageHeatmapCell(disaster_id=disaster_id, zoom=zoom, cell_x=cell_x, cell_y=cell_y)
+            for (disaster_id, zoom, cell_x, cell_y), delta in deltas.items()
+            if min(delta[:3]) >= 0
+        ],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+
+    qn = connection.ops.quote_name
+    sql = (
+        f'UPDATE {qn(DamageHeatmapCell._meta.db_table)} SET '
+        + ', '.join(f'{qn(column)} = {qn(column)} + %s'
+                    for column in ('total_count', 'partial_count', 'none_count', 'ect_sum'))
+        + f' WHERE {qn("disaster_id")} = %s AND {qn("zoom")} = %s AND {qn("cell_x")} = %s AND {qn("cell_y")} = %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*delta, *key) for key, delta in deltas.items()])
+
+
+def apply_assessment(disaster_id, latitude, longitude, damage_status, ect_amount, sign):
+    """
+    Adds (sign=1) or removes (sign=-1) one assessment's contribution to every level.
+    """
+    column = list(STATUS_COUNT_FIELDS.values()).index(STATUS_COUNT_FIELDS.get(damage_status, 'none_count'))
+    pending = _pending.get()
+    deltas = pending if pending is not None else defaultdict(lambda: [0, 0, 0, 0])
+
+    for level in tile_levels():
+        x, y = cell_coordinates(np.array([float(latitude)]), np.array([float(longitude)]), level + bin_bits())
+        cell = deltas[(disaster_id, level, int(x[0]), int(y[0]))]
+        cell[column] += sign
+        cell[3] += sign * ect_amount
+
+    if pending is None:
+        apply_cell_deltas(deltas)
+
+
+# --- FULL REBUILD ---
+
+
+def _assessment_columns(disaster_id):
+    """Reads (latitude, longitude, status, ECT amount) for the disaster straight off the cursor."""
+    qn = connection.ops.quote_name
+    sql = (
+        f'SELECT h.{qn("latitude")}, h.{qn("longitude")}, a.{qn("damage_status")}, a.{qn("recommended_ect_amount")} '
+        f'FROM {qn(DamageAssessment._meta.db_table)} a '
+        f'JOIN {qn(Household._meta.db_table)} h ON h.{qn("id")} = a.{qn("household_id")} '
+        f'WHERE a.{qn("disaster_id")} = %s'
+    )
+    latitudes, longitudes, statuses, amounts = [], [], [], []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [disaster_id])
+        while True:
+            rows = cursor.fetchmany(100_000)
+            if not rows:
+                break
+            lat, lon, status, amount = zip(*rows)
+            latitudes.append(np.array(lat, dtype=np.float64))
+            longitudes.append(np.array(lon, dtype=np.float64))
+            statuses.append(np.array(status))
+            amounts.append(np.array(amount, dtype=np.float64))
+
+    if not latitudes:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=str), np.empty(0)
+    return (np.concatenate(latitudes), np.concatenate(longitudes),
+            np.concatenate(statuses), np.concatenate(amounts))
+
+
+def rebuild_heatmap(disaster_id):
+    """Recomputes every heatmap level for the disaster from its assessments."""
+    latitudes, longitudes, statuses, amounts = _assessment_columns(disaster_id)
+    # Column order follows STATUS_COUNT_FIELDS: total, partial, none
+    status_index = np.full(len(statuses), 2, dtype=np.int64)
+    status_index[statuses == DamageAssessment.DamageStatus.TOTAL] = 0
+    status_index[statuses == DamageAssessment.DamageStatus.PARTIAL] = 1
+
+    rows = []
+    for level in tile_levels():
+        cell_zoom = level + bin_bits()
+        x, y = cell_coordinates(latitudes, longitudes, cell_zoom)
+        keys, inverse = np.unique((x << cell_zoom) | y, return_inverse=True)
+        statuses_per_cell = len(STATUS_COUNT_FIELDS)
+        counts = np.bincount(inverse * statuses_per_cell + status_index,
+                             minlength=len(keys) * statuses_per_cell).reshape(-1, statuses_per_cell)
+        ect_sums = np.bincount(inverse, weights=amounts, minlength=len(keys))
+
+        rows.extend(
+            (disaster_id, level, cell_x, cell_y, total, partial, none, round(ect, 2))
+            for cell_x, cell_y, (total, partial, none), ect
+            in zip((keys >> cell_zoom).tolist(), (keys & ((1 << cell_zoom) - 1)).tolist(),
+                   counts.tolist(), ect_sums.tolist())
+        )
+
+    with transaction.atomic():
+        DamageHeatmapCell.objects.filter(disaster_id=disaster_id).delete()
+        bulk_insert_rows(
+            DamageHeatmapCell,
+            ['disaster', 'zoom', 'cell_x', 'cell_y', 'total_count', 'partial_count', 'none_count', 'ect_sum'],
+            rows,
+        )
+    return len(rows)
+
+
+# --- TILES ---
+
+
+def heatmap_tile(disaster_id, z, x, y):
+    """
+    Returns the cells of tile z/x/y from the closest precomputed level at or below z.
+    Each cell is [cell_x, cell_y, total, partial, none, ect_sum] at `cell_zoom`.
+    """
+    levels = tile_levels()
+    level = max([lvl for lvl in levels if lvl <= z] or [levels[0]])
+    cell_zoom = level + bin_bits()
+
+    if cell_zoom >= z:
+        scale = 2 ** (cell_zoom - z)
+        x_range = (x * scale, (x + 1) * scale - 1)
+        y_range = (y * scale, (y + 1) * scale - 1)
+    else:
+        # Tile is smaller than one cell; return the cell that contains it
+        shift = z - cell_zoom
+        x_range = (x >> shift, x >> shift)
+        y_range = (y >> shift, y >> shift)
+
+    cells = DamageHeatmapCell.objects.filter(
+        disaster_id=disaster_id,
+        zoom=level,
+        cell_x__range=x_range,
+        cell_y__range=y_range,
+    ).exclude(
+        total_count=0, partial_count=0, none_count=0
+    ).values_list('cell_x', 'cell_y', 'total_count', 'partial_count', 'none_count', 'ect_sum')
+
+    return {
+        'z': z,
+        'x': x,
+        'y': y,
+        'cell_zoom': cell_zoom,
+        'columns': ['cell_x', 'cell_y', 'total', 'partial', 'none', 'ect_sum'],
+        'cells': [[cx, cy, total, partial, none, float(ect)] for cx, cy, total, partial, none, ect in cells],
+    }
@@ -0,0 +1,148 @@
+"""
+Household damage history across disasters.
+
+Every household carries counters over all of its assessments (assessment_count,
+partial_damage_count, total_damage_count), so repeat victims can be found and
+filtered without scanning assessments. Signals keep them current for single
+writes; bulk paths that bypass save() call apply_assessment_counts() with the
+rows they wrote. Archived assessments still count: archiving and restoring move
+rows without changing the counters.
+
+household_history() turns households fetched with history_queryset() (one
+prefetch query for all of their assessments) into compact per-disaster series.
+With include_archived it adds archived assessments, decompressing only the archive
+batches whose household range covers the households.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Prefetch
+
+from .archive import archived_assessments
+from .models import Household, DisasterEvent, DamageAssessment
+
+
+COUNTER_FIELDS = ('assessment_count', 'partial_damage_count', 'total_damage_count')
+
+
+# --- COUNTERS ---
+
+
+def _count_deltas(rows, sign):
+    """{household_id: [assessments, partial, total]} for (household_id, damage_status) rows."""
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for household_id, damage_status in rows:
+        delta = deltas[household_id]
+        delta[0] += sign
+        if damage_status == DamageAssessment.DamageStatus.PARTIAL:
+            delta[1] += sign
+        elif damage_status == DamageAssessment.DamageStatus.TOTAL:
+            delta[2] += sign
+    return deltas
+
+
+def apply_assessment_counts(rows, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) assessments, given as (household_id, damage_status)
+    rows, from their households' counters. One UPDATE per household touched; updated_at
+    is left alone so the map change feed doesn't resend the households.
+    """
+    _write_deltas(_count_deltas(rows, sign))
+
+
+def _write_deltas(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    qn = connection.ops.quote_name
+    sql = (
+        f'UPDATE {qn(Household._meta.db_table)} SET '
+        + ', '.join(f'{qn(column)} = {qn(column)} + %s' for column in COUNTER_FIELDS)
+        + f' WHERE {qn("id")} = %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*delta, household_id) for household_id, delta in deltas.items()])
+
+
+def remove_disaster_counts(disaster_id):
+    """Takes a disaster's assessments, hot and archived, out of the counters (before it is deleted)."""
+    with transaction.atomic():
+        apply_assessment_counts(
+            DamageAssessment.objects.filter(disaster_id=disaster_id)
+            .values_list('household_id', 'damage_status').iterator(chunk_size=100_000),
+            sign=-1,
+        )
+        apply_assessment_counts(
+            ((assessment.household_id, assessment.damage_status)
+             for assessment in archived_assessments([disaster_id], with_related=False)),
+            sign=-1,
+        )
+
+
+def rebuild_assessment_counts():
+    """Recomputes every household's counters from scratch; returns the number of households with assessments."""
+    with transaction.atomic():
+        Household.objects.update(**{field: 0 for field in COUNTER_FIELDS})
+        hot = DamageAssessment.objects.values_list('household_id', 'damage_status').iterator(chunk_size=100_000)
+        archived = ((assessment.household_id, assessment.damage_status)
+                    for assessment in archived_assessments(with_related=False))
+        deltas = _count_deltas((row for rows in (hot, archived) for row in rows), 1)
+        _write_deltas(deltas)
+    return len(deltas)
+
+
+# --- HISTORY ---
+
+
+def history_queryset(households):
+    """Households with all of their assessments (and disasters) prefetched in one query."""
+    assessments = DamageAssessment.objects.select_related('disaster').only(
+        'household', 'damage_status', 'flood_depth_meters', 'recommended_ect_amount',
+        'disaster__name', 'disaster__date_occurred',
+    ).order_by('disaster__date_occurred', 'disaster_id')
+    return households.prefetch_related(Prefetch('assessments', queryset=assessments, to_attr='history'))
+
+
+def household_history(households, include_archived=False):
+    """
+    {'disasters': {id: {name, date_occurred}}, 'households': [...]} for households from
+    history_queryset(). Each household has its counters and a series with one entry per
+    disaster, oldest first, as parallel lists (disaster_id, damage_status,
+    flood_depth_meters, ect_amount).
+    """
+    households = list(households)
+    disasters = {}
+    archived = defaultdict(list)
+    if include_archived and households:
+        rows = archived_assessments(household_ids=[household.pk for household in households], with_related=False)
+        archived_disasters = DisasterEvent.objects.in_bulk({row.disaster_id for row in rows})
+        for row in rows:
+            row.disaster = archived_disasters[row.disaster_id]
+            archived[row.household_id].append(row)
+
+    entries = []
+    for household in households:
+        series = {'disaster_id': [], 'damage_status': [], 'flood_depth_meters': [], 'ect_amount': []}
+        assessments = household.history
+        if household.pk in archived:
+            assessments = sorted(assessments + archived[household.pk],
+                                 key=lambda assessment: (assessment.disaster.date_occurred, assessment.disaster_id))
+        for assessment in assessments:
+            disaster = assessment.disaster
+            disasters.setdefault(disaster.pk, {'name': disaster.name, 'date_occurred': disaster.date_occurred})
+            series['disaster_id'].append(disaster.pk)
+            series['damage_status'].append(assessment.damage_status)
+            depth = assessment.flood_depth_meters
+            series['flood_depth_meters'].append(float(depth) if depth is not None else None)
+            series['ect_amount'].append(float(assessment.recommended_ect_amount))
+        entries.append({
+            'id': household.pk,
+            'name': household.name,
+            'barangay': household.barangay,
+            'assessment_count': household.assessment_count,
+            'partial_damage_count': household.partial_damage_count,
+            'total_damage_count': household.total_damage_count,
+            'repeat_damage': household.damaged_count >= 2,
+            'series': series,
+        })
+    return {'disasters': disasters, 'households': entries}
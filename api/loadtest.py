@@ -0,0 +1,189 @@
+"""
+Small asyncio HTTP load generator for comparing WSGI and ASGI deployments.
+
+Each simulated client holds one keep-alive HTTP/1.1 connection and sends requests
+back to back, cycling through the given paths, until the duration is up. A path is
+a string (sent with the run's method and body) or a (method, path, body) tuple. Only the
+standard library is used, so it runs anywhere manage.py does.
+
+run_mix() instead draws every request from a weighted mix of named endpoints and
+reports each endpoint separately.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+
+@dataclass
+class LoadResult:
+    """Outcome of one load run against one base URL."""
+    url: str
+    concurrency: int
+    duration: float
+    latencies: list = field(default_factory=list)
+    served_latencies: list = field(default_factory=list)  # 2xx responses only
+    statuses: dict = field(default_factory=dict)
+    errors: int = 0
+    coalesced: int = 0
+    bytes_received: int = 0
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def rps(self):
+        return self.requests / self.duration if self.duration else 0.0
+
+    @property
+    def error_rate(self):
+        """Share of attempts that failed: connection errors, timeouts and non-2xx responses."""
+        attempts = self.requests + self.errors
+        return 1 - len(self.served_latencies) / attempts if attempts else 0.0
+
+    def percentile(self, p, served=False):
+        """Latency percentile in milliseconds (nearest rank); served=True counts only 2xx responses."""
+        latencies = self.served_latencies if served else self.latencies
+        if not latencies:
+            return float('nan')
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+
+async def _read_response(reader):
+    """Reads one HTTP/1.1 response; returns (status, headers, body length, keep-alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by server')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        size = 0
+        while True:
+            chunk_size = int((await reader.readline()).split(b';')[0], 16)
+            if chunk_size == 0:
+                await reader.readline()
+                break
+            await reader.readexactly(chunk_size + 2)
+            size += chunk_size
+    elif 'content-length' in headers:
+        size = int(headers['content-length'])
+        await reader.readexactly(size)
+    else:
+        size = len(await reader.read())
+        return status, headers, size, False
+    return status, headers, size, headers.get('connection', '').lower() != 'close'
+
+
+async def _client(base, requests, deadline, timeout):
+    """
+    One simulated client: a keep-alive connection, reopened after errors.
+    `requests` yields (result, method, path, body); each outcome is recorded on its result.
+    """
+    host, port = base.hostname, base.port or 80
+    reader = writer = None
+    for result, request_method, path, request_body in requests:
+        if time.perf_counter() >= deadline:
+            break
+        payload = json.dumps(request_body).encode() if request_body is not None else b''
+        request = (
+            f'{request_method} {base.path.rstrip("/")}{path} HTTP/1.1\r\n'
+            f'Host: {base.netloc}\r\nAccept-Encoding: gzip\r\nConnection: keep-alive\r\n'
+        )
+        if payload:
+            request += f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n'
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(request.encode('latin-1') + b'\r\n' + payload)
+            status, headers, size, keep_alive = await asyncio.wait_for(_read_response(reader), timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        elapsed = time.perf_counter() - started
+        result.latencies.append(elapsed)
+        if 200 <= status < 300:
+            result.served_latencies.append(elapsed)
+        result.statuses[status] = result.statuses.get(status, 0) + 1
+        result.bytes_received += size
+        # Set by api.surge when the response was shared with an identical in-flight request
+        if 'x-coalesced' in headers:
+            result.coalesced += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _cycle(paths, offset, result, method, body):
+    for path in itertools.islice(itertools.cycle(paths), offset, None):
+        yield (result, method, path, body) if isinstance(path, str) else (result, *path)
+
+
+async def run_load(url, paths, concurrency=500, duration=10.0, timeout=30.0, method='GET', body=None):
+    """Runs `concurrency` clients against url + each path for `duration` seconds."""
+    base = urlsplit(url)
+    result = LoadResult(url=url, concurrency=concurrency, duration=duration)
+    started = time.perf_counter()
+    deadline = started + duration
+    # Clients start at different offsets so every path sees traffic from the start
+    await asyncio.gather(*(
+        _client(base, _cycle(paths, i % len(paths), result, method, body), deadline, timeout)
+        for i in range(concurrency)
+    ))
+    # Requests in flight at the deadline are allowed to finish and count
+    result.duration = time.perf_counter() - started
+    return result
+
+
+def _draw(mix, results, rng):
+    names = list(mix)
+    weights = [mix[name][0] for name in names]
+    while True:
+        name = rng.choices(names, weights)[0]
+        yield (results[name], *mix[name][1](rng))
+
+
+async def run_mix(url, mix, concurrency=50, duration=10.0, timeout=30.0, seed=0):
+    """
+    Runs `concurrency` clients for `duration` seconds, each request drawn from
+    mix = {name: (weight, make_request)}, where make_request(rng) returns (method, path, body).
+    Returns {name: LoadResult}.
+    """
+    base = urlsplit(url)
+    results = {name: LoadResult(url=url, concurrency=concurrency, duration=duration) for name in mix}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(base, _draw(mix, results, random.Random(seed * 100_003 + i)), started + duration, timeout)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    for result in results.values():
+        result.duration = elapsed
+    return results
+
+
+def run(url, paths, **kwargs):
+    """Synchronous entry point for management commands."""
+    return asyncio.run(run_load(url, paths, **kwargs))
+
+
+def mix(url, mix, **kwargs):
+    """Synchronous entry point for run_mix()."""
+    return asyncio.run(run_mix(url, mix, **kwargs))
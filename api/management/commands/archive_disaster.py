@@ -0,0 +1,99 @@
+"""
+Management command to move a closed disaster's assessments to cold storage, or back.
+Run with: python manage.py archive_disaster <disaster_id> [--restore] [--vacuum]
+
+Prints the assessment table size and the time of typical queries on the remaining
+disasters (per-status aggregate, first list page) before and after.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+
+from api.archive import ArchiveError, archive_disaster, restore_disaster, table_size_bytes
+from api.models import DisasterEvent, DamageAssessment, ArchivedAssessmentBatch
+
+
+def _format_bytes(size):
+    return 'n/a' if size is None else f'{size / 1_048_576:,.1f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Archives (or with --restore, restores) the assessments of a closed disaster'
+
+    def add_arguments(self, parser):
+        parser.add_argument('disaster_id', type=int)
+        parser.add_argument('--restore', action='store_true', help='Move archived assessments back')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='VACUUM afterwards so the database file shrinks (SQLite)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per timed query')
+
+    def handle(self, *args, **options):
+        try:
+            disaster = DisasterEvent.objects.get(pk=options['disaster_id'])
+        except DisasterEvent.DoesNotExist:
+            raise CommandError(f'Disaster {options["disaster_id"]} not found')
+
+        before = self.measure(disaster, options['repeat'])
+        try:
+            if options['restore']:
+                started = time.perf_counter()
+                report = restore_disaster(disaster)
+                summary = f'Restored {report["rows"]:,} assessments in {time.perf_counter() - started:.2f}s'
+                if report['skipped']:
+                    summary += f' (skipped {report["skipped"]:,} of deleted households)'
+            else:
+                report = archive_disaster(disaster)
+                summary = (
+                    f'Archived {report["rows"]:,} assessments in {report["batches"]} batches in '
+                    f'{report["seconds"]:.2f}s ({_format_bytes(report["raw_bytes"])} JSON -> '
+                    f'{_format_bytes(report["compressed_bytes"])} compressed)'
+                )
+        except ArchiveError as e:
+            raise CommandError(str(e))
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+        after = self.measure(disaster, options['repeat'])
+
+        self.stdout.write(f'{"":<28} {"before":>12} {"after":>12}')
+        for label, key in [
+            ('hot assessments', 'hot_rows'),
+            ('assessment table', 'table_size'),
+            ('archive table', 'archive_size'),
+            ('active summary ms', 'summary_ms'),
+            ('active list page ms', 'list_ms'),
+        ]:
+            self.stdout.write(f'{label:<28} {self.cell(key, before[key]):>12} {self.cell(key, after[key]):>12}')
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {disaster.name}: {summary}'))
+
+    def cell(self, key, value):
+        if key == 'hot_rows':
+            return f'{value:,}'
+        if key.endswith('_size'):
+            return _format_bytes(value)
+        return 'n/a' if value is None else f'{value:.1f}'
+
+    def measure(self, disaster, repeat):
+        active = DamageAssessment.objects.filter(disaster__is_active=True).exclude(disaster=disaster)
+        return {
+            'hot_rows': DamageAssessment.objects.count(),
+            'table_size': table_size_bytes(DamageAssessment),
+            'archive_size': table_size_bytes(ArchivedAssessmentBatch),
+            'summary_ms': self.best_of(repeat, lambda: list(
+                active.values('disaster_id', 'damage_status').order_by()
+                .annotate(households=Count('id'), ect_total=Sum('recommended_ect_amount'))
+            )),
+            'list_ms': self.best_of(repeat, lambda: list(
+                active.select_related('household', 'disaster').order_by('-id')[:100]
+            )),
+        }
+
+    def best_of(self, repeat, query):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
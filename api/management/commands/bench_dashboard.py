@@ -0,0 +1,171 @@
+"""
+Headless benchmark of the dashboard map and household list.
+Run with:
+    python manage.py bench_dashboard                                   # synthetic disaster, 100k households
+    python manage.py bench_dashboard --households 20000 --frames 240
+    python manage.py bench_dashboard --disaster 1 --chrome /usr/bin/chromium
+
+Starts the project in this process (static files included) and opens
+/benchmark/map/ (templates/map_benchmark.html) in headless Chrome/Chromium. The page
+loads the disaster through the same code as the dashboard (static/js/household_map.js)
+and reports load time (download and decode in the worker, store build, first draw)
+and per-frame times while panning/zooming the map and scrolling the list; the
+results are POSTed back here and printed.
+
+Without a browser on PATH (or --chrome), the page URL is printed to open in any
+browser while the command waits. Leaflet comes from its CDN, so the browser needs
+internet access. Without --disaster a synthetic disaster is created and deleted.
+"""
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import synthetic
+from api.models import Household, DisasterEvent
+
+from .loadtest_surge import serve
+
+
+BROWSERS = ('chromium', 'chromium-browser', 'google-chrome', 'google-chrome-stable', 'chrome')
+
+
+class ReportReceiver:
+    """Accepts the benchmark page's results (a navigator.sendBeacon POST)."""
+
+    def __init__(self):
+        self.results = None
+        self.received = threading.Event()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/'
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self.send_response(204)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                try:
+                    receiver.results = json.loads(body)
+                except ValueError:
+                    return
+                receiver.received.set()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Command(BaseCommand):
+    help = 'Measures dashboard load and frame times in a headless browser against an in-process server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--disaster', type=int, help='Disaster to load instead of a synthetic one')
+        parser.add_argument('--households', type=int, default=100_000, help='Size of the synthetic disaster')
+        parser.add_argument('--frames', type=int, default=120, help='Frames per pan/zoom and list scroll phase')
+        parser.add_argument('--chrome', help='Chrome/Chromium binary (default: looked up on PATH)')
+        parser.add_argument('--timeout', type=float, default=300, help='Seconds to wait for the results')
+
+    def handle(self, *args, **options):
+        browser = options['chrome'] or next(filter(None, map(shutil.which, BROWSERS)), None)
+
+        synthetic_ids = None
+        if options['disaster']:
+            if not DisasterEvent.objects.filter(pk=options['disaster']).exists():
+                raise CommandError(f'Disaster {options["disaster"]} not found')
+            disaster_id = options['disaster']
+        else:
+            self.stdout.write(f'Creating a synthetic disaster with {options["households"]:,} households...')
+            with transaction.atomic():
+                disaster = synthetic.create_disaster('Dashboard Benchmark Typhoon')
+                synthetic_ids = synthetic.create_households(options['households'], seed=45)
+                synthetic.create_assessments(disaster, synthetic_ids, seed=45)
+            disaster_id = disaster.pk
+
+        receiver = ReportReceiver().start()
+        try:
+            with serve(settings.MIDDLEWARE, static_files=True) as url:
+                page = (f'{url}/benchmark/map/?disaster_id={disaster_id}&frames={options["frames"]}'
+                        f'&report={quote(receiver.url, safe="")}')
+                results = self.run_page(page, browser, receiver, options['timeout'])
+        finally:
+            receiver.stop()
+            if synthetic_ids is not None:
+                self.stdout.write('Deleting the synthetic disaster...')
+                with transaction.atomic():
+                    DisasterEvent.objects.filter(pk=disaster_id).delete()
+                    Household.objects.filter(pk__in=synthetic_ids).delete()
+
+        if 'error' in results:
+            raise CommandError(f'The benchmark page failed: {results["error"]}')
+        self.report(results)
+        self.stdout.write(self.style.SUCCESS('\n✓ Dashboard benchmark finished'))
+
+    def run_page(self, page, browser, receiver, timeout):
+        if not browser:
+            self.stdout.write(f'No Chrome/Chromium found (use --chrome); open this page in a browser:\n  {page}')
+            if not receiver.received.wait(timeout):
+                raise CommandError(f'No results within {timeout:.0f}s')
+            return receiver.results
+
+        self.stdout.write(f'Running {page} in {browser}...')
+        with tempfile.TemporaryDirectory() as profile:
+            process = subprocess.Popen(
+                [browser, '--headless=new', '--no-sandbox', '--no-first-run', '--window-size=1400,900',
+                 f'--user-data-dir={profile}', page],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                if not receiver.received.wait(timeout):
+                    raise CommandError(f'No results within {timeout:.0f}s')
+            finally:
+                process.terminate()
+                process.wait(10)
+        return receiver.results
+
+    def report(self, results):
+        load = results['load']
+        self.stdout.write(f'\n{results["households"]:,} households ({results["user_agent"]})')
+        self.stdout.write(
+            f'Load: {load["total_ms"]:,.0f} ms until drawn (download {load["fetch_ms"]:,.0f}, '
+            f'decode {load["decode_ms"]:,.0f} in the worker; store {load["store_ms"]:,.0f}, '
+            f'first draw {load["first_draw_ms"]:,.1f}, list {load["first_list_ms"]:,.1f})'
+        )
+        long_tasks = results['load_long_tasks']
+        self.stdout.write(f'  main-thread long tasks while loading: {long_tasks["count"]} ({long_tasks["total_ms"]:,} ms)')
+        self.stdout.write(f'  {"phase":<22} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8}')
+        rows = [
+            ('pan/zoom draw', results['pan_zoom']['draw_ms']),
+            ('pan/zoom frame', results['pan_zoom']['frame_ms']),
+            ('list scroll render', results['list_scroll']['render_ms']),
+            ('list scroll frame', results['list_scroll']['frame_ms']),
+        ]
+        for name, stats in rows:
+            self.stdout.write(f'  {name:<22} {stats["p50"]:>8.1f} {stats["p95"]:>8.1f} {stats["max"]:>8.1f}')
+        self.stdout.write(
+            f'  markers drawn per frame: p50 {results["pan_zoom"]["markers_drawn"]["p50"]:,.0f} '
+            f'(the rest culled or on an occupied cell); list rows in the DOM: {results["list_scroll"]["rows_in_dom"]}'
+        )
@@ -0,0 +1,125 @@
+"""
+Benchmark of JSON encoding and response compression for large map and list payloads.
+Run with: python manage.py bench_json [--features 100000]
+
+Payloads are generated in memory; the database is not touched.
+"""
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from api import middleware, renderers
+from api.columnar import encode_columns
+from api.views import household_feature
+
+
+def _timed(function, repeat=3):
+    """Best of `repeat` runs, in milliseconds, and the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+class Command(BaseCommand):
+    help = 'Compares stdlib json with the fast renderer, and gzip/brotli sizes, for 100k-feature payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--features', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=34)
+
+    def handle(self, *args, **options):
+        count = options['features']
+        rng = random.Random(options['seed'])
+        self.stdout.write(f'Building {count:,} features (fast encoder: {"orjson" if renderers.orjson else "stdlib fallback"}, '
+                          f'brotli: {"yes" if middleware.brotli else "not installed"})\n')
+
+        payloads = {
+            'geojson': self.geojson_payload(count, rng),
+            'assessment rows': self.assessment_rows(count, rng),
+            'columnar': self.columnar_payload(count, rng),
+        }
+
+        self.stdout.write(f'{"payload":<17} {"encoder":<10} {"encode ms":>10} {"bytes":>12}')
+        encoded = {}
+        for name, data in payloads.items():
+            stdlib_ms, stdlib_bytes = _timed(lambda: json.dumps(data, cls=DjangoJSONEncoder).encode())
+            fast_ms, fast_bytes = _timed(lambda: renderers.dumps(data))
+            self.stdout.write(f'{name:<17} {"stdlib":<10} {stdlib_ms:>10.0f} {len(stdlib_bytes):>12,}')
+            self.stdout.write(f'{name:<17} {"fast":<10} {fast_ms:>10.0f} {len(fast_bytes):>12,}  '
+                              f'({stdlib_ms / fast_ms:.1f}x faster)')
+            encoded[name] = fast_bytes
+
+        self.stdout.write(f'\n{"payload":<17} {"encoding":<10} {"compress ms":>11} {"bytes on wire":>14} {"per feature":>12}')
+        for name, body in encoded.items():
+            self.stdout.write(f'{name:<17} {"identity":<10} {0:>11.0f} {len(body):>14,} {len(body) / count:>12.1f}')
+            for encoding in ('gzip', 'br'):
+                if encoding == 'br' and middleware.brotli is None:
+                    continue
+                elapsed, compressed = _timed(lambda: middleware.compress_bytes(body, encoding), repeat=1)
+                self.stdout.write(f'{name:<17} {encoding:<10} {elapsed:>11.0f} {len(compressed):>14,} '
+                                  f'{len(compressed) / count:>12.1f}')
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Benchmark finished'))
+
+    def geojson_payload(self, count, rng):
+        features = []
+        for i in range(count):
+            household = SimpleNamespace(
+                id=i + 1,
+                name=f'Household {i + 1}',
+                address=f'{rng.randint(1, 999)} Rizal Street, Barangay {i % 50 + 1}',
+                barangay=f'Barangay {i % 50 + 1}',
+                contact_number=f'+6391{rng.randint(10_000_000, 99_999_999)}',
+                latitude=Decimal(f'{14.5 + rng.random() * 0.2:.6f}'),
+                longitude=Decimal(f'{120.9 + rng.random() * 0.2:.6f}'),
+            )
+            status = rng.choice(['NONE', 'PARTIAL', 'TOTAL'])
+            assessment = SimpleNamespace(
+                damage_status=status,
+                recommended_ect_amount=Decimal({'NONE': '0', 'PARTIAL': '5000', 'TOTAL': '10000'}[status]),
+                flood_depth_meters=Decimal(f'{rng.random() * 3:.2f}'),
+            )
+            features.append(household_feature(household, assessment))
+        return {'type': 'FeatureCollection', 'features': features, 'cursor': '0'}
+
+    def assessment_rows(self, count, rng):
+        # Shaped like queryset.values(): Decimals and datetimes left for the encoder
+        now = timezone.now()
+        return [
+            {
+                'id': i + 1,
+                'household_id': i + 1,
+                'disaster_id': 1,
+                'damage_status': 'PARTIAL',
+                'flood_depth_meters': Decimal(f'{rng.random() * 3:.2f}'),
+                'recommended_ect_amount': Decimal('5000.00'),
+                'notes': '',
+                'assessed_by': 'Field team',
+                'updated_at': now - timedelta(seconds=i),
+            }
+            for i in range(count)
+        ]
+
+    def columnar_payload(self, count, rng):
+        generator = np.random.default_rng(rng.randint(0, 2 ** 32))
+        columns = {
+            'id': np.arange(1, count + 1, dtype=np.int32),
+            'lon': generator.integers(120_900_000, 121_100_000, count, dtype=np.int32),
+            'lat': generator.integers(14_500_000, 14_700_000, count, dtype=np.int32),
+            'status': generator.integers(0, 3, count, dtype=np.uint8),
+            'ect_centavos': generator.choice([0, 500_000, 1_000_000], count).astype(np.int32),
+            'flood_depth_cm': generator.integers(-1, 300, count, dtype=np.int32),
+            'barangay': generator.integers(0, 50, count, dtype=np.uint16),
+        }
+        return {'type': 'HouseholdColumns', 'count': count, 'columns': encode_columns(columns)}
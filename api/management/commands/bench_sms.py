@@ -0,0 +1,148 @@
+"""
+Offline benchmark of the SMS pipeline: outbox, rate-limited sender, retries, dead letters and receipts.
+Run with: python manage.py bench_sms [--messages 100000] [--rate 1000] [--capacity 1200]
+
+Everything runs in this process: the stub gateway (sms_gateway_stub) with injected
+failures, the project's WSGI app receiving its delivery receipts, and SmsSender
+workers. Synthetic messages (no assessment, campaign "bench") are queued for a
+"bench" provider, drained, checked and deleted again (unless --keep).
+"""
+import logging
+import secrets
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api.bulk import bulk_insert_rows, db_now
+from api.models import SmsMessage
+from api.sms import OUTBOX_INSERT_FIELDS, SmsSender
+
+from .loadtest_surge import serve
+from .sms_gateway_stub import StubGateway
+
+
+CAMPAIGN = 'bench'
+PROVIDER = 'bench'
+
+
+class Command(BaseCommand):
+    help = 'Pushes synthetic SMS through the outbox, sender and receipt callback against a local stub gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=100_000)
+        parser.add_argument('--rate', type=float, default=1000, help="Sender's rate limit, messages per second")
+        parser.add_argument('--capacity', type=float, default=1200, help="Gateway's limit before 429s")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--latency-ms', type=float, default=20)
+        parser.add_argument('--fail-rate', type=float, default=0.02)
+        parser.add_argument('--reject-rate', type=float, default=0.005)
+        parser.add_argument('--undelivered-rate', type=float, default=0.03)
+        parser.add_argument('--receipt-timeout', type=float, default=60, help='Seconds to wait for the last receipts')
+        parser.add_argument('--keep', action='store_true', help='Leave the bench messages in the outbox')
+
+    def handle(self, *args, **options):
+        if SmsMessage.objects.filter(provider=PROVIDER).exclude(campaign=CAMPAIGN).exists():
+            raise CommandError(f'Provider name "{PROVIDER}" is in use by real messages')
+        SmsMessage.objects.filter(provider=PROVIDER).delete()
+        # Retries are part of the run: keep backoff short so the bench doesn't wait minutes
+        with override_settings(SMS_RETRY_BASE_SECONDS=0.5, SMS_RETRY_MAX_SECONDS=5):
+            try:
+                self.run(options)
+            finally:
+                if not options['keep']:
+                    SmsMessage.objects.filter(provider=PROVIDER).delete()
+
+    def run(self, options):
+        count = options['messages']
+        logging.getLogger('api.sms').setLevel(logging.CRITICAL)
+
+        receipt_token = secrets.token_urlsafe()
+        with serve(settings.MIDDLEWARE) as base_url:
+            gateway = StubGateway(
+                0, options['capacity'], options['latency_ms'], options['fail_rate'], options['reject_rate'],
+                options['undelivered_rate'], f'{base_url}/api/sms/receipts/{PROVIDER}/', receipt_token=receipt_token,
+            ).start()
+            providers = {**getattr(settings, 'SMS_PROVIDERS', {}), PROVIDER: {
+                'class': 'api.sms.HttpGatewayProvider', 'url': gateway.url, 'receipt_token': receipt_token,
+                'rate_per_second': options['rate'],
+                'burst': max(options['rate'] / 5, options['batch_size']), 'batch_size': options['batch_size'],
+            }}
+            try:
+                with override_settings(SMS_PROVIDERS=providers):
+                    self.enqueue(count)
+                    elapsed, sender = self.send(options['workers'])
+                    receipts_elapsed = self.wait_for_receipts(options['receipt_timeout'])
+            finally:
+                gateway.stop()
+
+        stats = sender.stats
+        self.stdout.write(f'Sent {stats["sent"]:,} in {elapsed:.1f}s: {stats["sent"] / elapsed:,.0f}/s '
+                          f'(limit {options["rate"]:,.0f}/s, gateway capacity {options["capacity"]:,.0f}/s); '
+                          f'{stats["throttled_seconds"]:.1f}s waited on the rate limit across workers')
+        self.stdout.write(f'Gateway: {gateway.stats["requests"]:,} batches accepted, '
+                          f'{gateway.stats["throttled_requests"]:,} got 429, {gateway.stats["failed_requests"]:,} got 503, '
+                          f'{gateway.stats["rejected"]:,} numbers rejected, '
+                          f'{gateway.stats["receipts_posted"]:,} receipts posted')
+        self.stdout.write(f'Retries scheduled: {stats["retried"]:,}; resent after 429: {stats["throttled"]:,}; '
+                          f'dead-lettered: {stats["dead"]:,}; '
+                          f'last receipt {receipts_elapsed:.1f}s after the outbox drained')
+
+        messages = SmsMessage.objects.filter(provider=PROVIDER)
+        counts = dict(messages.order_by().values_list('status').annotate(count=Count('id')))
+        attempts = messages.aggregate(total=Sum('attempts'))['total'] or 0
+        self.stdout.write('Final: ' + ', '.join(f'{value} {counts.get(value, 0):,}' for value in SmsMessage.Status.values)
+                          + f'; {attempts / count:.3f} attempts per message')
+
+        unfinished = sum(counts.get(value, 0) for value in (SmsMessage.Status.QUEUED, SmsMessage.Status.SENDING,
+                                                            SmsMessage.Status.SENT))
+        if unfinished:
+            raise CommandError(f'{unfinished:,} messages never reached a final status')
+        if stats['sent'] / elapsed > options['rate'] * 1.05:
+            raise CommandError('The sender exceeded its rate limit')
+        self.stdout.write(self.style.SUCCESS(f'✓ All {count:,} messages reached a final status'))
+
+    def enqueue(self, count):
+        started = time.perf_counter()
+        now = db_now(timezone.now())
+        rows = (
+            (None, CAMPAIGN, f'+63917{i:07d}', f'Bench message {i}: ECT payout schedule for your barangay.',
+             PROVIDER, SmsMessage.Status.QUEUED, 0, now, '', '', now)
+            for i in range(count)
+        )
+        with transaction.atomic():
+            bulk_insert_rows(SmsMessage, OUTBOX_INSERT_FIELDS, rows)
+        self.stdout.write(f'Queued {count:,} messages in {time.perf_counter() - started:.1f}s')
+
+    def send(self, workers):
+        sender = SmsSender(PROVIDER)
+
+        def work():
+            try:
+                sender.run(poll_seconds=0.2)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, sender
+
+    def wait_for_receipts(self, timeout):
+        started = time.perf_counter()
+        deadline = timezone.now() + timedelta(seconds=timeout)
+        while SmsMessage.objects.filter(provider=PROVIDER, status=SmsMessage.Status.SENT).exists():
+            if timezone.now() > deadline:
+                break
+            time.sleep(0.2)
+        return time.perf_counter() - started
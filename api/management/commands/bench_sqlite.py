@@ -0,0 +1,187 @@
+"""
+Benchmark of concurrent reads during bulk assessment ingest on SQLite.
+Run with: python manage.py bench_sqlite [--rows 200000] [--writers 2] [--readers 8] [--duration 10]
+
+Compares three setups, each on fresh files in a temporary directory:
+- default: SQLite's defaults (rollback journal, synchronous=FULL, deferred transactions)
+- tuned: the connection profile in settings.SQLITE_OPTIONS
+- tuned + replica: tuned, with readers on a second file copied from the primary
+  with the backup API every --sync-interval seconds (as sync_replica does)
+
+Writers update assessments in batches, like bulk ingest and offline sync. Readers
+run the summary aggregate and a list page, like the dashboard.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.management.commands.sync_replica import backup
+
+
+STATUSES = ('NONE', 'PARTIAL', 'TOTAL')
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Profile:
+    """How connections are opened and transactions begun for one setup."""
+
+    def __init__(self, name, pragmas=(), begin='BEGIN', replica=False):
+        self.name = name
+        self.pragmas = pragmas
+        self.begin = begin
+        self.replica = replica
+
+    def connect(self, path):
+        # Autocommit at the driver level; transactions are begun explicitly
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+
+def tuned_profile(name, replica=False):
+    options = getattr(settings, 'SQLITE_OPTIONS', {})
+    pragmas = [command.strip() for command in options.get('init_command', '').split(';') if command.strip()]
+    mode = options.get('transaction_mode')
+    return Profile(name, pragmas, f'BEGIN {mode}' if mode else 'BEGIN', replica)
+
+
+class Command(BaseCommand):
+    help = 'Measures concurrent read/write throughput on SQLite with default vs tuned settings and a replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--batch', type=int, default=500, help='Rows updated per write transaction')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per setup')
+        parser.add_argument('--sync-interval', type=float, default=2, help='Seconds between replica copies')
+
+    def handle(self, *args, **options):
+        profiles = [
+            Profile('default'),
+            tuned_profile('tuned'),
+            tuned_profile('tuned + replica', replica=True),
+        ]
+        self.stdout.write(f'{options["rows"]:,} assessments, {options["writers"]} writers x {options["batch"]} rows, '
+                          f'{options["readers"]} readers, {options["duration"]:.0f}s per setup\n')
+        self.stdout.write(f'{"setup":<16} {"rows written/s":>14} {"reads/s":>9} {"read p50 ms":>11} '
+                          f'{"read p99 ms":>11} {"write p99 ms":>12} {"lock errors":>11}')
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run_profile(profile, directory, options)
+            self.stdout.write(
+                f'{profile.name:<16} {result["rows_per_sec"]:>14,.0f} {result["reads_per_sec"]:>9,.0f} '
+                f'{result["read_p50"]:>11.1f} {result["read_p99"]:>11.1f} {result["write_p99"]:>12.1f} '
+                f'{result["lock_errors"]:>11}'
+            )
+        self.stdout.write(self.style.SUCCESS('\n✓ Benchmark finished'))
+
+    def seed(self, profile, path, rows):
+        conn = profile.connect(path)
+        conn.executescript('''
+            CREATE TABLE assessment (
+                id INTEGER PRIMARY KEY, household_id INTEGER, disaster_id INTEGER,
+                damage_status TEXT, flood_depth_meters REAL, recommended_ect_amount REAL, updated_at REAL
+            );
+            CREATE INDEX assessment_disaster ON assessment (disaster_id, damage_status);
+        ''')
+        rng = random.Random(38)
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO assessment VALUES (?, ?, 1, ?, ?, ?, ?)',
+            ((i, i, rng.choice(STATUSES), rng.random() * 3, 5000.0, time.time()) for i in range(1, rows + 1)),
+        )
+        conn.execute('COMMIT')
+        conn.close()
+
+    def run_profile(self, profile, directory, options):
+        primary = os.path.join(directory, 'primary.sqlite3')
+        replica = os.path.join(directory, 'replica.sqlite3')
+        self.seed(profile, primary, options['rows'])
+        if profile.replica:
+            backup(primary, replica)
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {'rows': 0, 'reads': 0, 'lock_errors': 0, 'read_latency': [], 'write_latency': []}
+
+        def record(key, latency=None, count=1):
+            with lock:
+                stats[key] += count
+                if latency is not None:
+                    stats['read_latency' if key == 'reads' else 'write_latency'].append(latency * 1000)
+
+        def writer(seed):
+            conn = profile.connect(primary)
+            rng = random.Random(seed)
+            while not stop.is_set():
+                batch = [(rng.choice(STATUSES), rng.random() * 3, time.time(), rng.randint(1, options['rows']))
+                         for _ in range(options['batch'])]
+                started = time.perf_counter()
+                try:
+                    conn.execute(profile.begin)
+                    conn.executemany('UPDATE assessment SET damage_status = ?, flood_depth_meters = ?, '
+                                     'updated_at = ? WHERE id = ?', batch)
+                    conn.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    record('lock_errors')
+                    continue
+                record('rows', time.perf_counter() - started, count=len(batch))
+            conn.close()
+
+        def reader(seed):
+            conn = profile.connect(replica if profile.replica else primary)
+            rng = random.Random(seed)
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    conn.execute('SELECT damage_status, COUNT(*), SUM(recommended_ect_amount) FROM assessment '
+                                 'WHERE disaster_id = 1 GROUP BY damage_status').fetchall()
+                    conn.execute('SELECT * FROM assessment WHERE disaster_id = 1 ORDER BY id LIMIT 100 OFFSET ?',
+                                 (rng.randrange(options['rows']),)).fetchall()
+                except sqlite3.OperationalError:
+                    record('lock_errors')
+                    continue
+                record('reads', time.perf_counter() - started)
+            conn.close()
+
+        def syncer():
+            while not stop.wait(options['sync_interval']):
+                backup(primary, replica)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=reader, args=(100 + i,)) for i in range(options['readers'])]
+        if profile.replica:
+            threads.append(threading.Thread(target=syncer))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'rows_per_sec': stats['rows'] / elapsed,
+            'reads_per_sec': stats['reads'] / elapsed,
+            'read_p50': _percentile(stats['read_latency'], 50),
+            'read_p99': _percentile(stats['read_latency'], 99),
+            'write_p99': _percentile(stats['write_latency'], 99),
+            'lock_errors': stats['lock_errors'],
+        }
@@ -0,0 +1,88 @@
+"""
+Benchmark of the in-process columnar store against the ORM for disaster summaries.
+Run with: python manage.py bench_store <disaster_id> [--updates 1000]
+
+Updates made to measure incremental refresh are rolled back afterwards.
+"""
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api.models import Household, DisasterEvent, DamageAssessment
+from api.store import ColumnarStore
+
+
+def _timed(function):
+    started = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - started) * 1000, result
+
+
+class Command(BaseCommand):
+    help = 'Compares disaster summaries from ORM rows with the columnar store (cold, warm and incremental)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('disaster_id', type=int)
+        parser.add_argument('--updates', type=int, default=1000,
+                            help='Assessments changed before measuring an incremental refresh')
+
+    def handle(self, *args, **options):
+        disaster_id = options['disaster_id']
+        if not DisasterEvent.objects.filter(pk=disaster_id).exists():
+            raise CommandError(f'Disaster {disaster_id} not found')
+
+        rows = [
+            ('ORM instances + Python summary', lambda: self.orm_summary(disaster_id)),
+            ('ORM aggregate query', lambda: self.orm_aggregate(disaster_id)),
+        ]
+        # No overlap, so the incremental refresh below re-reads only what changed
+        with override_settings(CHANGE_FEED_OVERLAP_SECONDS=0):
+            store = ColumnarStore()
+            rows += [
+                ('store: cold load + summary', lambda: store.frame(disaster_id, max_age=0).summary()),
+                ('store: warm summary', lambda: store.frame(disaster_id).summary()),
+                ('store: filtered summary', lambda: store.frame(disaster_id).summary(statuses=['TOTAL'])),
+            ]
+            for label, function in rows:
+                elapsed, _ = _timed(function)
+                self.stdout.write(f'{label:<36} {elapsed:>10.1f} ms')
+
+            with transaction.atomic():
+                changed = self.touch_assessments(disaster_id, options['updates'])
+                elapsed, frame = _timed(lambda: store.frame(disaster_id, max_age=0))
+                self.stdout.write(f'{f"store: refresh after {changed} updates":<36} {elapsed:>10.1f} ms')
+                transaction.set_rollback(True)
+
+        self.stdout.write(f'\nStore holds {len(frame):,} households in {store.nbytes / 1e6:.1f}MB')
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark finished; updates rolled back'))
+
+    def orm_summary(self, disaster_id):
+        households = list(Household.objects.all())
+        assessments = {a.household_id: a for a in DamageAssessment.objects.filter(disaster_id=disaster_id)}
+        per_barangay = defaultdict(lambda: [0, 0])
+        for household in households:
+            assessment = assessments.get(household.id)
+            per_barangay[household.barangay][0] += 1
+            if assessment is not None:
+                per_barangay[household.barangay][1] += assessment.recommended_ect_amount
+        return per_barangay
+
+    def orm_aggregate(self, disaster_id):
+        return list(
+            DamageAssessment.objects.filter(disaster_id=disaster_id)
+            .values('household__barangay', 'damage_status')
+            .annotate(households=Count('id'), ect_amount=Sum('recommended_ect_amount'))
+        )
+
+    def touch_assessments(self, disaster_id, count):
+        ids = list(DamageAssessment.objects.filter(disaster_id=disaster_id).values_list('id', flat=True)[:count])
+        time.sleep(0.01)
+        # queryset.update() skips auto_now, so updated_at is set explicitly
+        return DamageAssessment.objects.filter(id__in=ids).update(
+            damage_status=DamageAssessment.DamageStatus.TOTAL, updated_at=timezone.now()
+        )
@@ -0,0 +1,91 @@
+"""
+Benchmark for the offline assessor sync endpoint.
+Run with: python manage.py bench_sync [--edits 10000]
+
+Works inside a transaction that is rolled back, so the database is left unchanged.
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.utils import timezone
+
+from api import synthetic
+from api.models import DamageAssessment
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks /api/assessments/sync/ with a queue of offline edits, its retry, and a conflicting upload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edits', type=int, default=10000)
+        parser.add_argument('--households', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['edits'], options['households'])
+            transaction.set_rollback(True)
+
+    def post(self, client, body):
+        started = time.perf_counter()
+        response = client.post('/api/assessments/sync/', body, content_type='application/json')
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f'sync returned {response.status_code}: {response.content[:500]}')
+        return response.json(), elapsed
+
+    def report(self, label, body, elapsed, edits):
+        outcomes = {}
+        for result in body['results']:
+            outcome = result['outcome'] + (' (duplicate)' if result.get('duplicate') else '')
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        self.stdout.write(
+            f'{label:<28} {elapsed:7.2f}s  {edits / elapsed:9,.0f} edits/s  '
+            f'{", ".join(f"{k}: {v}" for k, v in sorted(outcomes.items()))}  '
+            f'server changes: {len(body["changes"])}'
+        )
+
+    def run(self, edits, household_count):
+        self.stdout.write(f'Creating {household_count} synthetic households...')
+        disaster = synthetic.create_disaster('Sync Benchmark Typhoon')
+        household_ids = synthetic.create_households(household_count, seed=30)
+        synthetic.create_assessments(disaster, household_ids[: household_count // 2], seed=30)
+        client = Client()
+
+        # Device state: edits queued while offline, made after the last server write
+        since = str(int((timezone.now() - timedelta(minutes=5)).timestamp() * 1_000_000))
+        edit_time = timezone.now() + timedelta(seconds=1)
+        statuses = [choice for choice, _ in DamageAssessment.DamageStatus.choices]
+        changes = [
+            {
+                'idempotency_key': str(uuid.uuid4()),
+                'household': household_ids[i % len(household_ids)],
+                'disaster': disaster.pk,
+                'damage_status': statuses[i % len(statuses)],
+                'flood_depth_meters': f'{(i % 300) / 100:.2f}',
+                'assessed_by': 'Bench assessor',
+                'client_updated_at': (edit_time + timedelta(milliseconds=i)).isoformat(),
+            }
+            for i in range(edits)
+        ]
+        batch = {'client_id': 'bench-device', 'since': since, 'disaster_ids': [disaster.pk], 'changes': changes}
+
+        body, elapsed = self.post(client, batch)
+        self.report('Initial upload', body, elapsed, edits)
+
+        body, elapsed = self.post(client, batch)
+        self.report('Retry (same keys)', body, elapsed, edits)
+
+        # A second device with stale edits made before the server versions
+        stale_time = timezone.now() - timedelta(hours=1)
+        stale = [
+            {**change, 'idempotency_key': str(uuid.uuid4()), 'client_updated_at': stale_time.isoformat()}
+            for change in changes
+        ]
+        body, elapsed = self.post(client, {'client_id': 'stale-device', 'since': since,
+                                           'disaster_ids': [disaster.pk], 'changes': stale})
+        self.report('Stale upload (conflicts)', body, elapsed, edits)
+        self.stdout.write(self.style.SUCCESS('\n✓ Benchmark finished; all changes rolled back'))
@@ -0,0 +1,103 @@
+"""
+Local stand-in for the Gemini generateContent API, for load tests of /api/generate-sms/.
+Run with:
+    python manage.py llm_stub [--port 8030] [--latency-ms 800] [--error-rate 0.01]
+and set GEMINI_API_URL = 'http://127.0.0.1:8030/v1beta/models/gemini-pro:generateContent'
+(GEMINI_API_KEY can be any non-empty value).
+
+Every request gets a canned Tagalog SMS after a latency drawn around --latency-ms,
+like a hosted model; --error-rate of requests get 503 instead.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+REPLY = ('Magandang araw po! Kami po ay mula sa DSWD. Kayo po ay makatatanggap ng Emergency Cash '
+         'Transfer. Dalhin po ang valid ID sa barangay hall. Mag-ingat po kayo.')
+
+
+class StubLLM:
+    """A generateContent endpoint with model-like latency."""
+
+    def __init__(self, port=8030, latency_ms=800, error_rate=0.0):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/v1beta/models/gemini-pro:generateContent'
+
+    def generate(self):
+        """(status code, response body) for one generateContent request."""
+        # Roughly how hosted model latency spreads: most near the mean, a slow tail
+        time.sleep(self.latency * random.lognormvariate(0, 0.35))
+        if random.random() < self.error_rate:
+            with self.lock:
+                self.stats['errors'] += 1
+            return 503, {'error': {'code': 503, 'message': 'The model is overloaded.', 'status': 'UNAVAILABLE'}}
+        with self.lock:
+            self.stats['requests'] += 1
+        return 200, {'candidates': [{'content': {'parts': [{'text': REPLY}], 'role': 'model'},
+                                     'finishReason': 'STOP'}]}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not self.path.split('?')[0].endswith(':generateContent'):
+                    code, body = 404, {'error': {'code': 404, 'message': 'Not found'}}
+                else:
+                    code, body = stub.generate()
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Command(BaseCommand):
+    help = 'Runs a local generateContent endpoint with model-like latency for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8030)
+        parser.add_argument('--latency-ms', type=float, default=800, help='Typical response time')
+        parser.add_argument('--error-rate', type=float, default=0.01, help='Share of requests failing with 503')
+
+    def handle(self, *args, **options):
+        stub = StubLLM(options['port'], options['latency_ms'], options['error_rate']).start()
+        self.stdout.write(f'LLM stub on {stub.url} (Ctrl+C to stop)')
+        try:
+            while True:
+                time.sleep(10)
+                self.stdout.write(', '.join(f'{key} {value:,}' for key, value in sorted(stub.stats.items())))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.stop()
+        self.stdout.write(self.style.SUCCESS('✓ Stopped'))
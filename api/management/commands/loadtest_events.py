@@ -0,0 +1,162 @@
+"""
+Load test for the live assessment event stream.
+Run with:
+    python manage.py loadtest_events                                  # in-process broker fan-out ramp
+    python manage.py loadtest_events --url http://127.0.0.1:8000 --disaster 1 --subscribers 2000
+"""
+import asyncio
+import resource
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+from api.events import LocalBroker
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _rss_mb():
+    # ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Measures how many concurrent event-stream subscribers one worker can serve'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', default='1000,5000,10000,25000',
+                            help='Comma-separated subscriber counts to ramp through')
+        parser.add_argument('--events', type=int, default=50, help='Events published per step')
+        parser.add_argument('--rate', type=float, default=20, help='Events per second')
+        parser.add_argument('--target-p99-ms', type=float, default=250,
+                            help='A step passes if 99%% of deliveries arrive within this latency')
+        parser.add_argument('--url', help='Base URL of a running ASGI server; tests real SSE connections instead')
+        parser.add_argument('--disaster', type=int, default=1)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to hold connections (--url mode)')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            asyncio.run(self.http_test(options))
+            return
+
+        best = 0
+        for count in [int(value) for value in options['subscribers'].split(',')]:
+            result = asyncio.run(self.broker_step(count, options['events'], options['rate']))
+            passed = result['p99_ms'] <= options['target_p99_ms'] and result['delivered'] == count * options['events']
+            if passed:
+                best = count
+            style = self.style.SUCCESS if passed else self.style.WARNING
+            self.stdout.write(style(
+                f"{count:>7} subscribers | {result['deliveries_per_sec']:>10,.0f} deliveries/s | "
+                f"p50 {result['p50_ms']:.1f}ms p99 {result['p99_ms']:.1f}ms | "
+                f"dropped {result['dropped']} | RSS {result['rss_mb']:.0f}MB"
+            ))
+
+        self.stdout.write(f'\nLargest step within p99 {options["target_p99_ms"]:.0f}ms: {best} subscribers')
+
+    async def broker_step(self, count, events, rate):
+        broker = LocalBroker(max_queue=max(events, 100))
+        subscriptions = [broker.subscribe(1) for _ in range(count)]
+        latencies = []
+        delivered = 0
+        done = asyncio.Event()
+
+        async def consume(subscription, sample):
+            nonlocal delivered
+            for _ in range(events):
+                event = await subscription.get()
+                delivered += 1
+                if sample and 'sent' in event:
+                    latencies.append((time.perf_counter() - event['sent']) * 1000)
+            if delivered == count * events:
+                done.set()
+
+        # Latency is sampled on a subset so recording it does not dominate the run
+        sample_every = max(1, count // 200)
+        consumers = [asyncio.create_task(consume(sub, i % sample_every == 0)) for i, sub in enumerate(subscriptions)]
+
+        def publish():
+            # Publish from another thread, as model signals do
+            for i in range(events):
+                broker.publish(1, {'type': 'assessment', 'household_id': i, 'sent': time.perf_counter()})
+                time.sleep(1 / rate)
+
+        started = time.perf_counter()
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        try:
+            await asyncio.wait_for(done.wait(), timeout=events / rate + 60)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        publisher.join()
+
+        for task in consumers:
+            task.cancel()
+        dropped = sum(sub.dropped for sub in subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+
+        return {
+            'delivered': delivered,
+            'deliveries_per_sec': delivered / elapsed,
+            'p50_ms': statistics.median(latencies) if latencies else 0.0,
+            'p99_ms': _percentile(latencies, 99),
+            'dropped': dropped,
+            'rss_mb': _rss_mb(),
+        }
+
+    async def http_test(self, options):
+        url = urlsplit(options['url'])
+        host, port = url.hostname, url.port or 80
+        path = f"/api/disasters/{options['disaster']}/events/"
+        connected = 0
+        failed = 0
+        events_received = 0
+
+        async def subscriber():
+            nonlocal connected, failed, events_received
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode())
+                await writer.drain()
+                status_line = await reader.readline()
+                if b' 200 ' not in status_line:
+                    failed += 1
+                    writer.close()
+                    return
+                connected += 1
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        connected -= 1
+                        break
+                    if line.startswith(b'event:'):
+                        events_received += 1
+            except (OSError, asyncio.IncompleteReadError):
+                failed += 1
+
+        tasks = []
+        for _ in range(int(options['subscribers'].split(',')[-1])):
+            tasks.append(asyncio.create_task(subscriber()))
+            await asyncio.sleep(0)
+
+        started = time.perf_counter()
+        while time.perf_counter() - started < options['duration']:
+            await asyncio.sleep(5)
+            self.stdout.write(f'{time.perf_counter() - started:5.0f}s | connected {connected} | '
+                              f'failed {failed} | events received {events_received}')
+        for task in tasks:
+            task.cancel()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nHeld {connected} concurrent subscribers ({failed} failed), '
+            f'{events_received} events received, client RSS {_rss_mb():.0f}MB'
+        ))
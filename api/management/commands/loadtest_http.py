@@ -0,0 +1,70 @@
+"""
+Load test comparing the sync endpoints under WSGI with their async versions under ASGI.
+Run with:
+    python manage.py runserver 8000 --noreload                                 # WSGI (or gunicorn)
+    uvicorn BantayAyuda.asgi:application --port 8001                           # ASGI
+    python manage.py loadtest_http --wsgi-url http://127.0.0.1:8000 --asgi-url http://127.0.0.1:8001
+
+The WSGI server gets /api/... and the ASGI server gets /api/async/...; either URL can be left out.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api import loadtest
+
+
+ENDPOINTS = {
+    # name: (method, sync path, async path)
+    'geojson': ('GET', '/api/households/geojson/?disaster_id={disaster}',
+                '/api/async/households/geojson/?disaster_id={disaster}'),
+    'assessments': ('GET', '/api/assessments/?disaster_id={disaster}',
+                    '/api/async/assessments/?disaster_id={disaster}'),
+    'sms': ('POST', '/api/generate-sms/', '/api/async/generate-sms/'),
+}
+
+SMS_BODY = {'prompt': 'Gumawa ng maikling SMS para sa pamilyang nasalanta ng baha.',
+            'household_name': 'Load Test', 'damage_status': 'PARTIAL', 'ect_amount': 5000}
+
+
+class Command(BaseCommand):
+    help = 'Measures requests/sec and tail latency of WSGI and ASGI deployments under many concurrent clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', help='Base URL of the WSGI server (sync endpoints)')
+        parser.add_argument('--asgi-url', help='Base URL of the ASGI server (async endpoints)')
+        parser.add_argument('--endpoints', default='geojson,assessments',
+                            help=f'Comma-separated, from: {", ".join(ENDPOINTS)}')
+        parser.add_argument('--disaster', type=int, default=1)
+        parser.add_argument('--concurrency', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=20, help='Seconds per endpoint and server')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        if not options['wsgi_url'] and not options['asgi_url']:
+            raise CommandError('Pass --wsgi-url, --asgi-url or both')
+        names = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in ENDPOINTS]
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(unknown)}')
+
+        self.stdout.write(f'{options["concurrency"]} clients, {options["duration"]:.0f}s per run\n')
+        self.stdout.write(f'{"endpoint":<12} {"server":<5} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} '
+                          f'{"p99 ms":>9} {"requests":>9} {"errors":>7}  statuses')
+        for name in names:
+            method, sync_path, async_path = ENDPOINTS[name]
+            for server, url, path in (('wsgi', options['wsgi_url'], sync_path),
+                                      ('asgi', options['asgi_url'], async_path)):
+                if not url:
+                    continue
+                result = loadtest.run(
+                    url, [path.format(disaster=options['disaster'])],
+                    concurrency=options['concurrency'], duration=options['duration'],
+                    timeout=options['timeout'], method=method, body=SMS_BODY if method == 'POST' else None,
+                )
+                statuses = ' '.join(f'{code}:{count}' for code, count in sorted(result.statuses.items()))
+                self.stdout.write(
+                    f'{name:<12} {server:<5} {result.rps:>8.1f} {result.percentile(50):>9.0f} '
+                    f'{result.percentile(95):>9.0f} {result.percentile(99):>9.0f} '
+                    f'{result.requests:>9} {result.errors:>7}  {statuses}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Load test finished'))
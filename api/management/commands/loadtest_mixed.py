@@ -0,0 +1,180 @@
+"""
+Mixed-workload load test replaying a disaster-day traffic profile.
+Run with:
+    python manage.py loadtest_mixed                                     # in-process server, synthetic disaster
+    python manage.py loadtest_mixed --steps 10,50,100 --mix geojson=20,write=50,predict=10,sms=20
+    python manage.py loadtest_mixed --url http://127.0.0.1:8000 --disaster 1
+
+Map viewers (geojson, summary), field assessors creating and correcting
+assessments, bulk predictions and SMS generation run together against one server
+and one SQLite file. Each step of --steps runs the mix with that many concurrent
+clients and reports throughput, p50/p95/p99 latency and error rate per endpoint,
+plus the server's write-lock contention during the step (from GET /api/db-locks/).
+
+Without --url the project runs in this process (as in loadtest_surge) with the
+Gemini calls going to an in-process llm_stub. Without --disaster a synthetic
+disaster with --households households is created first and deleted afterwards;
+with --disaster the assessments of that disaster ARE modified. With --url, point
+the server's GEMINI_API_URL at `python manage.py llm_stub`, and this process's
+database settings must name the server's database (ids are read from it).
+"""
+import logging
+from collections import deque
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from api import loadtest, synthetic
+from api.models import Household, DisasterEvent, DamageAssessment
+
+from .llm_stub import StubLLM
+from .loadtest_http import SMS_BODY
+from .loadtest_surge import serve
+
+
+DEFAULT_MIX = 'geojson=20,summary=10,write=45,predict=10,sms=15'
+STATUSES = DamageAssessment.DamageStatus.values
+PREDICT_BATCH = 50
+ENDPOINTS = ('geojson', 'summary', 'write', 'predict', 'sms')
+
+
+class Workload:
+    """Request factories for each endpoint of the mix, drawing ids from the target disaster."""
+
+    def __init__(self, disaster_id, household_ids=None):
+        self.disaster_id = disaster_id
+        self.assessment_ids = list(
+            DamageAssessment.objects.filter(disaster_id=disaster_id).values_list('id', flat=True)
+        )
+        if not self.assessment_ids:
+            raise CommandError(f'Disaster {disaster_id} has no assessments')
+        # Households not assessed yet: field teams create these, then fall back to corrections
+        households = Household.objects.exclude(assessments__disaster_id=disaster_id)
+        if household_ids is not None:
+            households = households.filter(pk__in=household_ids)
+        self.unassessed = deque(households.values_list('id', flat=True)[:100_000])
+
+    def geojson(self, rng):
+        return 'GET', f'/api/households/geojson/?disaster_id={self.disaster_id}', None
+
+    def summary(self, rng):
+        return 'GET', f'/api/disasters/{self.disaster_id}/summary/', None
+
+    def write(self, rng):
+        body = {'damage_status': rng.choice(STATUSES), 'flood_depth_meters': f'{rng.uniform(0, 3):.2f}',
+                'assessed_by': 'Load test'}
+        if self.unassessed and rng.random() < 0.3:
+            body.update(household=self.unassessed.popleft(), disaster=self.disaster_id)
+            return 'POST', '/api/assessments/', body
+        return 'PATCH', f'/api/assessments/{rng.choice(self.assessment_ids)}/', body
+
+    def predict(self, rng):
+        ids = rng.sample(self.assessment_ids, min(PREDICT_BATCH, len(self.assessment_ids)))
+        return 'POST', '/api/assessments/predict/', {'ids': ids}
+
+    def sms(self, rng):
+        return 'POST', '/api/generate-sms/', SMS_BODY
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise CommandError(f'Unknown endpoint in --mix: {name}')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Command(BaseCommand):
+    help = 'Ramps a mix of map reads, assessment writes, predictions and SMS generation; reports per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server instead of an in-process one')
+        parser.add_argument('--disaster', type=int, help='Target disaster (its assessments are modified)')
+        parser.add_argument('--households', type=int, default=5000, help='Size of the synthetic disaster')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Endpoint weights (default: {DEFAULT_MIX})')
+        parser.add_argument('--steps', default='10,50,100', help='Comma-separated concurrent client counts')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds per step')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--llm-latency-ms', type=float, default=800, help='In-process LLM stub latency')
+
+    def handle(self, *args, **options):
+        mix_weights = parse_mix(options['mix'])
+        steps = [int(value) for value in options['steps'].split(',')]
+        # Shed and failed requests would otherwise be logged one by one
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        synthetic_ids = None
+        if options['disaster']:
+            if not DisasterEvent.objects.filter(pk=options['disaster']).exists():
+                raise CommandError(f'Disaster {options["disaster"]} not found')
+            disaster_id = options['disaster']
+        else:
+            self.stdout.write(f'Creating a synthetic disaster with {options["households"]:,} households...')
+            with transaction.atomic():
+                disaster = synthetic.create_disaster('Load Test Typhoon')
+                synthetic_ids = synthetic.create_households(options['households'], seed=44)
+                # A fifth is left unassessed for the field teams to create
+                synthetic.create_assessments(disaster, synthetic_ids[:len(synthetic_ids) * 4 // 5], seed=44)
+            disaster_id = disaster.pk
+
+        try:
+            workload = Workload(disaster_id, synthetic_ids)
+            mix = {name: (weight, getattr(workload, name)) for name, weight in mix_weights.items()}
+            if options['url']:
+                self.ramp(options['url'], mix, steps, options)
+            else:
+                stub = StubLLM(0, options['llm_latency_ms']).start()
+                try:
+                    with override_settings(GEMINI_API_URL=stub.url, GEMINI_API_KEY='stub'), \
+                            serve(settings.MIDDLEWARE) as url:
+                        self.ramp(url, mix, steps, options)
+                finally:
+                    stub.stop()
+        finally:
+            if synthetic_ids is not None:
+                self.stdout.write('Deleting the synthetic disaster...')
+                with transaction.atomic():
+                    DisasterEvent.objects.filter(pk=disaster_id).delete()
+                    Household.objects.filter(pk__in=synthetic_ids).delete()
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Mixed load test finished'))
+
+    def ramp(self, url, mix, steps, options):
+        for clients in steps:
+            before = self.lock_stats(url)
+            results = loadtest.mix(url, mix, concurrency=clients, duration=options['duration'],
+                                   timeout=options['timeout'], seed=clients)
+            after = self.lock_stats(url)
+
+            total = sum(result.requests for result in results.values())
+            elapsed = next(iter(results.values())).duration
+            self.stdout.write(f'\n{clients} clients: {total / elapsed:,.1f} req/s overall')
+            self.stdout.write(f'  {"endpoint":<10} {"requests":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+                              f'{"p99 ms":>8} {"errors":>7} {"statuses":<20}')
+            for name, result in results.items():
+                statuses = ' '.join(f'{code}:{count}' for code, count in sorted(result.statuses.items())
+                                    if not 200 <= code < 300)
+                self.stdout.write(
+                    f'  {name:<10} {result.requests:>8,} {result.rps:>8.1f} {result.percentile(50):>8.0f} '
+                    f'{result.percentile(95):>8.0f} {result.percentile(99):>8.0f} {result.error_rate:>6.1%} '
+                    f'{statuses or "-":<20}'
+                )
+            if before is not None and after is not None:
+                delta = {key: after[key] - before[key] for key in after}
+                self.stdout.write(
+                    f'  db write locks: {delta["lock_acquisitions"]:,} taken, {delta["lock_waits"]:,} waited '
+                    f'>= {getattr(settings, "DB_LOCK_WAIT_THRESHOLD_MS", 50)} ms '
+                    f'({delta["lock_wait_seconds"]:.1f}s in total), {delta["lock_errors"]:,} "database is locked" errors'
+                )
+
+    def lock_stats(self, url):
+        try:
+            return requests.get(f'{url}/api/db-locks/', timeout=10).json()
+        except (requests.RequestException, ValueError):
+            self.stderr.write('Could not read /api/db-locks/ from the server')
+            return None
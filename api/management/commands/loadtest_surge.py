@@ -0,0 +1,106 @@
+"""
+Surge load test: many coordinators opening the same disaster map at once.
+Run with:
+    python manage.py loadtest_surge --disaster 1                       # in-process, with and without protection
+    python manage.py loadtest_surge --disaster 1 --url http://127.0.0.1:8000
+
+Without --url the command starts a threaded WSGI server in this process twice, once
+without and once with api.surge.SurgeProtectionMiddleware, and ramps the same
+surge against both. With --url it ramps against a running server as configured.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.staticfiles.handlers import StaticFilesHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.test.utils import override_settings
+
+from api import loadtest
+from api.models import DisasterEvent
+
+
+SURGE_MIDDLEWARE = 'api.surge.SurgeProtectionMiddleware'
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _SurgeServer(ThreadedWSGIServer):
+    # runserver's backlog of 10 would refuse most of a 500-client surge before Django sees it
+    request_queue_size = 1024
+
+
+@contextmanager
+def serve(middleware, static_files=False):
+    """
+    Runs the project with the given middleware on an ephemeral port; yields its base URL.
+    With static_files, /static/ is served too (as runserver does).
+    """
+    with override_settings(MIDDLEWARE=middleware):
+        application = WSGIHandler()
+    if static_files:
+        application = StaticFilesHandler(application)
+    server = _SurgeServer(('127.0.0.1', 0), _QuietHandler)
+    server.set_app(application)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class Command(BaseCommand):
+    help = 'Ramps a surge of map, summary and bulk prediction requests and reports latency, shedding and coalescing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--disaster', type=int, default=1)
+        parser.add_argument('--steps', default='50,200,500', help='Comma-separated concurrent client counts')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per step')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--url', help='Base URL of a running server instead of the in-process comparison')
+
+    def handle(self, *args, **options):
+        if not options['url'] and not DisasterEvent.objects.filter(pk=options['disaster']).exists():
+            raise CommandError(f'Disaster {options["disaster"]} not found')
+        disaster = options['disaster']
+        paths = [
+            f'/api/households/geojson/?disaster_id={disaster}',
+            f'/api/households/geojson/?disaster_id={disaster}',
+            f'/api/households/geojson/?disaster_id={disaster}&format=columnar',
+            f'/api/disasters/{disaster}/summary/',
+            ('POST', '/api/assessments/predict/', {'disaster_id': disaster}),
+        ]
+        steps = [int(value) for value in options['steps'].split(',')]
+        # Every shed request would otherwise be logged as a server error
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        self.stdout.write(f'{"setup":<12} {"clients":>7} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} '
+                          f'{"served p99":>10} {"503":>6} {"coalesced":>9} {"errors":>7}')
+        if options['url']:
+            self.ramp('server', options['url'], paths, steps, options)
+        else:
+            unprotected = [name for name in settings.MIDDLEWARE if name != SURGE_MIDDLEWARE]
+            protected = settings.MIDDLEWARE if SURGE_MIDDLEWARE in settings.MIDDLEWARE else [SURGE_MIDDLEWARE, *unprotected]
+            for label, middleware in (('unprotected', unprotected), ('protected', protected)):
+                with serve(middleware) as url:
+                    self.ramp(label, url, paths, steps, options)
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Surge load test finished'))
+
+    def ramp(self, label, url, paths, steps, options):
+        for clients in steps:
+            result = loadtest.run(url, paths, concurrency=clients, duration=options['duration'],
+                                  timeout=options['timeout'])
+            self.stdout.write(
+                f'{label:<12} {clients:>7} {result.rps:>8.1f} {result.percentile(50):>8.0f} '
+                f'{result.percentile(99):>8.0f} {result.percentile(99, served=True):>10.0f} '
+                f'{result.statuses.get(503, 0):>6} {result.coalesced:>9} {result.errors:>7}'
+            )
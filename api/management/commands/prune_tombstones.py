@@ -0,0 +1,14 @@
+"""
+Management command to delete map change-feed tombstones past the retention window.
+Run with: python manage.py prune_tombstones
+"""
+from django.core.management.base import BaseCommand
+from api.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Deletes map change-feed tombstones older than CHANGE_FEED_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'✓ Pruned {deleted} tombstones'))
@@ -0,0 +1,28 @@
+"""
+Management command to recompute the precomputed damage heatmap grids.
+Run with: python manage.py rebuild_heatmap [disaster_id ...]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from api.models import DisasterEvent
+from api.heatmap import rebuild_heatmap
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the damage heatmap grids for the given disasters (all disasters if none are given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('disaster_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        disasters = DisasterEvent.objects.all()
+        if options['disaster_ids']:
+            disasters = disasters.filter(pk__in=options['disaster_ids'])
+
+        for disaster in disasters:
+            started = time.perf_counter()
+            cells = rebuild_heatmap(disaster.pk)
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {disaster.name}: {cells} cells in {time.perf_counter() - started:.2f}s'
+            ))
@@ -0,0 +1,22 @@
+"""
+Management command to recompute every household's repeat-damage counters.
+Run with: python manage.py rebuild_history_counts
+
+Only needed after writes that bypassed both the model signals and api.history
+(e.g. a queryset.update() of damage_status).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from api.history import rebuild_assessment_counts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes assessment_count, partial_damage_count and total_damage_count for every household'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        households = rebuild_assessment_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Counted assessments for {households:,} households in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,60 @@
+"""
+Management command that delivers the SMS outbox.
+Run with: python manage.py send_sms [--provider stub] [--workers 2] [--forever]
+
+Sends until nothing is queued or in flight for the provider (messages waiting on a
+retry backoff included), or with --forever keeps polling for new messages.
+Workers share the provider's rate limit; run one send_sms per provider.
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.sms import SmsSender, UnknownProvider, default_provider_name
+
+
+class Command(BaseCommand):
+    help = 'Sends queued SMS messages through their provider, with rate limiting, retries and dead-lettering'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', help='SMS_PROVIDERS entry (default: SMS_DEFAULT_PROVIDER)')
+        parser.add_argument('--workers', type=int, default=2, help='Batches in flight at once')
+        parser.add_argument('--forever', action='store_true', help='Keep polling for new messages')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls when nothing is due')
+
+    def handle(self, *args, **options):
+        provider = options['provider'] or default_provider_name()
+        try:
+            sender = SmsSender(provider)
+        except UnknownProvider:
+            raise CommandError(f'Unknown SMS provider: {provider}')
+
+        def work():
+            try:
+                sender.run(stop, until_idle=not options['forever'], poll_seconds=options['poll'])
+            finally:
+                connection.close()
+
+        stop = threading.Event()
+        started = time.perf_counter()
+        workers = [threading.Thread(target=work) for _ in range(max(options['workers'], 1))]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(1)
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        elapsed = time.perf_counter() - started
+        stats = sender.stats
+        self.stdout.write(f'{stats["sent"]:,} sent in {elapsed:.1f}s ({stats["sent"] / elapsed:,.0f}/s, '
+                          f'limit {sender.provider.rate_per_second:,}/s); {stats["retried"]:,} retries scheduled; '
+                          f'{stats["throttled"]:,} resent after 429; '
+                          f'{stats["dead"]:,} dead-lettered')
+        self.stdout.write(self.style.SUCCESS('✓ Outbox drained' if not options['forever'] else '✓ Stopped'))
@@ -0,0 +1,177 @@
+"""
+Local SMS gateway for development and load tests, speaking api.sms.HttpGatewayProvider's protocol.
+Run with:
+    python manage.py sms_gateway_stub [--port 8025] [--capacity 300] [--fail-rate 0.02]
+        [--receipt-url http://127.0.0.1:8000/api/sms/receipts/stub/] [--receipt-token TOKEN]
+
+It behaves like a carrier: requests beyond --capacity messages per second get 429,
+--fail-rate of requests fail with 503, --reject-rate of numbers are rejected for good,
+and accepted messages get a delivery receipt (--undelivered-rate of them failed)
+posted in batches to --receipt-url after --receipt-delay seconds, with --receipt-token
+(by default the 'stub' provider's receipt_token) in the X-Receipt-Token header.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.sms import TokenBucket
+
+
+class StubGateway:
+    """The gateway's state: carrier capacity, counters and the pending receipts."""
+
+    def __init__(self, port=8025, capacity=300, latency_ms=20, fail_rate=0.0, reject_rate=0.0,
+                 undelivered_rate=0.0, receipt_url=None, receipt_delay=1.0, receipt_batch=500, receipt_token=None):
+        self.capacity = TokenBucket(capacity, capacity)
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.undelivered_rate = undelivered_rate
+        self.receipt_url = receipt_url
+        self.receipt_delay = receipt_delay
+        self.receipt_batch = receipt_batch
+        self.receipt_token = receipt_token
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.receipts = deque()
+        self.stopping = threading.Event()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def _count(self, **counts):
+        with self.lock:
+            self.stats.update(counts)
+
+    def send(self, messages):
+        """(status code, response body) for one /send request."""
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            self._count(failed_requests=1)
+            return 503, {'error': 'Upstream SMSC unavailable'}
+        if not self.capacity.try_take(len(messages)):
+            self._count(throttled_requests=1)
+            return 429, {'error': 'Throughput limit exceeded'}
+
+        results, due = [], time.monotonic() + self.receipt_delay
+        for message in messages:
+            if random.random() < self.reject_rate:
+                results.append({'reference': message['reference'], 'status': 'rejected', 'error': 'Invalid number'})
+                continue
+            message_id = uuid.uuid4().hex
+            results.append({'reference': message['reference'], 'status': 'accepted', 'message_id': message_id})
+            delivered = random.random() >= self.undelivered_rate
+            receipt = {'reference': message['reference'], 'message_id': message_id,
+                       'status': 'delivered' if delivered else 'failed',
+                       'error': '' if delivered else 'Handset unreachable'}
+            self.receipts.append((due, receipt))
+        accepted = sum(1 for result in results if result['status'] == 'accepted')
+        self._count(requests=1, accepted=accepted, rejected=len(results) - accepted)
+        return 200, {'results': results}
+
+    def _handler(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.rstrip('/') != '/send':
+                    return self._reply(404, {'error': 'Not found'})
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    messages = body['messages']
+                except (ValueError, KeyError):
+                    return self._reply(400, {'error': 'Malformed request'})
+                self._reply(*gateway.send(messages))
+
+            def _reply(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if code == 429:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _post_receipts(self):
+        session = requests.Session()
+        if self.receipt_token:
+            session.headers['X-Receipt-Token'] = self.receipt_token
+        while not self.stopping.is_set() or self.receipts:
+            batch = []
+            now = time.monotonic()
+            while self.receipts and self.receipts[0][0] <= now and len(batch) < self.receipt_batch:
+                batch.append(self.receipts.popleft()[1])
+            if not batch:
+                if self.stopping.wait(0.1):
+                    self.receipts.clear()  # stopping: drop receipts that are not due yet
+                continue
+            try:
+                response = session.post(self.receipt_url, json={'receipts': batch}, timeout=30)
+                response.raise_for_status()
+                self._count(receipts_posted=len(batch))
+            except requests.RequestException:
+                # Like a carrier: keep the receipts and try again shortly
+                self._count(receipt_post_failures=1)
+                self.receipts.extendleft(((now + 1, receipt) for receipt in reversed(batch)))
+                self.stopping.wait(1)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if self.receipt_url:
+            self.receipt_thread = threading.Thread(target=self._post_receipts, daemon=True)
+            self.receipt_thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Command(BaseCommand):
+    help = 'Runs a local SMS gateway with carrier-like throttling, failures and delivery receipts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--capacity', type=float, default=300, help='Messages per second before 429s')
+        parser.add_argument('--latency-ms', type=float, default=20)
+        parser.add_argument('--fail-rate', type=float, default=0.02, help='Share of requests failing with 503')
+        parser.add_argument('--reject-rate', type=float, default=0.005, help='Share of numbers rejected for good')
+        parser.add_argument('--undelivered-rate', type=float, default=0.03, help='Share of receipts that fail')
+        parser.add_argument('--receipt-url', help='Where to POST delivery receipts (none are sent without it)')
+        parser.add_argument('--receipt-delay', type=float, default=1.0, help='Seconds from accept to receipt')
+        parser.add_argument('--receipt-token', help="Sent with the receipts (default: the 'stub' provider's receipt_token)")
+
+    def handle(self, *args, **options):
+        gateway = StubGateway(
+            options['port'], options['capacity'], options['latency_ms'], options['fail_rate'],
+            options['reject_rate'], options['undelivered_rate'], options['receipt_url'], options['receipt_delay'],
+            receipt_token=options['receipt_token'] or settings.SMS_PROVIDERS.get('stub', {}).get('receipt_token'),
+        ).start()
+        self.stdout.write(f'SMS gateway stub on {gateway.url} (Ctrl+C to stop)')
+        try:
+            while True:
+                time.sleep(10)
+                self.stdout.write(', '.join(f'{key} {value:,}' for key, value in sorted(gateway.stats.items())))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            gateway.stop()
+        self.stdout.write(self.style.SUCCESS('✓ Stopped'))
@@ -0,0 +1,55 @@
+"""
+Management command to copy the primary SQLite database to the read replica.
+Run with: BANTAYAYUDA_REPLICA_DB=/path/to/replica.sqlite3 python manage.py sync_replica [--interval 5]
+
+Uses SQLite's online backup API, so the primary stays writable and replica readers
+keep a consistent view while the copy runs. With --interval it repeats forever.
+"""
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from api.replica import PRIMARY_ALIAS, REPLICA_ALIAS, mark_synced, replica_configured
+
+
+def backup(source_path, target_path, pages_per_step=-1):
+    """Copies source to target in one consistent snapshot; returns the number of pages."""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target, pages=pages_per_step)
+        return source.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary database to the read replica (SQLite backup API)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Seconds between copies; 0 copies once and exits')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('No replica database configured (set BANTAYAYUDA_REPLICA_DB)')
+        primary, replica = connections[PRIMARY_ALIAS].settings_dict, connections[REPLICA_ALIAS].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replica copies SQLite files; use the database\'s own replication otherwise')
+
+        while True:
+            started = time.perf_counter()
+            # Rows committed after this moment may be missing from the copy
+            copied_at = timezone.now()
+            pages = backup(str(primary['NAME']), str(replica['NAME']))
+            mark_synced(copied_at)
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Copied {pages:,} pages to {replica["NAME"]} in {time.perf_counter() - started:.2f}s'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
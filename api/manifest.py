@@ -0,0 +1,100 @@
+"""
+Payout manifest for cash disbursement.
+
+Rows are read from the database in chunks with values_list().iterator(), ordered
+by barangay, and written out one line at a time. A barangay's subtotal is emitted
+as soon as the next barangay starts, so memory stays constant however many
+households a disaster has.
+
+Finance staff open the file in Excel or Sheets, which run any cell starting with
+=, +, - or @ as a formula; csv_lines() prefixes such text cells with an apostrophe.
+"""
+import csv
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import DamageAssessment
+
+
+MANIFEST_HEADER = (
+    'row_type', 'household_id', 'name', 'contact_number', 'barangay', 'address',
+    'damage_status', 'flood_depth_meters', 'ect_amount',
+)
+
+# Text starting with one of these is read as a formula by spreadsheet applications
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+_COLUMNS = (
+    'household_id', 'household__name', 'household__contact_number', 'household__barangay',
+    'household__address', 'damage_status', 'flood_depth_meters', 'recommended_ect_amount',
+)
+
+
+def manifest_queryset(disaster_id, barangays=None, statuses=None):
+    assessments = DamageAssessment.objects.filter(disaster_id=disaster_id)
+    if barangays:
+        assessments = assessments.filter(household__barangay__in=barangays)
+    if statuses:
+        assessments = assessments.filter(damage_status__in=statuses)
+    return assessments.order_by('household__barangay', 'household__name', 'household_id')
+
+
+def _subtotal(row_type, barangay, households, amount):
+    return (row_type, '', f'{households} households', '', barangay, '', '', '', amount)
+
+
+def manifest_rows(disaster_id, barangays=None, statuses=None, chunk_size=None):
+    """
+    Yields the header, one HOUSEHOLD row per assessment, a SUBTOTAL row after each
+    barangay and a final TOTAL row.
+    """
+    chunk_size = chunk_size or getattr(settings, 'MANIFEST_CHUNK_SIZE', 2000)
+    yield MANIFEST_HEADER
+
+    current = None
+    households = total_households = 0
+    amount = total_amount = Decimal('0.00')
+    rows = manifest_queryset(disaster_id, barangays, statuses).values_list(*_COLUMNS).iterator(chunk_size=chunk_size)
+    for household_id, name, contact, barangay, address, damage_status, depth, ect_amount in rows:
+        if barangay != current:
+            if current is not None:
+                yield _subtotal('SUBTOTAL', current, households, amount)
+            current, households, amount = barangay, 0, Decimal('0.00')
+        households += 1
+        amount += ect_amount
+        yield ('HOUSEHOLD', household_id, name, contact or '', barangay, address, damage_status,
+               '' if depth is None else depth, ect_amount)
+
+        total_households += 1
+        total_amount += ect_amount
+
+    if current is not None:
+        yield _subtotal('SUBTOTAL', current, households, amount)
+    yield _subtotal('TOTAL', '', total_households, total_amount)
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def spreadsheet_cell(value):
+    """The value, with an apostrophe in front if it is text a spreadsheet would run as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(rows):
+    """Yields rows as CSV text, one line at a time, for StreamingHttpResponse."""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([spreadsheet_cell(value) for value in row])
+
+
+def manifest_csv_lines(disaster_id, barangays=None, statuses=None, chunk_size=None):
+    """Yields the manifest as CSV text, one line at a time."""
+    return csv_lines(manifest_rows(disaster_id, barangays, statuses, chunk_size))
@@ -0,0 +1,110 @@
+"""
+Response compression.
+
+Like django.middleware.gzip.GZipMiddleware, but:
+- prefers brotli when the client accepts it and the `brotli` package is installed
+- compresses streaming responses (the payout manifest, snapshot downloads) with
+  one incremental compressor instead of a gzip member per chunk
+- leaves Server-Sent Events alone, since compression would buffer them
+"""
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+SKIPPED_CONTENT_TYPES = ('text/event-stream', 'image/', 'application/zip', 'application/gzip')
+
+
+def _gzip_compressor():
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _brotli_compressor():
+    compressor = brotli.Compressor(quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5))
+    return compressor.process, compressor.finish
+
+
+COMPRESSORS = {'gzip': _gzip_compressor, 'br': _brotli_compressor}
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header."""
+    if brotli is not None and re_accepts_brotli.search(accept_encoding):
+        return 'br'
+    if re_accepts_gzip.search(accept_encoding):
+        return 'gzip'
+    return None
+
+
+def compress_bytes(data, encoding):
+    compress, finish = COMPRESSORS[encoding]()
+    return compress(data) + finish()
+
+
+def compress_stream(chunks, encoding):
+    compress, finish = COMPRESSORS[encoding]()
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    compress, finish = COMPRESSORS[encoding]()
+    async for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresses responses with brotli or gzip, whichever the client and server both support."""
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_BYTES', 200):
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        if response.get('Content-Type', '').startswith(SKIPPED_CONTENT_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            # The compressed size is not known until the stream ends
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag would claim the compressed bytes equal the original ones
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_damageassessment_flood_depth_meters_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FloodRaster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_file', models.CharField(help_text='Path of the raster file on the server', max_length=500)),
+                ('nrows', models.PositiveIntegerField()),
+                ('ncols', models.PositiveIntegerField()),
+                ('xllcorner', models.FloatField(help_text="Longitude of the grid's lower-left corner")),
+                ('yllcorner', models.FloatField(help_text="Latitude of the grid's lower-left corner")),
+                ('cellsize', models.FloatField(help_text='Cell size in degrees')),
+                ('nodata_value', models.FloatField(blank=True, null=True)),
+                ('households_sampled', models.PositiveIntegerField(default=0)),
+                ('assessments_created', models.PositiveIntegerField(default=0)),
+                ('assessments_updated', models.PositiveIntegerField(default=0)),
+                ('ingested_at', models.DateTimeField(auto_now_add=True)),
+                ('disaster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flood_rasters', to='api.disasterevent')),
+            ],
+            options={
+                'ordering': ['-ingested_at'],
+            },
+        ),
+    ]
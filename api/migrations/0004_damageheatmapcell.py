@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_floodraster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DamageHeatmapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField(help_text='Tile zoom level this grid is precomputed for')),
+                ('cell_x', models.PositiveIntegerField()),
+                ('cell_y', models.PositiveIntegerField()),
+                ('total_count', models.IntegerField(default=0)),
+                ('partial_count', models.IntegerField(default=0)),
+                ('none_count', models.IntegerField(default=0)),
+                ('ect_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('disaster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='heatmap_cells', to='api.disasterevent')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('disaster', 'zoom', 'cell_x', 'cell_y'), name='unique_heatmap_cell')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_damageheatmapcell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapFeatureTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('household_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['deleted_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='damageassessment',
+            index=models.Index(fields=['disaster', 'updated_at'], name='api_damagea_disaste_b8b744_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='household',
+            index=models.Index(fields=['updated_at'], name='api_househo_updated_2cfa85_idx'),
+        ),
+        migrations.AddField(
+            model_name='mapfeaturetombstone',
+            name='disaster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feature_tombstones', to='api.disasterevent'),
+        ),
+    ]
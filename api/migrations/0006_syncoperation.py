@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:41
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('client_id', models.CharField(blank=True, max_length=100)),
+                ('outcome', models.CharField(choices=[('APPLIED', 'Applied'), ('CONFLICT', 'Conflict (server version kept)'), ('REJECTED', 'Rejected')], max_length=10)),
+                ('result', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('assessment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sync_operations', to='api.damageassessment')),
+            ],
+            options={
+                'ordering': ['-received_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_syncoperation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisasterSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_version', models.CharField(help_text="Fingerprint of the disaster's data when the build started", max_length=40)),
+                ('file_format', models.CharField(choices=[('npz', 'NumPy .npz'), ('arrow', 'Arrow IPC')], max_length=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('disaster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.disasterevent')),
+            ],
+            options={
+                'ordering': ['-requested_at'],
+                'constraints': [models.UniqueConstraint(fields=('disaster', 'data_version', 'file_format'), name='unique_disaster_snapshot')],
+            },
+        ),
+    ]
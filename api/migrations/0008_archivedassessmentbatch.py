@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_disastersnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='disasterevent',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, help_text='When the assessments were moved to ArchivedAssessmentBatch (closed disasters only)', null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedAssessmentBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('raw_bytes', models.PositiveIntegerField(help_text='Size of the JSON before compression')),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('disaster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_batches', to='api.disasterevent')),
+            ],
+            options={
+                'ordering': ['disaster', 'sequence'],
+                'constraints': [models.UniqueConstraint(fields=('disaster', 'sequence'), name='unique_archived_assessment_batch')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:25
+
+import json
+import zlib
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    """Counts every household's assessments, hot and archived, per damage status."""
+    Household = apps.get_model('api', 'Household')
+    ArchivedAssessmentBatch = apps.get_model('api', 'ArchivedAssessmentBatch')
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+    household, assessment = qn(Household._meta.db_table), qn('api_damageassessment')
+
+    # Correlated counts straight in SQL for the live table
+    counts = {'assessment_count': '', 'partial_damage_count': " AND a.damage_status = 'PARTIAL'",
+              'total_damage_count': " AND a.damage_status = 'TOTAL'"}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {household} SET '
+            + ', '.join(f'{qn(column)} = (SELECT COUNT(*) FROM {assessment} a '
+                        f'WHERE a.household_id = {household}.id{condition})'
+                        for column, condition in counts.items())
+        )
+
+    archived = Counter()
+    for batch in ArchivedAssessmentBatch.objects.using(connection.alias).iterator(chunk_size=20):
+        data = json.loads(zlib.decompress(bytes(batch.payload)))
+        household_at, status_at = data['fields'].index('household_id'), data['fields'].index('damage_status')
+        for row in data['rows']:
+            archived[(row[household_at], 'assessment_count')] += 1
+            if row[status_at] in ('PARTIAL', 'TOTAL'):
+                archived[(row[household_at], f'{row[status_at].lower()}_damage_count')] += 1
+    with connection.cursor() as cursor:
+        for column in counts:
+            cursor.executemany(
+                f'UPDATE {household} SET {qn(column)} = {qn(column)} + %s WHERE id = %s',
+                [(count, household_id) for (household_id, counted), count in archived.items() if counted == column],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_archivedassessmentbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='household',
+            name='assessment_count',
+            field=models.PositiveIntegerField(default=0, help_text='Disasters this household was assessed in'),
+        ),
+        migrations.AddField(
+            model_name='household',
+            name='partial_damage_count',
+            field=models.PositiveIntegerField(default=0, help_text='Disasters with PARTIAL damage'),
+        ),
+        migrations.AddField(
+            model_name='household',
+            name='total_damage_count',
+            field=models.PositiveIntegerField(default=0, help_text='Disasters with TOTAL damage'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_household_assessment_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateHouseholdCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_meters', models.FloatField()),
+                ('name_similarity', models.FloatField()),
+                ('address_similarity', models.FloatField()),
+                ('score', models.FloatField()),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('CONFIRMED', 'Confirmed duplicate'), ('DISMISSED', 'Not a duplicate')], default='OPEN', max_length=10)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='household',
+            index=models.Index(fields=['latitude', 'longitude'], name='api_househo_latitud_946f99_idx'),
+        ),
+        migrations.AddField(
+            model_name='duplicatehouseholdcandidate',
+            name='duplicate',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.household'),
+        ),
+        migrations.AddField(
+            model_name='duplicatehouseholdcandidate',
+            name='household',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='api.household'),
+        ),
+        migrations.AddIndex(
+            model_name='duplicatehouseholdcandidate',
+            index=models.Index(fields=['status', '-score'], name='api_duplica_status_afb2d7_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='duplicatehouseholdcandidate',
+            constraint=models.UniqueConstraint(fields=('household', 'duplicate'), name='unique_duplicate_household_candidate'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_duplicatehouseholdcandidate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='damageassessment',
+            name='is_reviewed',
+            field=models.BooleanField(db_default=False, default=False, help_text='Checked by a coordinator (admin bulk action)'),
+        ),
+        migrations.AddField(
+            model_name='damageassessment',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='damageassessment',
+            index=models.Index(fields=['assessed_at'], name='api_damagea_assesse_b183d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='damageassessment',
+            index=models.Index(fields=['disaster', 'assessed_at'], name='api_damagea_disaste_47e3f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='damageassessment',
+            index=models.Index(fields=['damage_status', 'assessed_at'], name='api_damagea_damage__ae14f8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='household',
+            index=models.Index(fields=['barangay'], name='api_househo_baranga_1ba452_idx'),
+        ),
+    ]
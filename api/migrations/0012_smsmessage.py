@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_assessment_review_and_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmsMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campaign', models.CharField(blank=True, help_text='Groups one notice per assessment', max_length=100)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('body', models.TextField()),
+                ('provider', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('SENDING', 'Sending'), ('SENT', 'Sent (accepted by provider)'), ('DELIVERED', 'Delivered'), ('UNDELIVERED', 'Undelivered (receipt)'), ('DEAD', 'Dead-lettered')], default='QUEUED', max_length=12)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField()),
+                ('provider_message_id', models.CharField(blank=True, max_length=100)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('assessment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sms_messages', to='api.damageassessment')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['provider', 'status', 'next_attempt_at'], name='api_smsmess_provide_9cdb12_idx'), models.Index(fields=['provider', 'provider_message_id'], name='api_smsmess_provide_5bfa60_idx'), models.Index(fields=['campaign', 'status'], name='api_smsmess_campaig_ba4c7e_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('assessment__isnull', False)), fields=('assessment', 'campaign'), name='unique_sms_per_assessment_campaign')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:56
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, NullIf, Round
+from django.db.models.lookups import GreaterThan
+
+
+# api.risk as of this migration, copied so later changes there don't alter it
+RATIO_PLACES = 3
+TIER_BOUNDS = ((Decimal('0.8'), 3), (Decimal('0.4'), 2), (Decimal('0'), 1))
+UNKNOWN_TIER = 0
+
+
+def backfill_risk(apps, schema_editor):
+    """Ratio and tier of every existing assessment, in two set-based UPDATEs."""
+    DamageAssessment = apps.get_model('api', 'DamageAssessment')
+    Household = apps.get_model('api', 'Household')
+    assessments = DamageAssessment.objects.using(schema_editor.connection.alias).all()
+    height = Subquery(Household.objects.filter(pk=OuterRef('household_id')).values('house_height_meters')[:1])
+    # As floats: SQLite divides whole-number decimals (1 / 2) as integers
+    ratio = Cast(F('flood_depth_meters'), FloatField()) / Cast(NullIf(height, Value(Decimal('0'))), FloatField())
+    capped = Case(When(GreaterThan(ratio, Value(1.0)), then=Value(1.0)), default=ratio)
+    assessments.update(flood_height_ratio=Round(capped, RATIO_PLACES))
+    assessments.update(risk_tier=Case(
+        *[When(flood_height_ratio__gte=bound, then=Value(tier)) for bound, tier in TIER_BOUNDS],
+        default=Value(UNKNOWN_TIER),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_smsmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='damageassessment',
+            name='flood_height_ratio',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, help_text='flood_depth_meters / house_height_meters, capped at 1.0', max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='damageassessment',
+            name='risk_tier',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Low'), (2, 'Medium'), (3, 'High')], db_default=0, default=0, editable=False),
+        ),
+        # Before the index, so the backfill does not maintain it row by row
+        migrations.RunPython(backfill_risk, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='damageassessment',
+            index=models.Index(fields=['disaster', 'risk_tier', 'flood_height_ratio'], name='api_damagea_disaste_89f5db_idx'),
+        ),
+    ]
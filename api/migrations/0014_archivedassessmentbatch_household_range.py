@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:06
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def fill_household_ranges(apps, schema_editor):
+    """Batches archived before this migration are in id order, so their ranges are wider but still cover them."""
+    ArchivedAssessmentBatch = apps.get_model('api', 'ArchivedAssessmentBatch')
+    batches = ArchivedAssessmentBatch.objects.using(schema_editor.connection.alias)
+    for batch in batches.iterator(chunk_size=20):
+        data = json.loads(zlib.decompress(bytes(batch.payload)))
+        column = data['fields'].index('household_id')
+        household_ids = [row[column] for row in data['rows']]
+        batches.filter(pk=batch.pk).update(min_household_id=min(household_ids), max_household_id=max(household_ids))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_damageassessment_risk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedassessmentbatch',
+            name='max_household_id',
+            field=models.PositiveIntegerField(help_text='Highest household_id in the batch', null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedassessmentbatch',
+            name='min_household_id',
+            field=models.PositiveIntegerField(help_text='Lowest household_id in the batch', null=True),
+        ),
+        migrations.RunPython(fill_household_ranges, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='archivedassessmentbatch',
+            name='max_household_id',
+            field=models.PositiveIntegerField(help_text='Highest household_id in the batch'),
+        ),
+        migrations.AlterField(
+            model_name='archivedassessmentbatch',
+            name='min_household_id',
+            field=models.PositiveIntegerField(help_text='Lowest household_id in the batch'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedassessmentbatch',
+            index=models.Index(fields=['min_household_id', 'max_household_id'], name='api_archive_min_hou_82ac39_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_archivedassessmentbatch_household_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncoperation',
+            name='client_updated_at',
+            field=models.DateTimeField(blank=True, help_text='When the change was made on the device (valid changes only)', null=True),
+        ),
+    ]
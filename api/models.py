@@ -1,6 +1,9 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .risk import RiskTier, flood_height_ratio, refresh_risk, risk_tier
+
 
 class Household(models.Model):
     """Stores permanent data for each household"""
@@ -30,11 +33,45 @@ class Household(models.Model):
         default=False,
         help_text="Whether the household is a 4Ps (Pantawid Pamilyang Pilipino Program) recipient"
     )
+    # Counters over every disaster, archived ones included; kept current by api.history
+    assessment_count = models.PositiveIntegerField(default=0, help_text="Disasters this household was assessed in")
+    partial_damage_count = models.PositiveIntegerField(default=0, help_text="Disasters with PARTIAL damage")
+    total_damage_count = models.PositiveIntegerField(default=0, help_text="Disasters with TOTAL damage")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['updated_at']),
+            # Bounding-box reads for the duplicate check on create (api.dedup)
+            models.Index(fields=['latitude', 'longitude']),
+            models.Index(fields=['barangay']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The assessments' flood height ratios divide by the house height; save() compares against it
+        instance._loaded_height = instance.__dict__.get('house_height_meters', models.DEFERRED)
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        # Deferred and not assigned since loading: unchanged
+        height = self.__dict__.get('house_height_meters', models.DEFERRED)
+        if height is models.DEFERRED or (update_fields is not None and 'house_height_meters' not in update_fields):
+            return
+        if not adding and height != getattr(self, '_loaded_height', models.DEFERRED):
+            refresh_risk(self.assessments.all())
+        self._loaded_height = height
+
+    @property
+    def damaged_count(self):
+        """Disasters in which the household was partially or totally damaged"""
+        return self.partial_damage_count + self.total_damage_count
 
     def __str__(self):
         return f"{self.name} - {self.barangay}"
@@ -46,6 +83,10 @@ class DisasterEvent(models.Model):
     description = models.TextField(blank=True)
     date_occurred = models.DateField()
     is_active = models.BooleanField(default=True)
+    archived_at = models.DateTimeField(
+        blank=True, null=True,
+        help_text="When the assessments were moved to ArchivedAssessmentBatch (closed disasters only)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -64,6 +105,8 @@ class DamageAssessment(models.Model):
         PARTIAL = 'PARTIAL', 'Partial Damage'
         TOTAL = 'TOTAL', 'Total Damage'
 
+    RiskTier = RiskTier
+
     household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name='assessments')
     disaster = models.ForeignKey(DisasterEvent, on_delete=models.CASCADE, related_name='assessments')
     damage_status = models.CharField(max_length=10, choices=DamageStatus.choices, default=DamageStatus.NONE)
@@ -83,12 +126,34 @@ class DamageAssessment(models.Model):
     )
     notes = models.TextField(blank=True)
     assessed_by = models.CharField(max_length=100, blank=True)
+    # db_default too, so the raw ingest INSERTs (api.bulk) that list their own columns still work
+    is_reviewed = models.BooleanField(
+        default=False, db_default=False, help_text="Checked by a coordinator (admin bulk action)"
+    )
+    reviewed_at = models.DateTimeField(blank=True, null=True)
+    # Derived from flood depth and house height on save (api.risk); db_default for the raw INSERTs
+    flood_height_ratio = models.DecimalField(
+        max_digits=4, decimal_places=3, blank=True, null=True, editable=False,
+        help_text="flood_depth_meters / house_height_meters, capped at 1.0"
+    )
+    risk_tier = models.PositiveSmallIntegerField(
+        choices=RiskTier.choices, default=RiskTier.UNKNOWN, db_default=RiskTier.UNKNOWN, editable=False
+    )
     assessed_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['household', 'disaster']
         ordering = ['-assessed_at']
+        indexes = [
+            models.Index(fields=['disaster', 'updated_at']),
+            # Admin changelist: default ordering, alone or filtered by disaster / status
+            models.Index(fields=['assessed_at']),
+            models.Index(fields=['disaster', 'assessed_at']),
+            models.Index(fields=['damage_status', 'assessed_at']),
+            # Triage: highest risk first within a disaster (the tier only ever rises with the ratio)
+            models.Index(fields=['disaster', 'risk_tier', 'flood_height_ratio']),
+        ]
 
     def save(self, *args, **kwargs):
         """
@@ -97,6 +162,7 @@ class DamageAssessment(models.Model):
         - TOTAL damage = ₱10,000
         - PARTIAL damage = ₱5,000
         - NONE damage = ₱0
+        Also sets flood_height_ratio and risk_tier (api.risk).
         """
         # Only set ECT amount if it hasn't been set by the model prediction
         # (i.e., if it's still 0 or not set)
@@ -107,8 +173,252 @@ class DamageAssessment(models.Model):
                 self.recommended_ect_amount = 5000
             else:  # NONE
                 self.recommended_ect_amount = 0
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'flood_depth_meters' in update_fields:
+            self.flood_height_ratio = flood_height_ratio(self.flood_depth_meters, self.household.house_height_meters)
+            self.risk_tier = risk_tier(self.flood_height_ratio)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'flood_height_ratio', 'risk_tier'}
         
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.household.name} - {self.disaster.name}: {self.damage_status} (₱{self.recommended_ect_amount})"
\ No newline at end of file
+        return f"{self.household.name} - {self.disaster.name}: {self.damage_status} (₱{self.recommended_ect_amount})"
+
+
+class FloodRaster(models.Model):
+    """A flood-depth grid from hazard mapping, ingested into a disaster's assessments"""
+    disaster = models.ForeignKey(DisasterEvent, on_delete=models.CASCADE, related_name='flood_rasters')
+    source_file = models.CharField(max_length=500, help_text="Path of the raster file on the server")
+    nrows = models.PositiveIntegerField()
+    ncols = models.PositiveIntegerField()
+    xllcorner = models.FloatField(help_text="Longitude of the grid's lower-left corner")
+    yllcorner = models.FloatField(help_text="Latitude of the grid's lower-left corner")
+    cellsize = models.FloatField(help_text="Cell size in degrees")
+    nodata_value = models.FloatField(blank=True, null=True)
+    households_sampled = models.PositiveIntegerField(default=0)
+    assessments_created = models.PositiveIntegerField(default=0)
+    assessments_updated = models.PositiveIntegerField(default=0)
+    ingested_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-ingested_at']
+
+    def __str__(self):
+        return f"{self.disaster.name}: {self.source_file}"
+
+
+class DamageHeatmapCell(models.Model):
+    """One cell of a disaster's precomputed damage heatmap grid at a given tile zoom level"""
+    disaster = models.ForeignKey(DisasterEvent, on_delete=models.CASCADE, related_name='heatmap_cells')
+    zoom = models.PositiveSmallIntegerField(help_text="Tile zoom level this grid is precomputed for")
+    cell_x = models.PositiveIntegerField()
+    cell_y = models.PositiveIntegerField()
+    total_count = models.IntegerField(default=0)
+    partial_count = models.IntegerField(default=0)
+    none_count = models.IntegerField(default=0)
+    ect_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['disaster', 'zoom', 'cell_x', 'cell_y'], name='unique_heatmap_cell'),
+        ]
+
+    def __str__(self):
+        return f"{self.disaster_id} z{self.zoom} ({self.cell_x}, {self.cell_y})"
+
+
+class MapFeatureTombstone(models.Model):
+    """
+    Records a deleted household (disaster is empty) or a deleted assessment
+    so the map change feed can tell clients what disappeared
+    """
+    household_id = models.BigIntegerField()
+    disaster = models.ForeignKey(
+        DisasterEvent, on_delete=models.CASCADE, related_name='feature_tombstones', blank=True, null=True
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        return f"Household {self.household_id} deleted at {self.deleted_at}"
+
+
+class SyncOperation(models.Model):
+    """
+    One client-side change received through the offline sync endpoint.
+    The idempotency key makes retried uploads return the stored result instead of re-applying.
+    """
+
+    class Outcome(models.TextChoices):
+        APPLIED = 'APPLIED', 'Applied'
+        CONFLICT = 'CONFLICT', 'Conflict (server version kept)'
+        REJECTED = 'REJECTED', 'Rejected'
+
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    client_id = models.CharField(max_length=100, blank=True)
+    assessment = models.ForeignKey(
+        DamageAssessment, on_delete=models.SET_NULL, related_name='sync_operations', blank=True, null=True
+    )
+    outcome = models.CharField(max_length=10, choices=Outcome.choices)
+    result = models.JSONField(encoder=DjangoJSONEncoder)
+    client_updated_at = models.DateTimeField(
+        blank=True, null=True, help_text="When the change was made on the device (valid changes only)"
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-received_at']
+
+    def __str__(self):
+        return f"{self.client_id}:{self.idempotency_key} ({self.outcome})"
+
+
+class DisasterSnapshot(models.Model):
+    """A columnar file of one disaster's households and assessments, built for a given data version"""
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        READY = 'READY', 'Ready'
+        FAILED = 'FAILED', 'Failed'
+
+    class FileFormat(models.TextChoices):
+        NPZ = 'npz', 'NumPy .npz'
+        ARROW = 'arrow', 'Arrow IPC'
+
+    disaster = models.ForeignKey(DisasterEvent, on_delete=models.CASCADE, related_name='snapshots')
+    data_version = models.CharField(max_length=40, help_text="Fingerprint of the disaster's data when the build started")
+    file_format = models.CharField(max_length=10, choices=FileFormat.choices)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    file_path = models.CharField(max_length=500, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-requested_at']
+        constraints = [
+            models.UniqueConstraint(fields=['disaster', 'data_version', 'file_format'], name='unique_disaster_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.disaster.name} snapshot {self.data_version} ({self.status})"
+
+
+class ArchivedAssessmentBatch(models.Model):
+    """
+    A zlib-compressed JSON batch of a closed disaster's assessments, moved out of the
+    DamageAssessment table by api.archive so active data stays small. Rows are archived
+    in household order, so each batch covers one household_id range.
+    """
+    disaster = models.ForeignKey(DisasterEvent, on_delete=models.CASCADE, related_name='archived_batches')
+    sequence = models.PositiveIntegerField()
+    row_count = models.PositiveIntegerField()
+    min_household_id = models.PositiveIntegerField(help_text="Lowest household_id in the batch")
+    max_household_id = models.PositiveIntegerField(help_text="Highest household_id in the batch")
+    raw_bytes = models.PositiveIntegerField(help_text="Size of the JSON before compression")
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['disaster', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['disaster', 'sequence'], name='unique_archived_assessment_batch'),
+        ]
+        indexes = [
+            # One household's history: the batches whose range covers it
+            models.Index(fields=['min_household_id', 'max_household_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.disaster.name} archive batch {self.sequence} ({self.row_count} rows)"
+
+
+class DuplicateHouseholdCandidate(models.Model):
+    """
+    Two households within DEDUP_RADIUS_METERS whose names and addresses look like the same
+    family entered twice, found by api.dedup. household is always the one with the lower id.
+    """
+
+    class Status(models.TextChoices):
+        OPEN = 'OPEN', 'Open'
+        CONFIRMED = 'CONFIRMED', 'Confirmed duplicate'
+        DISMISSED = 'DISMISSED', 'Not a duplicate'
+
+    household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    duplicate = models.ForeignKey(Household, on_delete=models.CASCADE, related_name='+')
+    distance_meters = models.FloatField()
+    name_similarity = models.FloatField()
+    address_similarity = models.FloatField()
+    score = models.FloatField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+    detected_at = models.DateTimeField(auto_now_add=True)
+    reviewed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['household', 'duplicate'], name='unique_duplicate_household_candidate'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.household_id} ~ {self.duplicate_id} ({self.score:.2f}, {self.status})"
+
+
+class SmsMessage(models.Model):
+    """
+    One outbound SMS in the delivery outbox (api.sms). The sender claims QUEUED messages
+    whose next_attempt_at has passed, retries failures with backoff and moves messages that
+    keep failing to DEAD; delivery receipts from the provider set DELIVERED or UNDELIVERED.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        SENDING = 'SENDING', 'Sending'
+        SENT = 'SENT', 'Sent (accepted by provider)'
+        DELIVERED = 'DELIVERED', 'Delivered'
+        UNDELIVERED = 'UNDELIVERED', 'Undelivered (receipt)'
+        DEAD = 'DEAD', 'Dead-lettered'
+
+    assessment = models.ForeignKey(
+        DamageAssessment, on_delete=models.SET_NULL, related_name='sms_messages', blank=True, null=True
+    )
+    campaign = models.CharField(max_length=100, blank=True, help_text="Groups one notice per assessment")
+    phone_number = models.CharField(max_length=20)
+    body = models.TextField()
+    provider = models.CharField(max_length=50)
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    provider_message_id = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    delivered_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['assessment', 'campaign'], condition=models.Q(assessment__isnull=False),
+                name='unique_sms_per_assessment_campaign',
+            ),
+        ]
+        indexes = [
+            # The sender's claim query
+            models.Index(fields=['provider', 'status', 'next_attempt_at']),
+            # Receipt lookups
+            models.Index(fields=['provider', 'provider_message_id']),
+            models.Index(fields=['campaign', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} ({self.status})"
@@ -0,0 +1,78 @@
+"""
+JSON encoding for large API responses.
+
+orjson is used when it is installed. It writes bytes directly and is several
+times faster than the stdlib `json`. Without it dumps() falls back to the stdlib
+with the same conventions: UTF-8 text rather than ASCII escapes, Decimals as
+strings, and datetimes in ISO 8601 at full precision with 'Z' for UTC. NaN and
+infinity are the one difference: orjson writes them as null, the fallback
+refuses them.
+"""
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _IsoJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but datetimes and times keep their microseconds as orjson writes them."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            text = o.isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        if isinstance(o, datetime.time):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _orjson_default(value):
+    # orjson calls this only for types it does not know; Decimals match DjangoJSONEncoder (strings)
+    if isinstance(value, Decimal):
+        return str(value)
+    return DjangoJSONEncoder().default(value)
+
+
+def dumps(data):
+    """Encodes data as JSON bytes with orjson if available, else with the stdlib json module."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_orjson_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, cls=_IsoJSONEncoder, separators=(',', ':'),
+                      ensure_ascii=False, allow_nan=False).encode()
+
+
+class FastJsonResponse(HttpResponse):
+    """Drop-in for JsonResponse (dict data only) that encodes with dumps()."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    DRF JSON renderer backed by orjson when installed.
+    Indented output (as requested by the browsable API) still goes through the stdlib.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """
+    JSON renderer registered under ?format=columnar.
+    DRF treats the `format` query parameter as a renderer override, so the compact
+    map feed needs a renderer with that format name to be reachable at all.
+    """
+    format = 'columnar'
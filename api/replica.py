@@ -0,0 +1,129 @@
+"""
+Read-replica routing.
+
+Read-only endpoints (map feeds, lists, summaries, exports) read from the 'replica'
+database alias so they don't queue behind bulk assessment ingest on the primary.
+Everything else, and every write, uses 'default'.
+
+The replica is used only when all of these hold:
+- settings.DATABASES has a 'replica' alias (see BANTAYAYUDA_REPLICA_DB in settings)
+- the request is a GET/HEAD to a view in REPLICA_READ_VIEWS
+- nothing was written earlier in the same request
+- the client has not written in the last REPLICA_PIN_SECONDS (read-after-write:
+  a successful POST/PUT/PATCH/DELETE sets a short-lived cookie that pins the
+  client's next reads to the primary, since the replica may not have caught up)
+
+Reads outside requests (management commands, background threads) use the primary.
+
+`python manage.py sync_replica` copies the primary with SQLite's online backup API
+and records when the copy was taken next to the replica file (REPLICA_FILE.synced).
+Change-feed cursors handed out with replica reads never run ahead of that time.
+"""
+from contextvars import ContextVar
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+
+PRIMARY_ALIAS = 'default'
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'pin_primary'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def synced_marker_path():
+    return f"{settings.DATABASES[REPLICA_ALIAS]['NAME']}.synced"
+
+
+def mark_synced(moment):
+    with open(synced_marker_path(), 'w') as marker:
+        marker.write(moment.isoformat())
+
+
+def replica_synced_at():
+    """When the replica was last copied, if this request reads from it; else None."""
+    if not (_use_replica.get() and replica_configured()):
+        return None
+    try:
+        with open(synced_marker_path()) as marker:
+            return datetime.fromisoformat(marker.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class PrimaryReplicaRouter:
+    """Database router: replica reads for flagged requests, primary for everything else."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects come from the database their parent came from
+            return instance._state.db
+        if _use_replica.get() and replica_configured():
+            return REPLICA_ALIAS
+        return PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Reads after a write in this request must see it
+        _use_replica.set(False)
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary (sync_replica), never migrated itself
+        return db != REPLICA_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Flags read-only requests for the replica and pins recent writers to the primary."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.read_views = set(getattr(settings, 'REPLICA_READ_VIEWS', []))
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+        # Set for every request and not reset afterwards: streaming responses (the
+        # manifest) read from the database after this method has returned.
+        _use_replica.set(self.reads_from_replica(request))
+        return self.pin_writer(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+        _use_replica.set(self.reads_from_replica(request))
+        return self.pin_writer(request, await self.get_response(request))
+
+    def pin_writer(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def reads_from_replica(self, request):
+        if request.method not in ('GET', 'HEAD') or PIN_COOKIE in request.COOKIES:
+            return False
+        try:
+            return resolve(request.path_info).url_name in self.read_views
+        except Resolver404:
+            return False
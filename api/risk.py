@@ -0,0 +1,68 @@
+"""
+Flood height ratio and risk tier of damage assessments.
+
+flood_height_ratio is flood_depth_meters / house_height_meters capped at 1.0 (the
+model's Flood_Height_Ratio feature), rounded to three decimals; risk_tier buckets
+it. Both are stored on DamageAssessment and indexed with disaster, so triage lists
+("highest risk first") are index range scans. DamageAssessment.save() sets them;
+writes that bypass save() (bulk inserts and updates) call refresh_risk(), and so
+does a change of house height.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import models
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, NullIf, Round
+from django.db.models.lookups import GreaterThan
+
+
+RATIO_PLACES = 3
+MAX_RATIO = Decimal('1')
+
+
+class RiskTier(models.IntegerChoices):
+    UNKNOWN = 0, 'Unknown'  # no flood depth or house height
+    LOW = 1, 'Low'
+    MEDIUM = 2, 'Medium'
+    HIGH = 3, 'High'
+
+
+# Lowest ratio of each tier, highest tier first; the same cut-offs as the rule-based ECT fallback
+TIER_BOUNDS = (
+    (Decimal('0.8'), RiskTier.HIGH),
+    (Decimal('0.4'), RiskTier.MEDIUM),
+    (Decimal('0'), RiskTier.LOW),
+)
+
+
+def flood_height_ratio(depth, height):
+    """The stored ratio for one assessment, or None without a depth or a house height."""
+    if depth is None or not height:
+        return None
+    ratio = min(Decimal(str(depth)) / Decimal(str(height)), MAX_RATIO)
+    return ratio.quantize(Decimal(1).scaleb(-RATIO_PLACES), ROUND_HALF_UP)
+
+
+def risk_tier(ratio):
+    if ratio is None:
+        return RiskTier.UNKNOWN
+    for bound, tier in TIER_BOUNDS:
+        if ratio >= bound:
+            return tier
+    return RiskTier.LOW
+
+
+def refresh_risk(assessments):
+    """Recomputes both columns for a DamageAssessment queryset in two UPDATEs; returns the row count."""
+    Household = assessments.model._meta.get_field('household').related_model
+    height = Subquery(Household.objects.filter(pk=OuterRef('household_id')).values('house_height_meters')[:1])
+    # As floats: SQLite divides whole-number decimals (1 / 2) as integers
+    ratio = Cast(F('flood_depth_meters'), FloatField()) / Cast(NullIf(height, Value(Decimal('0'))), FloatField())
+    # CASE rather than LEAST/MIN: a missing depth must stay NULL on every backend
+    capped = Case(When(GreaterThan(ratio, Value(1.0)), then=Value(1.0)), default=ratio)
+    count = assessments.update(flood_height_ratio=Round(capped, RATIO_PLACES))
+    assessments.update(risk_tier=Case(
+        *[When(flood_height_ratio__gte=bound, then=Value(tier)) for bound, tier in TIER_BOUNDS],
+        default=Value(RiskTier.UNKNOWN),
+    ))
+    return count
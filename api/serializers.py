@@ -1,21 +1,21 @@
-from rest_framework import serializers
-from .models import Household, DisasterEvent, DamageAssessment
-
+from decimal import Decimal
 
 from rest_framework import serializers
-from .models import Household, DisasterEvent, DamageAssessment
+from .models import Household, DisasterEvent, DamageAssessment, FloodRaster, DisasterSnapshot, DuplicateHouseholdCandidate
 
 
 class HouseholdSerializer(serializers.ModelSerializer):
     class Meta:
         model = Household
         fields = '__all__'
+        read_only_fields = ['assessment_count', 'partial_damage_count', 'total_damage_count']
 
 
 class DisasterEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = DisasterEvent
         fields = '__all__'
+        read_only_fields = ['archived_at']
 
 
 class DamageAssessmentSerializer(serializers.ModelSerializer):
@@ -27,4 +27,46 @@ class DamageAssessmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = DamageAssessment
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        # Set by the admin "mark reviewed" action
+        read_only_fields = ['is_reviewed', 'reviewed_at']
+
+
+class DuplicateHouseholdCandidateSerializer(serializers.ModelSerializer):
+    household_name = serializers.CharField(source='household.name', read_only=True)
+    household_address = serializers.CharField(source='household.address', read_only=True)
+    duplicate_name = serializers.CharField(source='duplicate.name', read_only=True)
+    duplicate_address = serializers.CharField(source='duplicate.address', read_only=True)
+
+    class Meta:
+        model = DuplicateHouseholdCandidate
+        fields = '__all__'
+        # Reviewers only set the status
+        read_only_fields = ['household', 'duplicate', 'distance_meters', 'name_similarity', 'address_similarity',
+                            'score', 'detected_at', 'reviewed_at']
+
+
+class FloodRasterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FloodRaster
+        fields = '__all__'
+
+
+class DisasterSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DisasterSnapshot
+        exclude = ['file_path']
+
+
+class SyncChangeSerializer(serializers.Serializer):
+    """One queued edit from an offline assessor device."""
+    idempotency_key = serializers.CharField(max_length=100)
+    household = serializers.IntegerField()
+    disaster = serializers.IntegerField()
+    damage_status = serializers.ChoiceField(choices=DamageAssessment.DamageStatus.choices)
+    flood_depth_meters = serializers.DecimalField(
+        max_digits=6, decimal_places=2, min_value=Decimal('0'), required=False, allow_null=True
+    )
+    notes = serializers.CharField(required=False, allow_blank=True)
+    assessed_by = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    client_updated_at = serializers.DateTimeField()
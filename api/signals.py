@@ -0,0 +1,149 @@
+"""
+Signal receivers that keep derived data in step with DamageAssessment and Household writes.
+Bulk paths that bypass save() (raw ingest, queryset.update) must refresh derived data themselves.
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import heatmap, history
+from .changes import encode_cursor, record_tombstone
+from .events import assessment_event, get_broker
+from .models import Household, DisasterEvent, DamageAssessment
+
+
+def _deleting_disaster(origin):
+    """True when a delete cascades from a DisasterEvent, whose derived rows go with it."""
+    return isinstance(origin, DisasterEvent) or getattr(origin, 'model', None) is DisasterEvent
+
+
+def _heatmap_row(assessment_values):
+    return (
+        assessment_values['disaster_id'],
+        assessment_values['household__latitude'],
+        assessment_values['household__longitude'],
+        assessment_values['damage_status'],
+        assessment_values['recommended_ect_amount'],
+    )
+
+
+@receiver(pre_save, sender=DamageAssessment)
+def remember_previous_assessment(sender, instance, raw=False, **kwargs):
+    """Stashes the stored version of the assessment so post_save can diff against it."""
+    instance._previous_heatmap_row = None
+    instance._previous_history_row = None
+    if raw or instance.pk is None:
+        return
+    previous = DamageAssessment.objects.filter(pk=instance.pk).values(
+        'disaster_id', 'household_id', 'household__latitude', 'household__longitude', 'damage_status',
+        'recommended_ect_amount'
+    ).first()
+    if previous is not None:
+        instance._previous_heatmap_row = _heatmap_row(previous)
+        instance._previous_history_row = (previous['household_id'], previous['damage_status'])
+
+
+@receiver(post_save, sender=DamageAssessment)
+def update_heatmap_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = (
+        instance.disaster_id,
+        instance.household.latitude,
+        instance.household.longitude,
+        instance.damage_status,
+        instance.recommended_ect_amount,
+    )
+    previous = getattr(instance, '_previous_heatmap_row', None)
+    if previous == current:
+        return
+    if previous is not None:
+        heatmap.apply_assessment(*previous, sign=-1)
+    heatmap.apply_assessment(*current, sign=1)
+
+
+@receiver(post_delete, sender=DamageAssessment)
+def update_heatmap_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleting_disaster(origin):
+        return
+    try:
+        # Cascades delete assessments before their household, so the row is still readable here
+        household = instance.household
+    except Household.DoesNotExist:
+        return
+    heatmap.apply_assessment(
+        instance.disaster_id,
+        household.latitude,
+        household.longitude,
+        instance.damage_status,
+        instance.recommended_ect_amount,
+        sign=-1,
+    )
+
+
+@receiver(pre_save, sender=Household)
+def move_heatmap_contributions(sender, instance, raw=False, **kwargs):
+    """Moves a relocated household's assessments to their new heatmap cells."""
+    if raw or instance.pk is None:
+        return
+    previous = Household.objects.filter(pk=instance.pk).values('latitude', 'longitude').first()
+    if previous is None or (previous['latitude'], previous['longitude']) == (instance.latitude, instance.longitude):
+        return
+    for disaster_id, damage_status, amount in instance.assessments.values_list(
+        'disaster_id', 'damage_status', 'recommended_ect_amount'
+    ):
+        heatmap.apply_assessment(disaster_id, previous['latitude'], previous['longitude'], damage_status, amount, sign=-1)
+        heatmap.apply_assessment(disaster_id, instance.latitude, instance.longitude, damage_status, amount, sign=1)
+
+
+@receiver(post_save, sender=DamageAssessment)
+def update_history_counts_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.household_id, instance.damage_status)
+    previous = getattr(instance, '_previous_history_row', None)
+    if previous == current:
+        return
+    if previous is not None:
+        history.apply_assessment_counts([previous], sign=-1)
+    history.apply_assessment_counts([current], sign=1)
+
+
+@receiver(post_delete, sender=DamageAssessment)
+def update_history_counts_on_delete(sender, instance, origin=None, **kwargs):
+    # Deleted disasters are taken out in one pass (pre_delete below); deleted households take their counters along
+    if _deleting_disaster(origin) or isinstance(origin, Household) or getattr(origin, 'model', None) is Household:
+        return
+    history.apply_assessment_counts([(instance.household_id, instance.damage_status)], sign=-1)
+
+
+@receiver(pre_delete, sender=DisasterEvent)
+def remove_disaster_history_counts(sender, instance, **kwargs):
+    history.remove_disaster_counts(instance.pk)
+
+
+@receiver(post_delete, sender=DamageAssessment)
+def tombstone_assessment(sender, instance, origin=None, **kwargs):
+    if not _deleting_disaster(origin):
+        record_tombstone(instance.household_id, instance.disaster_id)
+
+
+@receiver(post_delete, sender=Household)
+def tombstone_household(sender, instance, **kwargs):
+    record_tombstone(instance.pk)
+
+
+@receiver(post_save, sender=DamageAssessment)
+def push_assessment_event(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    event = assessment_event(instance, encode_cursor(instance.updated_at))
+    transaction.on_commit(lambda: get_broker().publish(instance.disaster_id, event))
+
+
+@receiver(post_delete, sender=DamageAssessment)
+def push_assessment_deleted_event(sender, instance, origin=None, **kwargs):
+    if _deleting_disaster(origin):
+        return
+    event = {'type': 'assessment_deleted', 'household_id': instance.household_id}
+    transaction.on_commit(lambda: get_broker().publish(instance.disaster_id, event))
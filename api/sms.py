@@ -0,0 +1,408 @@
+"""
+Outbound SMS delivery.
+
+Messages are written to the SmsMessage outbox first (enqueue_disaster_notices) and
+delivered by SmsSender, which per provider:
+- claims due QUEUED messages in batches, leasing them as SENDING so a crashed
+  sender's batch is picked up again once SMS_SENDING_LEASE_SECONDS pass
+- waits on a token bucket so it never exceeds the provider's rate_per_second
+- sends the batch through the provider, then records every result set-based:
+  accepted -> SENT, transient failure -> QUEUED again with exponential backoff,
+  permanent failure or SMS_MAX_ATTEMPTS reached -> DEAD (dead letter)
+
+Providers post delivery receipts to /api/sms/receipts/<provider>/, which moves
+messages to DELIVERED or UNDELIVERED. Receipts carry the outbox id as the client
+reference, so a receipt that overtakes the sender's own SENT write still applies
+(and the later SENT write only fills in sent_at and the provider's message id).
+
+Providers are configured by name in SMS_PROVIDERS; each entry names a SmsProvider
+subclass and its options. HttpGatewayProvider speaks the JSON protocol of the
+local stub gateway (`python manage.py sms_gateway_stub`).
+"""
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .bulk import bulk_insert_rows, db_now
+from .models import DamageAssessment, SmsMessage
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = (
+    'BantayAyuda: {name}, your household was assessed {status} damage after {disaster}. '
+    'Emergency cash transfer: PHP {amount:,.0f}. Bring a valid ID to your barangay hall.'
+)
+
+
+# --- RATE LIMITING ---
+
+
+class TokenBucket:
+    """Allows `rate` tokens per second on average and bursts of up to `capacity`. Thread-safe."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, count=1):
+        """Takes `count` tokens if available right now; returns whether it did."""
+        with self.lock:
+            self._refill()
+            if self.tokens >= count:
+                self.tokens -= count
+                return True
+            return False
+
+    def drain(self):
+        """Empties the bucket, e.g. after the provider pushed back, so sending resumes at the steady rate."""
+        with self.lock:
+            self._refill()
+            self.tokens = 0.0
+
+    def take(self, count=1):
+        """Blocks until `count` tokens are taken (in capacity-sized pieces); returns seconds waited."""
+        waited = 0.0
+        while count > 0:
+            piece = min(count, self.capacity)
+            with self.lock:
+                self._refill()
+                if self.tokens >= piece:
+                    self.tokens -= piece
+                    count -= piece
+                    continue
+                delay = (piece - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+
+# --- PROVIDERS ---
+
+
+@dataclass
+class SendResult:
+    message_id: int
+    accepted: bool
+    provider_message_id: str = ''
+    error: str = ''
+    retryable: bool = True
+    # The provider refused the batch for exceeding its throughput: resent without using up an attempt
+    throttled: bool = False
+
+
+@dataclass
+class Receipt:
+    message_id: int
+    delivered: bool
+    provider_message_id: str = ''
+    error: str = ''
+
+
+class SmsProvider:
+    """
+    Interface for SMS gateways. Subclasses implement send_batch() and parse_receipts();
+    rate_per_second, burst and batch_size come from the SMS_PROVIDERS entry.
+    """
+
+    def __init__(self, name, rate_per_second=10, burst=None, batch_size=50, **options):
+        self.name = name
+        self.rate_per_second = rate_per_second
+        self.burst = burst or rate_per_second
+        self.batch_size = min(batch_size, int(self.burst))
+        self.options = options
+
+    def send_batch(self, messages):
+        """Sends SmsMessage rows (id, phone_number, body); returns one SendResult per message."""
+        raise NotImplementedError
+
+    def parse_receipts(self, data):
+        """Turns a receipt callback body into Receipts."""
+        raise NotImplementedError
+
+
+class HttpGatewayProvider(SmsProvider):
+    """
+    JSON-over-HTTP gateway:
+      POST {url}/send {"messages": [{"reference": id, "to": ..., "body": ...}]}
+        200 -> {"results": [{"reference": id, "status": "accepted" | "rejected", "message_id": ..., "error": ...}]}
+        429 -> the whole batch is resent shortly, 5xx / timeout -> it is retried with backoff
+      receipts: {"receipts": [{"reference": id, "message_id": ..., "status": "delivered" | "failed", "error": ...}]}
+    Rejected messages (bad number, blocked content) are not retried.
+    """
+
+    def __init__(self, name, url, timeout=10, **options):
+        super().__init__(name, **options)
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send_batch(self, messages):
+        payload = {'messages': [{'reference': m.pk, 'to': m.phone_number, 'body': m.body} for m in messages]}
+        try:
+            response = self.session.post(f'{self.url}/send', json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            return [SendResult(m.pk, False, error=f'{type(e).__name__}: {e}') for m in messages]
+        if response.status_code != 200:
+            error = f'HTTP {response.status_code}: {response.text[:200]}'
+            throttled = response.status_code == 429
+            return [SendResult(m.pk, False, error=error, throttled=throttled) for m in messages]
+
+        results = {item.get('reference'): item for item in response.json().get('results', [])}
+        out = []
+        for message in messages:
+            item = results.get(message.pk)
+            if item is None:
+                out.append(SendResult(message.pk, False, error='Missing from gateway response'))
+            elif item.get('status') == 'accepted':
+                out.append(SendResult(message.pk, True, provider_message_id=str(item.get('message_id', ''))))
+            else:
+                out.append(SendResult(message.pk, False, error=item.get('error', 'rejected'), retryable=False))
+        return out
+
+    def parse_receipts(self, data):
+        return [
+            Receipt(int(item['reference']), item.get('status') == 'delivered',
+                    str(item.get('message_id', '')), item.get('error', ''))
+            for item in data.get('receipts', [])
+        ]
+
+
+class UnknownProvider(KeyError):
+    pass
+
+
+def get_provider(name):
+    """Builds the provider named in SMS_PROVIDERS."""
+    try:
+        config = dict(getattr(settings, 'SMS_PROVIDERS', {})[name])
+    except KeyError:
+        raise UnknownProvider(name)
+    provider_class = import_string(config.pop('class'))
+    return provider_class(name, **config)
+
+
+def default_provider_name():
+    return getattr(settings, 'SMS_DEFAULT_PROVIDER', 'stub')
+
+
+# --- OUTBOX ---
+
+
+def enqueue_disaster_notices(disaster, statuses=None, campaign=None, provider=None, template=None):
+    """
+    Queues one ECT notice per assessment of the disaster (households with a contact
+    number only). Assessments that already have a message in the campaign are skipped,
+    so this can be re-run. Returns the number queued.
+    """
+    statuses = statuses or [DamageAssessment.DamageStatus.PARTIAL, DamageAssessment.DamageStatus.TOTAL]
+    campaign = campaign or f'ect-notice-{disaster.pk}'
+    provider = provider or default_provider_name()
+    template = template or getattr(settings, 'SMS_TEMPLATE', DEFAULT_TEMPLATE)
+    now = db_now(timezone.now())
+
+    assessments = (
+        DamageAssessment.objects.filter(disaster=disaster, damage_status__in=statuses)
+        .exclude(household__contact_number__isnull=True).exclude(household__contact_number='')
+        .exclude(sms_messages__campaign=campaign)
+        .values_list('pk', 'household__name', 'household__contact_number', 'damage_status', 'recommended_ect_amount')
+    )
+    queued = 0
+
+    def rows():
+        nonlocal queued
+        for pk, name, phone, damage_status, amount in assessments.iterator(chunk_size=5000):
+            queued += 1
+            body = template.format(name=name, status=damage_status.lower(), disaster=disaster.name, amount=amount)
+            yield (pk, campaign, phone, body, provider, SmsMessage.Status.QUEUED, 0, now, '', '', now)
+
+    with transaction.atomic():
+        bulk_insert_rows(SmsMessage, OUTBOX_INSERT_FIELDS, rows())
+    return queued
+
+
+OUTBOX_INSERT_FIELDS = [
+    'assessment', 'campaign', 'phone_number', 'body', 'provider', 'status', 'attempts',
+    'next_attempt_at', 'provider_message_id', 'last_error', 'created_at',
+]
+
+
+def _execute_many(sql, rows):
+    """Runs `sql` once per row; returns the number of rows it changed."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+        return cursor.rowcount
+
+
+def _update_sql(assignments, where, expressions=()):
+    """UPDATE of the outbox setting each column in `assignments` from a parameter, plus raw SQL `expressions`."""
+    qn = connection.ops.quote_name
+    return 'UPDATE %s SET %s WHERE %s' % (
+        qn(SmsMessage._meta.db_table),
+        ', '.join([*(f'{qn(column)} = %s' for column in assignments), *expressions]),
+        where,
+    )
+
+
+def apply_receipts(receipts):
+    """
+    Records delivery receipts; returns (applied, ignored). Receipts for messages already
+    in a final state, or unknown to the outbox, are ignored.
+    """
+    qn = connection.ops.quote_name
+    now = db_now(timezone.now())
+    sql = _update_sql(
+        ['status', 'delivered_at', 'last_error'],
+        f'{qn("id")} = %s AND {qn("status")} IN (%s, %s)',
+        # Receipts without the provider's id keep the one from the send
+        [f'{qn("provider_message_id")} = COALESCE(NULLIF(%s, \'\'), {qn("provider_message_id")})'],
+    )
+    rows = [
+        (SmsMessage.Status.DELIVERED if r.delivered else SmsMessage.Status.UNDELIVERED, now, r.error,
+         r.provider_message_id, r.message_id, SmsMessage.Status.SENDING, SmsMessage.Status.SENT)
+        for r in receipts
+    ]
+    applied = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for row in rows:
+            cursor.execute(sql, row)
+            applied += cursor.rowcount
+    return applied, len(rows) - applied
+
+
+def retry_delay(attempts):
+    """Exponential backoff with +/-20% jitter, so a failed batch doesn't retry in lockstep."""
+    base = getattr(settings, 'SMS_RETRY_BASE_SECONDS', 2)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'SMS_RETRY_MAX_SECONDS', 300))
+    return delay * random.uniform(0.8, 1.2)
+
+
+# --- SENDER ---
+
+
+class SmsSender:
+    """Delivers one provider's outbox. Threads of one sender share its token bucket."""
+
+    def __init__(self, provider):
+        self.provider = provider if isinstance(provider, SmsProvider) else get_provider(provider)
+        self.bucket = TokenBucket(self.provider.rate_per_second, self.provider.burst)
+        self.max_attempts = getattr(settings, 'SMS_MAX_ATTEMPTS', 5)
+        self.lease = timedelta(seconds=getattr(settings, 'SMS_SENDING_LEASE_SECONDS', 120))
+        self.stats_lock = threading.Lock()
+        self.stats = {'sent': 0, 'retried': 0, 'throttled': 0, 'dead': 0, 'throttled_seconds': 0.0}
+
+    def claim(self):
+        """Leases the next due batch (QUEUED, or SENDING with an expired lease) to this sender."""
+        now = timezone.now()
+        due = SmsMessage.objects.filter(
+            Q(status=SmsMessage.Status.QUEUED) | Q(status=SmsMessage.Status.SENDING),
+            provider=self.provider.name, next_attempt_at__lte=now,
+        ).order_by('next_attempt_at')
+        with transaction.atomic():
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            # SQLite: the IMMEDIATE transaction (SQLITE_OPTIONS) already serializes claims
+            ids = list(due.values_list('id', flat=True)[:self.provider.batch_size])
+            if not ids:
+                return []
+            SmsMessage.objects.filter(id__in=ids).update(
+                status=SmsMessage.Status.SENDING, attempts=F('attempts') + 1, next_attempt_at=now + self.lease,
+            )
+            return list(SmsMessage.objects.filter(id__in=ids).only('id', 'phone_number', 'body', 'attempts'))
+
+    def send_next_batch(self):
+        """Claims, rate-limits, sends and records one batch; returns its size (0 when nothing is due)."""
+        batch = self.claim()
+        if not batch:
+            return 0
+        waited = self.bucket.take(len(batch))
+        try:
+            results = self.provider.send_batch(batch)
+        except Exception as e:
+            logger.exception('SMS provider %s failed', self.provider.name)
+            results = [SendResult(message.pk, False, error=f'{type(e).__name__}: {e}') for message in batch]
+        self.record(batch, results)
+        if any(result.throttled for result in results):
+            self.bucket.drain()
+        with self.stats_lock:
+            self.stats['throttled_seconds'] += waited
+        return len(batch)
+
+    def record(self, batch, results):
+        qn = connection.ops.quote_name
+        attempts = {message.pk: message.attempts for message in batch}
+        now = timezone.now()
+        sent, overtaken, retry, throttled, dead = [], [], [], [], []
+        for result in results:
+            if result.accepted:
+                sent.append((SmsMessage.Status.SENT, result.provider_message_id, db_now(now), '',
+                             result.message_id, SmsMessage.Status.SENDING))
+                overtaken.append((db_now(now), result.provider_message_id, result.message_id,
+                                  SmsMessage.Status.DELIVERED, SmsMessage.Status.UNDELIVERED))
+            elif result.throttled:
+                throttled.append((SmsMessage.Status.QUEUED, db_now(now + timedelta(seconds=1)), result.error,
+                                  result.message_id, SmsMessage.Status.SENDING))
+            elif result.retryable and attempts[result.message_id] < self.max_attempts:
+                retry.append((SmsMessage.Status.QUEUED, db_now(now + timedelta(seconds=retry_delay(
+                    attempts[result.message_id]))), result.error, result.message_id, SmsMessage.Status.SENDING))
+            else:
+                dead.append((SmsMessage.Status.DEAD, result.error, result.message_id, SmsMessage.Status.SENDING))
+
+        # Only rows still SENDING: a receipt may already have moved a message to its final status
+        where = f'{qn("id")} = %s AND {qn("status")} = %s'
+        with transaction.atomic():
+            if _execute_many(_update_sql(['status', 'provider_message_id', 'sent_at', 'last_error'], where),
+                             sent) < len(sent):
+                # Receipts that got here first set the final status, but not when or as what the message was sent
+                _execute_many(_update_sql(
+                    ['sent_at'], f'{qn("id")} = %s AND {qn("status")} IN (%s, %s) AND {qn("sent_at")} IS NULL',
+                    [f'{qn("provider_message_id")} = COALESCE(NULLIF({qn("provider_message_id")}, \'\'), %s)'],
+                ), overtaken)
+            _execute_many(_update_sql(['status', 'next_attempt_at', 'last_error'], where), retry)
+            _execute_many(_update_sql(['status', 'next_attempt_at', 'last_error'], where,
+                                      [f'{qn("attempts")} = {qn("attempts")} - 1']), throttled)
+            _execute_many(_update_sql(['status', 'last_error'], where), dead)
+        with self.stats_lock:
+            self.stats['sent'] += len(sent)
+            self.stats['retried'] += len(retry)
+            self.stats['throttled'] += len(throttled)
+            self.stats['dead'] += len(dead)
+
+    def run(self, stop=None, until_idle=True, poll_seconds=1.0):
+        """
+        Sends batches until `stop` is set, or (with until_idle) until nothing is queued or
+        leased for this provider. Waits poll_seconds whenever nothing is due yet.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if self.send_next_batch():
+                continue
+            if until_idle and not self.pending():
+                return
+            stop.wait(poll_seconds)
+
+    def pending(self):
+        return SmsMessage.objects.filter(
+            provider=self.provider.name, status__in=[SmsMessage.Status.QUEUED, SmsMessage.Status.SENDING]
+        ).exists()
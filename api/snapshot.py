@@ -0,0 +1,267 @@
+"""
+Columnar snapshots of a disaster's data for analysts.
+
+One row per assessment, joined with its household, written column by column:
+- NumPy `.npz` (uncompressed, so every column can be memory-mapped), or
+- an Arrow IPC file when `pyarrow` is installed and SNAPSHOT_FORMAT allows it.
+
+Barangay and damage status are dictionary-encoded: an integer code column plus
+a `<column>_values` array (NumPy) or a native dictionary column (Arrow).
+
+Snapshots are built in a background thread and cached per data version, a
+fingerprint that changes whenever the disaster's assessments or any household
+change. Requesting a snapshot for unchanged data returns the cached file.
+"""
+import hashlib
+import os
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .flood_raster import load_npz_array
+from .models import Household, DamageAssessment, MapFeatureTombstone, DisasterSnapshot
+
+
+STATUS_VALUES = np.array(DamageAssessment.DamageStatus.values)
+
+_SELECT_COLUMNS = (
+    ('assessment_id', 'a.id'),
+    ('household_id', 'a.household_id'),
+    ('latitude', 'h.latitude'),
+    ('longitude', 'h.longitude'),
+    ('barangay', 'h.barangay'),
+    ('is_4ps_recipient', 'h.is_4ps_recipient'),
+    ('house_height_meters', 'h.house_height_meters'),
+    ('house_width_meters', 'h.house_width_meters'),
+    ('damage_status', 'a.damage_status'),
+    ('flood_depth_meters', 'a.flood_depth_meters'),
+    ('recommended_ect_amount', 'a.recommended_ect_amount'),
+    ('assessed_at', 'a.assessed_at'),
+    ('updated_at', 'a.updated_at'),
+)
+
+
+def snapshot_format(requested=None):
+    """
+    Resolves the file format: the requested one, else SNAPSHOT_FORMAT.
+    'auto' means Arrow when pyarrow is importable and .npz otherwise.
+    """
+    wanted = requested or getattr(settings, 'SNAPSHOT_FORMAT', 'auto')
+    if wanted == DisasterSnapshot.FileFormat.NPZ:
+        return DisasterSnapshot.FileFormat.NPZ
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        if wanted == DisasterSnapshot.FileFormat.ARROW:
+            raise ImportError('Arrow snapshots require the pyarrow package: pip install pyarrow')
+        return DisasterSnapshot.FileFormat.NPZ
+    return DisasterSnapshot.FileFormat.ARROW
+
+
+def data_version(disaster_id):
+    """
+    Fingerprint of the disaster's data. Each part is answered from an index:
+    assessment count and latest update, latest household update, latest deletion.
+    """
+    assessments = DamageAssessment.objects.filter(disaster_id=disaster_id).aggregate(
+        count=Count('id'), latest=Max('updated_at')
+    )
+    households = Household.objects.aggregate(latest=Max('updated_at'))
+    deletions = MapFeatureTombstone.objects.filter(
+        Q(disaster_id=disaster_id) | Q(disaster__isnull=True)
+    ).aggregate(latest=Max('deleted_at'))
+
+    parts = (disaster_id, assessments['count'], assessments['latest'], households['latest'], deletions['latest'])
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+# --- READING ---
+
+
+def _float_column(series, dtype=np.float64):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=dtype, na_value=np.nan)
+
+
+def _datetime_column(series):
+    # Stored as UTC; kept as naive datetime64 so the column can be memory-mapped
+    return pd.to_datetime(series, utc=True).dt.tz_localize(None).to_numpy('datetime64[us]')
+
+
+def read_columns(disaster_id, chunk_size=100_000):
+    """Reads the disaster's rows off a raw cursor and returns {column: ndarray}."""
+    names = [name for name, _ in _SELECT_COLUMNS]
+    sql = (
+        f'SELECT {", ".join(expression for _, expression in _SELECT_COLUMNS)} '
+        f'FROM {connection.ops.quote_name(DamageAssessment._meta.db_table)} a '
+        f'JOIN {connection.ops.quote_name(Household._meta.db_table)} h ON h.id = a.household_id '
+        f'WHERE a.disaster_id = %s ORDER BY a.id'
+    )
+
+    frames = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [disaster_id])
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            frames.append(pd.DataFrame.from_records(rows, columns=names))
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=names)
+
+    barangay_codes, barangay_values = pd.factorize(frame['barangay'].astype(str), sort=True)
+    status_codes = pd.Categorical(frame['damage_status'], categories=STATUS_VALUES).codes
+
+    return {
+        'assessment_id': frame['assessment_id'].to_numpy(np.int64),
+        'household_id': frame['household_id'].to_numpy(np.int64),
+        'latitude': _float_column(frame['latitude']),
+        'longitude': _float_column(frame['longitude']),
+        'barangay': barangay_codes.astype(np.int32),
+        'barangay_values': np.asarray(barangay_values, dtype=str),
+        'is_4ps_recipient': frame['is_4ps_recipient'].to_numpy(bool),
+        'house_height_meters': _float_column(frame['house_height_meters'], np.float32),
+        'house_width_meters': _float_column(frame['house_width_meters'], np.float32),
+        'damage_status': status_codes.astype(np.int8),
+        'damage_status_values': STATUS_VALUES,
+        'flood_depth_meters': _float_column(frame['flood_depth_meters'], np.float32),
+        'recommended_ect_amount': _float_column(frame['recommended_ect_amount']),
+        'assessed_at': _datetime_column(frame['assessed_at']),
+        'updated_at': _datetime_column(frame['updated_at']),
+    }
+
+
+# --- WRITING ---
+
+
+def _write_npz(path, columns):
+    # np.savez stores members uncompressed, which is what makes them memory-mappable
+    with open(path, 'wb') as fh:
+        np.savez(fh, **columns)
+
+
+def _write_arrow(path, columns):
+    import pyarrow as pa
+
+    arrays, names = [], []
+    for name, values in columns.items():
+        if name.endswith('_values'):
+            continue
+        if f'{name}_values' in columns:
+            array = pa.DictionaryArray.from_arrays(values, columns[f'{name}_values'].tolist())
+        elif values.dtype.kind == 'M':
+            array = pa.array(values, type=pa.timestamp('us', tz='UTC'))
+        else:
+            array = pa.array(values, from_pandas=True)
+        arrays.append(array)
+        names.append(name)
+
+    table = pa.Table.from_arrays(arrays, names=names)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def build_snapshot(snapshot):
+    """Writes the snapshot's file, marks it READY and removes the disaster's older snapshots."""
+    root = getattr(settings, 'SNAPSHOT_ROOT', settings.BASE_DIR / 'media' / 'snapshots')
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f'disaster-{snapshot.disaster_id}-{snapshot.data_version}.{snapshot.file_format}')
+
+    columns = read_columns(snapshot.disaster_id)
+    partial_path = f'{path}.partial'
+    if snapshot.file_format == DisasterSnapshot.FileFormat.ARROW:
+        _write_arrow(partial_path, columns)
+    else:
+        _write_npz(partial_path, columns)
+    os.replace(partial_path, path)
+
+    snapshot.status = DisasterSnapshot.Status.READY
+    snapshot.file_path = path
+    snapshot.row_count = len(columns['assessment_id'])
+    snapshot.size_bytes = os.path.getsize(path)
+    snapshot.error = ''
+    snapshot.finished_at = timezone.now()
+    snapshot.save()
+
+    # Older versions are superseded; other formats of this version stay cached
+    superseded = DisasterSnapshot.objects.filter(
+        disaster_id=snapshot.disaster_id, requested_at__lt=snapshot.requested_at
+    ).exclude(data_version=snapshot.data_version)
+    for old in superseded:
+        if old.file_path and os.path.exists(old.file_path):
+            os.remove(old.file_path)
+        old.delete()
+    return snapshot
+
+
+def _build_in_background(snapshot_id):
+    try:
+        snapshot = DisasterSnapshot.objects.get(pk=snapshot_id)
+        try:
+            build_snapshot(snapshot)
+        except Exception as e:
+            snapshot.status = DisasterSnapshot.Status.FAILED
+            snapshot.error = str(e)
+            snapshot.finished_at = timezone.now()
+            snapshot.save()
+    finally:
+        # The thread opened its own database connection
+        connections.close_all()
+
+
+def request_snapshot(disaster, file_format=None):
+    """
+    Returns the snapshot for the disaster's current data, starting a background
+    build if none exists yet (or the last one failed or was abandoned).
+    """
+    file_format = snapshot_format(file_format)
+    version = data_version(disaster.pk)
+    snapshot, created = DisasterSnapshot.objects.get_or_create(
+        disaster=disaster, data_version=version, file_format=file_format
+    )
+
+    abandoned_before = timezone.now() - timedelta(seconds=getattr(settings, 'SNAPSHOT_JOB_TIMEOUT_SECONDS', 3600))
+    retry = snapshot.status == DisasterSnapshot.Status.FAILED or (
+        snapshot.status == DisasterSnapshot.Status.PENDING and snapshot.requested_at < abandoned_before
+    )
+    if retry:
+        snapshot.status = DisasterSnapshot.Status.PENDING
+        snapshot.error = ''
+        snapshot.requested_at = timezone.now()
+        DisasterSnapshot.objects.filter(pk=snapshot.pk).update(
+            status=snapshot.status, error='', requested_at=snapshot.requested_at
+        )
+
+    if created or retry:
+        transaction.on_commit(
+            lambda: threading.Thread(target=_build_in_background, args=(snapshot.pk,), daemon=True).start()
+        )
+    return snapshot
+
+
+def current_snapshot(disaster):
+    """The snapshot of the disaster's current data version, if any; a ready one is preferred."""
+    snapshots = list(DisasterSnapshot.objects.filter(disaster=disaster, data_version=data_version(disaster.pk)))
+    ready = [snapshot for snapshot in snapshots if snapshot.status == DisasterSnapshot.Status.READY]
+    return (ready or snapshots or [None])[0]
+
+
+# --- LOADING ---
+
+
+def open_snapshot(path):
+    """
+    Opens a snapshot file without reading it into memory.
+    Returns {column: memory-mapped ndarray} for .npz, or a pyarrow Table for .arrow.
+    """
+    if path.endswith('.arrow'):
+        import pyarrow as pa
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+    with np.load(path) as archive:
+        names = list(archive.files)
+    return {name: load_npz_array(path, name) for name in names}
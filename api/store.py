@@ -0,0 +1,383 @@
+"""
+Per-process columnar cache of households and assessments.
+
+Read paths that scan every household (the columnar map feed, disaster summaries,
+allocation runs) can read NumPy columns from here instead of building ORM
+instances with Decimal fields on every request:
+
+- HouseholdTable holds id, latitude, longitude, barangay code, house
+  dimensions and the 4Ps flag for every household. It is always resident.
+- AssessmentTable holds one disaster's assessments, keyed by household id. It is
+  loaded on first use and evicted least-recently-used once the store grows past
+  STORE_MEMORY_BUDGET_MB.
+
+Tables refresh incrementally. Rows with `updated_at` after the table's
+watermark are re-read, and MapFeatureTombstone rows remove deleted ones. The
+watermark trails the refresh start by CHANGE_FEED_OVERLAP_SECONDS, so in-flight
+commits are picked up on the next refresh. Reads within
+STORE_REFRESH_INTERVAL_SECONDS of the last check do not touch the database.
+
+Refreshing swaps in new arrays instead of writing into the old ones. A caller
+holding a frame keeps a consistent view while other threads refresh.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Household, DamageAssessment, MapFeatureTombstone
+
+
+STATUS_VALUES = list(DamageAssessment.DamageStatus.values)
+NONE_CODE = STATUS_VALUES.index(DamageAssessment.DamageStatus.NONE)
+
+
+def _numeric(series, dtype=np.float64):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype, na_value=np.nan)
+
+
+class ColumnTable:
+    """
+    Columns sorted by an integer key, refreshed from `updated_at` and tombstones.
+    Subclasses describe the query and how raw rows become columns.
+    """
+    key = None
+    select = ()
+
+    def __init__(self):
+        self.columns = None
+        self.watermark = None
+        self.as_of = None
+        self.version = 0
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # --- to implement ---
+
+    def base_query(self):
+        """(FROM/WHERE sql, params) selecting the table's rows."""
+        raise NotImplementedError
+
+    def deleted_keys(self, since):
+        raise NotImplementedError
+
+    def to_columns(self, frame):
+        raise NotImplementedError
+
+    # --- shared ---
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values()) if self.columns else 0
+
+    def __len__(self):
+        return len(self.columns[self.key]) if self.columns else 0
+
+    def _read(self, since):
+        source, params = self.base_query()
+        sql = f'SELECT {", ".join(expression for _, expression in self.select)} {source}'
+        if since is not None:
+            sql += ' AND updated_at > %s'
+            params = [*params, connection.ops.adapt_datetimefield_value(since)]
+
+        names = [name for name, _ in self.select]
+        frames = []
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(100_000)
+                if not rows:
+                    break
+                frames.append(pd.DataFrame.from_records(rows, columns=names))
+        return self.to_columns(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=names))
+
+    def refresh(self, max_age=None):
+        """Brings the table up to date unless it was checked within max_age seconds."""
+        if max_age is None:
+            max_age = getattr(settings, 'STORE_REFRESH_INTERVAL_SECONDS', 2)
+        if self.columns is not None and time.monotonic() - self.checked_at < max_age:
+            return self
+
+        with self._lock:
+            if self.columns is not None and time.monotonic() - self.checked_at < max_age:
+                return self
+            started = timezone.now()
+            overlap = timedelta(seconds=getattr(settings, 'CHANGE_FEED_OVERLAP_SECONDS', 2))
+
+            if self.columns is None:
+                self._replace(self._read(None))
+            else:
+                changed = self._read(self.watermark)
+                deleted = self.deleted_keys(self.watermark)
+                if len(changed[self.key]) or len(deleted):
+                    self._merge(changed, deleted)
+
+            self.watermark = started - overlap
+            self.as_of = self.watermark
+            self.checked_at = time.monotonic()
+        return self
+
+    def _replace(self, columns):
+        order = np.argsort(columns[self.key], kind='stable')
+        self.columns = {name: values[order] for name, values in columns.items()}
+        self.version += 1
+
+    def _merge(self, changed, deleted):
+        current = self.columns
+        drop = np.isin(current[self.key], np.concatenate([changed[self.key], np.asarray(deleted, np.int64)]))
+        keep = ~drop
+        self._replace({name: np.concatenate([current[name][keep], changed[name]]) for name in current})
+
+
+class HouseholdTable(ColumnTable):
+    key = 'id'
+    select = (
+        ('id', 'id'),
+        ('latitude', 'latitude'),
+        ('longitude', 'longitude'),
+        ('barangay', 'barangay'),
+        ('house_height_meters', 'house_height_meters'),
+        ('house_width_meters', 'house_width_meters'),
+        ('is_4ps_recipient', 'is_4ps_recipient'),
+    )
+
+    def __init__(self):
+        super().__init__()
+        # Codes only ever grow, so codes held by older frames stay valid
+        self.barangay_values = []
+        self._barangay_codes = {}
+
+    def base_query(self):
+        return f'FROM {connection.ops.quote_name(Household._meta.db_table)} WHERE 1 = 1', []
+
+    def deleted_keys(self, since):
+        # Same database as the column reads, so deletions and the watermark agree
+        return list(MapFeatureTombstone.objects.using(connection.alias).filter(
+            disaster__isnull=True, deleted_at__gt=since
+        ).values_list('household_id', flat=True))
+
+    def barangay_code(self, name):
+        code = self._barangay_codes.get(name)
+        if code is None:
+            code = self._barangay_codes[name] = len(self.barangay_values)
+            self.barangay_values.append(name)
+        return code
+
+    def barangay_codes(self, names):
+        local_codes, uniques = pd.factorize(names.astype(str))
+        mapping = np.array([self.barangay_code(name) for name in uniques], dtype=np.int32)
+        return mapping[local_codes] if len(mapping) else np.zeros(len(names), np.int32)
+
+    def to_columns(self, frame):
+        return {
+            'id': frame['id'].to_numpy(np.int64),
+            'latitude': _numeric(frame['latitude']),
+            'longitude': _numeric(frame['longitude']),
+            'barangay': self.barangay_codes(frame['barangay']),
+            'house_height_meters': _numeric(frame['house_height_meters'], np.float32),
+            'house_width_meters': _numeric(frame['house_width_meters'], np.float32),
+            'is_4ps_recipient': frame['is_4ps_recipient'].to_numpy(bool),
+        }
+
+
+class AssessmentTable(ColumnTable):
+    key = 'household_id'
+    select = (
+        ('household_id', 'household_id'),
+        ('id', 'id'),
+        ('damage_status', 'damage_status'),
+        ('recommended_ect_amount', 'recommended_ect_amount'),
+        ('flood_depth_meters', 'flood_depth_meters'),
+    )
+
+    def __init__(self, disaster_id):
+        super().__init__()
+        self.disaster_id = disaster_id
+        self.last_used = time.monotonic()
+
+    def base_query(self):
+        table = connection.ops.quote_name(DamageAssessment._meta.db_table)
+        return f'FROM {table} WHERE disaster_id = %s', [self.disaster_id]
+
+    def deleted_keys(self, since):
+        return list(MapFeatureTombstone.objects.using(connection.alias).filter(
+            disaster_id=self.disaster_id, deleted_at__gt=since
+        ).values_list('household_id', flat=True))
+
+    def to_columns(self, frame):
+        return {
+            'household_id': frame['household_id'].to_numpy(np.int64),
+            'id': frame['id'].to_numpy(np.int64),
+            'damage_status': pd.Categorical(frame['damage_status'], categories=STATUS_VALUES).codes.astype(np.int8),
+            'recommended_ect_amount': _numeric(frame['recommended_ect_amount']),
+            'flood_depth_meters': _numeric(frame['flood_depth_meters'], np.float32),
+        }
+
+
+class DisasterFrame:
+    """
+    Every household joined with its assessment for one disaster, as aligned arrays.
+    Households without an assessment have damage_status NONE, ECT 0 and no flood depth.
+    """
+
+    def __init__(self, households, assessments):
+        self.disaster_id = assessments.disaster_id
+        self.as_of = min(households.as_of, assessments.as_of)
+        self.barangay_values = list(households.barangay_values)
+        self.columns = dict(households.columns)
+
+        ids = self.columns['id']
+        assessed_ids = assessments.columns['household_id']
+        position = np.minimum(np.searchsorted(assessed_ids, ids), max(len(assessed_ids) - 1, 0))
+        matched = (assessed_ids[position] == ids) if len(assessed_ids) else np.zeros(len(ids), bool)
+
+        def joined(name, fill, dtype):
+            values = np.full(len(ids), fill, dtype=dtype)
+            if len(assessed_ids):
+                values[matched] = assessments.columns[name][position[matched]]
+            return values
+
+        self.columns['has_assessment'] = matched
+        self.columns['assessment_id'] = joined('id', -1, np.int64)
+        self.columns['damage_status'] = joined('damage_status', NONE_CODE, np.int8)
+        self.columns['recommended_ect_amount'] = joined('recommended_ect_amount', 0.0, np.float64)
+        self.columns['flood_depth_meters'] = joined('flood_depth_meters', np.nan, np.float32)
+        self.nbytes = sum(values.nbytes for values in self.columns.values())
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def mask(self, barangays=None, statuses=None):
+        """Boolean row filter by barangay names and damage status values."""
+        selected = np.ones(len(self), bool)
+        if barangays:
+            codes = [self.barangay_values.index(name) for name in barangays if name in self.barangay_values]
+            selected &= np.isin(self.columns['barangay'], codes)
+        if statuses:
+            selected &= np.isin(self.columns['damage_status'], [STATUS_VALUES.index(value) for value in statuses])
+        return selected
+
+    def summary(self, barangays=None, statuses=None):
+        """Household counts and ECT totals per damage status and per barangay."""
+        selected = self.mask(barangays, statuses)
+        status = self.columns['damage_status'][selected]
+        barangay = self.columns['barangay'][selected]
+        amount = self.columns['recommended_ect_amount'][selected]
+
+        size = len(self.barangay_values)
+        per_barangay_count = np.bincount(barangay, minlength=size)
+        per_barangay_amount = np.bincount(barangay, weights=amount, minlength=size)
+        per_barangay_damaged = np.bincount(barangay[status != NONE_CODE], minlength=size)
+
+        return {
+            'disaster_id': self.disaster_id,
+            'households': int(selected.sum()),
+            'assessed': int(self.columns['has_assessment'][selected].sum()),
+            'damaged': int((status != NONE_CODE).sum()),
+            'total_ect_amount': float(amount.sum()),
+            'by_status': {
+                value: {
+                    'households': int((status == code).sum()),
+                    'ect_amount': float(amount[status == code].sum()),
+                }
+                for code, value in enumerate(STATUS_VALUES)
+            },
+            'by_barangay': [
+                {
+                    'barangay': self.barangay_values[code],
+                    'households': int(per_barangay_count[code]),
+                    'damaged': int(per_barangay_damaged[code]),
+                    'ect_amount': float(per_barangay_amount[code]),
+                }
+                for code in np.argsort(self.barangay_values) if per_barangay_count[code]
+            ],
+        }
+
+
+class ColumnarStore:
+    """Holds the household table and an LRU set of per-disaster assessment tables."""
+
+    def __init__(self, budget_bytes=None):
+        if budget_bytes is None:
+            budget_bytes = getattr(settings, 'STORE_MEMORY_BUDGET_MB', 512) * 1024 * 1024
+        self.budget_bytes = budget_bytes
+        self.households = HouseholdTable()
+        self._disasters = OrderedDict()
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def assessments(self, disaster_id, max_age=None):
+        disaster_id = int(disaster_id)
+        with self._lock:
+            table = self._disasters.get(disaster_id)
+            if table is None:
+                table = self._disasters[disaster_id] = AssessmentTable(disaster_id)
+            self._disasters.move_to_end(disaster_id)
+            table.last_used = time.monotonic()
+        return table.refresh(max_age)
+
+    def frame(self, disaster_id, max_age=None):
+        """The joined DisasterFrame for a disaster, rebuilt only when either table changed."""
+        households = self.households.refresh(max_age)
+        assessments = self.assessments(disaster_id, max_age)
+        key = (households.version, assessments.version)
+
+        cached = self._frames.get(assessments.disaster_id)
+        if cached is not None and cached[0] == key:
+            frame = cached[1]
+            frame.as_of = min(households.as_of, assessments.as_of)
+            return frame
+
+        frame = DisasterFrame(households, assessments)
+        self._frames[assessments.disaster_id] = (key, frame)
+        self._evict(keep=assessments.disaster_id)
+        return frame
+
+    @property
+    def nbytes(self):
+        total = self.households.nbytes
+        total += sum(table.nbytes for table in self._disasters.values())
+        total += sum(frame.nbytes for _, frame in self._frames.values())
+        return total
+
+    def _evict(self, keep):
+        """Drops least-recently-used disasters until the store fits its budget."""
+        with self._lock:
+            for disaster_id in list(self._disasters):
+                if self.nbytes <= self.budget_bytes:
+                    break
+                if disaster_id == keep:
+                    continue
+                del self._disasters[disaster_id]
+                self._frames.pop(disaster_id, None)
+
+    def stats(self):
+        return {
+            'households': len(self.households),
+            'disasters': {disaster_id: len(table) for disaster_id, table in self._disasters.items()},
+            'nbytes': self.nbytes,
+            'budget_bytes': self.budget_bytes,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the process-wide columnar store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ColumnarStore()
+    return _store
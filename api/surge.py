@@ -0,0 +1,249 @@
+"""
+Surge protection for expensive endpoints: request coalescing and admission control.
+
+When a typhoon makes landfall, hundreds of coordinators open the same disaster map
+within seconds. Without protection every request rebuilds the identical GeoJSON
+and summary at the same time, and SQLite and the CPU saturate.
+
+Coalescing (single flight):
+    Concurrent identical GETs to a view in COALESCED_VIEWS share one computation.
+    The first request runs the view. Requests with the same path, query string and
+    content negotiation that arrive while it runs wait for it and get a copy of its
+    response. Nothing is cached afterwards, so the next request computes fresh data.
+
+Admission control:
+    Views in ADMISSION_LIMITS run at most `concurrency` requests at a time per
+    process. Up to `queue` more wait for a slot, for up to
+    ADMISSION_QUEUE_TIMEOUT_SECONDS. Beyond that they get 503 with Retry-After
+    instead of piling up behind the database. Coalesced followers do not take a slot.
+
+The middleware works under both WSGI (threads) and ASGI (one event loop).
+"""
+import asyncio
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+
+from .middleware import choose_encoding
+
+
+COALESCED_HEADER = 'X-Coalesced'
+
+
+class Gate:
+    """Concurrency limit with a bounded waiting queue for one view."""
+
+    def __init__(self, concurrency, queue):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self.waiting = 0
+        self.shed = 0
+        self.condition = threading.Condition()
+        self._async_semaphore = None
+
+    def acquire(self, timeout):
+        with self.condition:
+            if self.active >= self.concurrency:
+                if self.waiting >= self.queue:
+                    self.shed += 1
+                    return False
+                self.waiting += 1
+                try:
+                    admitted = self.condition.wait_for(lambda: self.active < self.concurrency, timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.shed += 1
+                    return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    async def aacquire(self, timeout):
+        # Under ASGI every request runs on the same event loop, so the count needs no lock
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.concurrency)
+        if self._async_semaphore.locked():
+            if self.waiting >= self.queue:
+                self.shed += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._async_semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._async_semaphore.acquire()
+        self.active += 1
+        return True
+
+    def arelease(self):
+        self.active -= 1
+        self._async_semaphore.release()
+
+
+class _Flight:
+    """One in-flight computation that later identical requests wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.future = None
+        self.response = None
+
+
+class SingleFlight:
+    """Runs a function once per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.coalesced = 0
+
+    def _join(self, key, make_future=False):
+        """(flight, is_leader) for a key."""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self.flights[key] = _Flight()
+            if make_future:
+                flight.future = asyncio.get_running_loop().create_future()
+            return flight, True
+
+    def _finish(self, key, flight, response):
+        with self.lock:
+            del self.flights[key]
+        flight.response = response
+        flight.done.set()
+        if flight.future is not None and not flight.future.done():
+            flight.future.set_result(response)
+
+    def do(self, key, function):
+        flight, leader = self._join(key)
+        if not leader:
+            flight.done.wait()
+            return flight.response, False
+        response = None
+        try:
+            response = function()
+            return response, True
+        finally:
+            self._finish(key, flight, response)
+
+    async def ado(self, key, function):
+        flight, leader = self._join(key, make_future=True)
+        if not leader:
+            return await asyncio.shield(flight.future), False
+        response = None
+        try:
+            response = await function()
+            return response, True
+        finally:
+            self._finish(key, flight, response)
+
+
+def copy_response(response):
+    """A fresh response with the same body and headers (cookies are not shared)."""
+    copied = HttpResponse(response.content, status=response.status_code)
+    for name, value in response.items():
+        copied.headers[name] = value
+    copied.headers[COALESCED_HEADER] = '1'
+    return copied
+
+
+def shed_response(view_name):
+    response = JsonResponse({'error': f'Server is busy ({view_name}); please retry shortly'}, status=503)
+    response.headers['Retry-After'] = str(getattr(settings, 'ADMISSION_RETRY_AFTER_SECONDS', 5))
+    return response
+
+
+class SurgeProtectionMiddleware:
+    """Coalesces identical concurrent reads and limits concurrency of expensive views."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.coalesced_views = set(getattr(settings, 'COALESCED_VIEWS', []))
+        self.gates = {
+            name: Gate(limit['concurrency'], limit.get('queue', 0))
+            for name, limit in getattr(settings, 'ADMISSION_LIMITS', {}).items()
+        }
+        self.queue_timeout = getattr(settings, 'ADMISSION_QUEUE_TIMEOUT_SECONDS', 2)
+        self.flights = SingleFlight()
+
+    def _route(self, request):
+        """(view name, admission gate or None, coalescing key or None) for a request."""
+        try:
+            name = resolve(request.path_info).url_name
+        except Resolver404:
+            return None, None, None
+        key = None
+        if request.method in ('GET', 'HEAD') and name in self.coalesced_views:
+            key = (
+                request.method,
+                request.get_full_path(),
+                request.META.get('HTTP_ACCEPT', ''),
+                choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', '')),
+            )
+        return name, self.gates.get(name), key
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        name, gate, key = self._route(request)
+        if key is None:
+            return self._admit(request, name, gate)
+        response, leader = self.flights.do(key, lambda: self._admit(request, name, gate))
+        if leader:
+            return response
+        if response is None or response.streaming:
+            # The leader failed or streamed its body, which cannot be shared
+            return self._admit(request, name, gate)
+        return copy_response(response)
+
+    def _admit(self, request, name, gate):
+        if gate is None:
+            return self.get_response(request)
+        if not gate.acquire(self.queue_timeout):
+            return shed_response(name)
+        try:
+            return self.get_response(request)
+        finally:
+            gate.release()
+
+    async def __acall__(self, request):
+        name, gate, key = self._route(request)
+        if key is None:
+            return await self._aadmit(request, name, gate)
+        response, leader = await self.flights.ado(key, lambda: self._aadmit(request, name, gate))
+        if leader:
+            return response
+        if response is None or response.streaming:
+            return await self._aadmit(request, name, gate)
+        return copy_response(response)
+
+    async def _aadmit(self, request, name, gate):
+        if gate is None:
+            return await self.get_response(request)
+        if not await gate.aacquire(self.queue_timeout):
+            return shed_response(name)
+        try:
+            return await self.get_response(request)
+        finally:
+            gate.arelease()
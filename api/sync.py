@@ -0,0 +1,195 @@
+"""
+Offline-first sync for field assessors.
+
+Devices queue edits while offline and upload them in batches. Each edit carries
+an idempotency key and the time it was made on the device (client_updated_at):
+
+- Keys already seen return the stored result, so a retried upload is a cheap no-op.
+  That includes a retry racing the original upload: whichever stores the key
+  second rolls back and returns the first one's result.
+- A batch is applied in one transaction, oldest client edit first.
+- Conflicts are last-writer-wins on device time: an edit older than (or as old as)
+  the client_updated_at of the sync edit the server version came from loses, and the
+  result carries the server version instead. A version last changed on the server
+  (web or admin edits, ingests) compares by its `updated_at`.
+- The response also lists the server-side changes since the device's cursor.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from rest_framework.exceptions import ValidationError
+
+from . import heatmap
+from .changes import current_cursor, decode_cursor
+from .models import Household, DisasterEvent, DamageAssessment, MapFeatureTombstone, SyncOperation
+from .serializers import SyncChangeSerializer
+
+
+RECORD_FIELDS = (
+    'id', 'household_id', 'disaster_id', 'damage_status', 'flood_depth_meters',
+    'recommended_ect_amount', 'notes', 'assessed_by', 'updated_at',
+)
+
+KEY_MAX_LENGTH = SyncOperation._meta.get_field('idempotency_key').max_length
+
+
+def assessment_record(assessment):
+    """Compact representation of an assessment for sync clients."""
+    return {field: getattr(assessment, field) for field in RECORD_FIELDS}
+
+
+def _result(key, outcome, assessment=None, errors=None):
+    result = {'idempotency_key': key, 'outcome': outcome}
+    if assessment is not None:
+        result['assessment'] = assessment_record(assessment)
+    if errors is not None:
+        result['errors'] = errors
+    return result
+
+
+def _idempotency_key(change):
+    """The change's idempotency key, or None unless it is a non-empty string that fits the column."""
+    key = change.get('idempotency_key') if isinstance(change, dict) else None
+    return key if isinstance(key, str) and 0 < len(key) <= KEY_MAX_LENGTH else None
+
+
+def apply_sync_batch(client_id, changes, since=None, disaster_ids=None):
+    """
+    Applies a batch of client changes and collects the server changes the client has not seen.
+    Returns the response body for the sync endpoint.
+    """
+    try:
+        return _apply_batch(client_id, changes, since, disaster_ids)
+    except IntegrityError:
+        # A concurrent upload stored some of the same idempotency keys first and this batch
+        # was rolled back; run it again so those keys return the stored results
+        return _apply_batch(client_id, changes, since, disaster_ids)
+
+
+def _apply_batch(client_id, changes, since, disaster_ids):
+    cursor = current_cursor()
+    keys = [key for key in map(_idempotency_key, changes) if key is not None]
+    stored = {
+        operation.idempotency_key: operation.result
+        for operation in SyncOperation.objects.filter(idempotency_key__in=keys)
+    }
+
+    # One serializer validates every change, as ListSerializer does, instead of one per change
+    validator = SyncChangeSerializer()
+    results = [None] * len(changes)
+    first_index = {}
+    pending = []
+    operations = []
+    for index, change in enumerate(changes):
+        key = _idempotency_key(change)
+        if key is None:
+            # Checked before the lookups below, which need a hashable key
+            results[index] = _result(None, SyncOperation.Outcome.REJECTED, errors={
+                'idempotency_key': [f'A non-empty string of at most {KEY_MAX_LENGTH} characters is required.'],
+            })
+            continue
+        if key in stored:
+            results[index] = {**stored[key], 'duplicate': True}
+            continue
+        if key in first_index:
+            # Same key twice in one upload; resolved from the first copy below
+            continue
+        first_index[key] = index
+
+        try:
+            data = validator.run_validation(change)
+        except ValidationError as e:
+            results[index] = _result(key, SyncOperation.Outcome.REJECTED, errors=e.detail)
+            operations.append(SyncOperation(
+                idempotency_key=key, client_id=client_id,
+                outcome=SyncOperation.Outcome.REJECTED, result=results[index],
+            ))
+            continue
+        pending.append((index, data))
+
+    touched_disasters = {data['disaster'] for _, data in pending}
+    applied_ids = set()
+
+    with transaction.atomic(), heatmap.deferred():
+        household_ids = set(Household.objects.filter(
+            id__in={data['household'] for _, data in pending}
+        ).values_list('id', flat=True))
+        disaster_ids_found = set(DisasterEvent.objects.filter(id__in=touched_disasters).values_list('id', flat=True))
+        existing = {
+            (assessment.household_id, assessment.disaster_id): assessment
+            for assessment in DamageAssessment.objects.filter(
+                household_id__in=household_ids, disaster_id__in=disaster_ids_found
+            ).select_related('household')
+        }
+        # Device time of the latest sync edit applied to each assessment, unless the
+        # server changed the assessment after that edit came in
+        applied_at = {}
+        by_id = {assessment.pk: assessment for assessment in existing.values()}
+        for applied in (
+            SyncOperation.objects.filter(
+                assessment_id__in=by_id, outcome=SyncOperation.Outcome.APPLIED, client_updated_at__isnull=False,
+            ).values('assessment_id').annotate(client_time=Max('client_updated_at'), received=Max('received_at'))
+        ):
+            assessment = by_id[applied['assessment_id']]
+            if assessment.updated_at <= applied['received']:
+                applied_at[(assessment.household_id, assessment.disaster_id)] = applied['client_time']
+
+        for index, data in sorted(pending, key=lambda item: (item[1]['client_updated_at'], item[1]['idempotency_key'])):
+            key = data['idempotency_key']
+            pair = (data['household'], data['disaster'])
+
+            if data['household'] not in household_ids or data['disaster'] not in disaster_ids_found:
+                result = _result(key, SyncOperation.Outcome.REJECTED, errors={'non_field_errors': ['Unknown household or disaster']})
+                assessment = None
+            else:
+                assessment = existing.get(pair)
+                last_write = applied_at.get(pair) or (assessment.updated_at if assessment else None)
+                if last_write is not None and last_write >= data['client_updated_at']:
+                    result = _result(key, SyncOperation.Outcome.CONFLICT, assessment)
+                else:
+                    if assessment is None:
+                        assessment = DamageAssessment(household_id=data['household'], disaster_id=data['disaster'])
+                    assessment.damage_status = data['damage_status']
+                    for field in ('flood_depth_meters', 'notes', 'assessed_by'):
+                        if field in data:
+                            setattr(assessment, field, data[field])
+                    assessment.save()
+                    existing[pair] = assessment
+                    applied_at[pair] = data['client_updated_at']
+                    applied_ids.add(assessment.pk)
+                    result = _result(key, SyncOperation.Outcome.APPLIED, assessment)
+
+            results[index] = result
+            operations.append(SyncOperation(
+                idempotency_key=key, client_id=client_id, assessment=assessment,
+                outcome=result['outcome'], result=result, client_updated_at=data['client_updated_at'],
+            ))
+
+        SyncOperation.objects.bulk_create(operations)
+
+    for index, change in enumerate(changes):
+        if results[index] is None:
+            results[index] = {**results[first_index[change['idempotency_key']]], 'duplicate': True}
+
+    response = {'cursor': cursor, 'results': results, 'reset': False, 'changes': [], 'deleted': []}
+    if since:
+        scope = set(disaster_ids or touched_disasters)
+        since_moment = decode_cursor(since)
+        limit = getattr(settings, 'SYNC_MAX_SERVER_CHANGES', 5000)
+
+        server_changes = list(
+            DamageAssessment.objects.filter(disaster_id__in=scope, updated_at__gt=since_moment)
+            .exclude(id__in=applied_ids)
+            .order_by('updated_at', 'id')
+            .values(*RECORD_FIELDS)[:limit + 1]
+        )
+        if len(server_changes) > limit:
+            # Too far behind: the device should re-download the disaster
+            response['reset'] = True
+        else:
+            response['changes'] = server_changes
+            response['deleted'] = list(
+                MapFeatureTombstone.objects.filter(disaster_id__in=scope, deleted_at__gt=since_moment)
+                .values('household_id', 'disaster_id')
+            )
+    return response
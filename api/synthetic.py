@@ -0,0 +1,72 @@
+"""
+Synthetic households and assessments for benchmarks and load tests.
+Households are scattered around Metro Manila with realistic-looking fields.
+"""
+import random
+from datetime import date
+from decimal import Decimal
+
+from .heatmap import rebuild_heatmap
+from .history import apply_assessment_counts
+from .models import Household, DisasterEvent, DamageAssessment
+from .risk import refresh_risk
+
+
+FIRST_NAMES = ['Juan', 'Maria', 'Pedro', 'Ana', 'Carlos', 'Rosa', 'Jose', 'Lourdes', 'Ramon', 'Elena',
+               'Antonio', 'Teresa', 'Miguel', 'Carmen', 'Roberto', 'Luz', 'Fernando', 'Gloria']
+LAST_NAMES = ['Dela Cruz', 'Santos', 'Garcia', 'Rodriguez', 'Mendoza', 'Villanueva', 'Torres', 'Fernandez',
+              'Reyes', 'Bautista', 'Ramos', 'Aquino', 'Castillo', 'Navarro', 'Gonzales', 'Flores']
+STREETS = ['Rizal', 'Mabini', 'Bonifacio', 'Quezon', 'Aguinaldo', 'Luna', 'Panganiban', 'Roxas']
+
+STATUS_AMOUNTS = [
+    (DamageAssessment.DamageStatus.NONE, 0),
+    (DamageAssessment.DamageStatus.PARTIAL, 5000),
+    (DamageAssessment.DamageStatus.TOTAL, 10000),
+]
+
+
+def create_disaster(name='Synthetic Typhoon'):
+    return DisasterEvent.objects.create(
+        name=name, description='Synthetic data for benchmarks', date_occurred=date.today()
+    )
+
+
+def create_households(count, seed=0, barangays=50, batch_size=5000):
+    """Creates `count` households and returns their ids."""
+    rng = random.Random(seed)
+    households = []
+    for i in range(count):
+        barangay = f'Barangay {rng.randrange(1, barangays + 1)}'
+        households.append(Household(
+            name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            address=f'{rng.randrange(1, 999)} {rng.choice(STREETS)} Street, {barangay}',
+            barangay=barangay,
+            latitude=Decimal(f'{14.45 + rng.random() * 0.3:.6f}'),
+            longitude=Decimal(f'{120.90 + rng.random() * 0.2:.6f}'),
+            contact_number=f'+63917{rng.randrange(0, 10 ** 7):07d}',
+            house_height_meters=Decimal(f'{rng.uniform(2.5, 6.0):.2f}'),
+            house_width_meters=Decimal(f'{rng.uniform(4.0, 9.0):.2f}'),
+            is_4ps_recipient=rng.random() < 0.3,
+        ))
+    created = Household.objects.bulk_create(households, batch_size=batch_size)
+    return [household.pk for household in created]
+
+
+def create_assessments(disaster, household_ids, seed=0, batch_size=5000):
+    """Creates one assessment per household for the disaster, counts it per household, sets risk tiers and rebuilds its heatmap."""
+    rng = random.Random(seed)
+    assessments = []
+    for household_id in household_ids:
+        damage_status, amount = rng.choices(STATUS_AMOUNTS, weights=[5, 3, 2])[0]
+        assessments.append(DamageAssessment(
+            household_id=household_id,
+            disaster=disaster,
+            damage_status=damage_status,
+            recommended_ect_amount=amount,
+            flood_depth_meters=Decimal(f'{rng.uniform(0, 3):.2f}'),
+            assessed_by='Synthetic',
+        ))
+    DamageAssessment.objects.bulk_create(assessments, batch_size=batch_size)
+    refresh_risk(DamageAssessment.objects.filter(disaster=disaster))
+    apply_assessment_counts((assessment.household_id, assessment.damage_status) for assessment in assessments)
+    rebuild_heatmap(disaster.pk)
@@ -1,3 +1,1427 @@
-from django.test import TestCase
+import asyncio
+import base64
+import contextvars
+import csv
+import io
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+import zlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import archive, dblocks, loadtest, renderers
+from .admin import EstimatedCountPaginator, estimated_row_count
+from .archive import ArchivedAssessmentPages, archived_assessments
+from .changes import current_cursor, decode_cursor, encode_cursor
+from .events import RESYNC_EVENT, LocalBroker, format_sse
+from .heatmap import cell_coordinates, rebuild_heatmap
+from .middleware import CompressionMiddleware
+from .dedup import METERS_PER_DEGREE, distances_meters, find_duplicate_households, find_matches, grid_pairs
+from .management.commands.bench_dashboard import Command as BenchDashboardCommand, ReportReceiver
+from .management.commands.sync_replica import backup
+from .models import (
+    Household, DisasterEvent, DamageAssessment, ArchivedAssessmentBatch, SyncOperation, SmsMessage,
+    DuplicateHouseholdCandidate, DamageHeatmapCell, DisasterSnapshot,
+)
+from .replica import PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, mark_synced
+from .risk import RiskTier, flood_height_ratio, refresh_risk, risk_tier
+from .snapshot import build_snapshot, open_snapshot
+from .store import STATUS_VALUES, ColumnarStore
+from .surge import COALESCED_HEADER, Gate, SurgeProtectionMiddleware
+from .views import predict_ect_amounts
+from .sms import Receipt, SendResult, SmsProvider, SmsSender, apply_receipts
+
+
+def make_household(name='Juan Dela Cruz', latitude='14.600000', longitude='121.000000', **fields):
+    fields.setdefault('address', '12 Rizal Street')
+    fields.setdefault('barangay', 'Barangay 1')
+    fields.setdefault('house_height_meters', Decimal('4.00'))
+    return Household.objects.create(
+        name=name, latitude=Decimal(latitude), longitude=Decimal(longitude), **fields
+    )
+
+
+def make_disaster(name='Typhoon Test', **fields):
+    return DisasterEvent.objects.create(name=name, date_occurred=date(2025, 11, 1), **fields)
+
+
+def make_assessment(household, disaster, damage_status='NONE', flood_depth_meters=None, **fields):
+    return DamageAssessment.objects.create(
+        household=household, disaster=disaster, damage_status=damage_status,
+        flood_depth_meters=flood_depth_meters, **fields
+    )
+
+
+# --- FLOOD RISK TIERS (user-046) ---
+
+class FloodRiskTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster()
+
+    def test_list_and_detail_without_parameters(self):
+        assessment = make_assessment(make_household(), self.disaster, flood_depth_meters=Decimal('1.00'))
+
+        response = self.client.get('/api/assessments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(self.client.get(f'/api/assessments/{assessment.pk}/').status_code, 200)
+
+    def test_save_sets_ratio_and_tier(self):
+        assessment = make_assessment(
+            make_household(house_height_meters=Decimal('2.00')), self.disaster, flood_depth_meters=Decimal('1.00')
+        )
+        self.assertEqual(assessment.flood_height_ratio, Decimal('0.500'))
+        self.assertEqual(assessment.risk_tier, RiskTier.MEDIUM)
+
+    def test_sql_path_matches_python(self):
+        cases = [
+            ('1.00', '2.00'),   # whole numbers: integer division on SQLite unless cast
+            ('1.00', '3.00'),   # non-terminating
+            ('2.00', '3.00'),
+            ('0.01', '8.00'),
+            ('5.00', '2.00'),   # capped at 1.0
+            ('3.20', '4.00'),   # exactly on the HIGH bound
+            (None, '4.00'),
+            ('1.00', '0.00'),
+        ]
+        expected = {}
+        for depth, height in cases:
+            household = make_household(house_height_meters=Decimal(height))
+            assessment = make_assessment(household, self.disaster,
+                                         flood_depth_meters=Decimal(depth) if depth else None)
+            expected[assessment.pk] = flood_height_ratio(assessment.flood_depth_meters, household.house_height_meters)
+
+        DamageAssessment.objects.update(flood_height_ratio=None, risk_tier=RiskTier.UNKNOWN)
+        refresh_risk(DamageAssessment.objects.all())
+
+        for assessment in DamageAssessment.objects.all():
+            with self.subTest(assessment=assessment.pk):
+                self.assertEqual(assessment.flood_height_ratio, expected[assessment.pk])
+                self.assertEqual(assessment.risk_tier, risk_tier(expected[assessment.pk]))
+
+    def test_filters_and_ordering(self):
+        for depth, is_4ps in (('0.40', True), ('2.00', True), ('3.60', False), ('4.00', True)):
+            make_assessment(make_household(is_4ps_recipient=is_4ps), self.disaster, flood_depth_meters=Decimal(depth))
+
+        response = self.client.get(f'/api/assessments/?disaster_id={self.disaster.pk}&ordering=-flood_height_ratio')
+        self.assertEqual([row['flood_height_ratio'] for row in response.json()['results']],
+                         ['1.000', '0.900', '0.500', '0.100'])
+
+        response = self.client.get(f'/api/assessments/?disaster_id={self.disaster.pk}&is_4ps=true&risk_tier=high,medium'
+                                   '&ordering=flood_height_ratio')
+        self.assertEqual([row['flood_height_ratio'] for row in response.json()['results']], ['0.500', '1.000'])
+
+        response = self.client.get(f'/api/assessments/?disaster_id={self.disaster.pk}&min_ratio=0.9')
+        self.assertEqual(sorted(row['flood_height_ratio'] for row in response.json()['results']), ['0.900', '1.000'])
+        response = self.client.get(f'/api/assessments/?disaster_id={self.disaster.pk}&min_ratio=0.05&max_ratio=0.5')
+        self.assertEqual(sorted(row['flood_height_ratio'] for row in response.json()['results']), ['0.100', '0.500'])
+
+    def test_bad_parameters_are_rejected(self):
+        for query in ('risk_tier=SEVERE', 'min_ratio=abc', 'min_ratio=nan', 'max_ratio=inf', 'ordering=name',
+                      'include_archived=true&risk_tier=HIGH'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/assessments/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_house_height_change_refreshes_assessments(self):
+        household = make_household(house_height_meters=Decimal('4.00'))
+        assessment = make_assessment(household, self.disaster, flood_depth_meters=Decimal('1.00'))
+        household = Household.objects.get(pk=household.pk)
+
+        household.contact_number = '+639171234567'
+        with CaptureQueriesContext(connection) as queries:
+            household.save()
+        self.assertFalse([q for q in queries.captured_queries if 'UPDATE "api_damageassessment"' in q['sql']])
+
+        household.house_height_meters = Decimal('1.00')
+        household.save()
+        assessment.refresh_from_db()
+        self.assertEqual(assessment.flood_height_ratio, Decimal('1.000'))
+        self.assertEqual(assessment.risk_tier, RiskTier.HIGH)
+
+
+# --- ASYNC VIEWS (user-036) ---
+
+class AsyncAssessmentListTests(TestCase):
+    def test_same_results_as_the_drf_list(self):
+        disaster = make_disaster()
+        for depth, is_4ps in (('0.40', True), ('2.00', False), ('3.60', True), (None, True)):
+            make_assessment(make_household(is_4ps_recipient=is_4ps), disaster,
+                            flood_depth_meters=Decimal(depth) if depth else None)
+        client = APIClient()
+
+        for query in ('', f'disaster_id={disaster.pk}', 'ordering=-flood_height_ratio', 'risk_tier=HIGH,MEDIUM',
+                      'min_ratio=0.2&max_ratio=0.95&ordering=flood_height_ratio', 'is_4ps=true&ordering=-risk_tier'):
+            with self.subTest(query=query):
+                expected = client.get(f'/api/assessments/?{query}').json()
+                actual = client.get(f'/api/async/assessments/?{query}').json()
+                self.assertEqual(actual['count'], expected['count'])
+                self.assertEqual([row['id'] for row in actual['results']], [row['id'] for row in expected['results']])
+
+    def test_bad_risk_parameters_are_rejected(self):
+        response = APIClient().get('/api/async/assessments/?min_ratio=nan')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        for path in ('/api/assessments/', '/api/async/assessments/'):
+            self.assertEqual(APIClient().get(f'{path}?include_archived=true&risk_tier=HIGH').status_code, 400)
+
+    @override_settings(ARCHIVE_BATCH_ROWS=2)
+    def test_include_archived(self):
+        closed = make_disaster('Typhoon Old', is_active=False)
+        households = [make_household() for _ in range(3)]
+        for household in households:
+            make_assessment(household, closed, damage_status='PARTIAL')
+        archive.archive_disaster(closed)
+        make_assessment(households[0], make_disaster(), damage_status='TOTAL')
+        client = APIClient()
+
+        for query in ('include_archived=true', f'include_archived=true&disaster_id={closed.pk}',
+                      f'include_archived=true&household_id={households[0].pk}', ''):
+            with self.subTest(query=query):
+                expected = client.get(f'/api/assessments/?{query}').json()
+                actual = client.get(f'/api/async/assessments/?{query}').json()
+                self.assertEqual(actual, expected)
+
+        for path in ('/api/households/geojson/', '/api/async/households/geojson/'):
+            with self.subTest(path=path):
+                features = client.get(f'{path}?disaster_id={closed.pk}&include_archived=true').json()['features']
+                self.assertEqual({feature['properties']['damage_status'] for feature in features}, {'PARTIAL'})
+
+
+
+@override_settings(GEMINI_API_KEY='test-key')
+class AsyncGenerateSmsTests(TestCase):
+    def generate(self, status_code, text):
+        async def post_json(url, payload):
+            return status_code, text
+
+        with mock.patch('api.async_views._post_json', post_json):
+            return self.client.post('/api/async/generate-sms/', {'prompt': 'Hi', 'household_name': 'Ana'},
+                                    content_type='application/json')
+
+    def test_generated_message(self):
+        response = self.generate(200, json.dumps({'candidates': [{'content': {'parts': [{'text': ' Kumusta! '}]}}]}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['sms_message'], response.json()['household_name']), ('Kumusta!', 'Ana'))
+
+    def test_unexpected_responses_are_reported(self):
+        for text in ('<html>busy</html>', '[]', '{"candidates": [{}]}', '{"candidates": [{"content": {"parts": []}}]}',
+                     '{"candidates": [{"content": {"parts": [{"text": null}]}}]}'):
+            with self.subTest(text=text):
+                response = self.generate(200, text)
+                self.assertEqual(response.status_code, 500)
+                self.assertFalse(response.json()['success'])
+                self.assertIn('Unexpected Gemini API response', response.json()['error'])
+
+# --- ARCHIVE (user-039) ---
+
+@override_settings(ARCHIVE_BATCH_ROWS=2)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster(is_active=False)
+        self.households = [make_household() for _ in range(5)]
+        for household, status in zip(self.households, ('NONE', 'PARTIAL', 'TOTAL', 'PARTIAL', 'NONE')):
+            make_assessment(household, self.disaster, damage_status=status, flood_depth_meters=Decimal('1.00'))
+
+    def snapshot(self):
+        return sorted(DamageAssessment.objects.filter(disaster=self.disaster)
+                      .values_list('household_id', 'damage_status', 'flood_depth_meters', 'flood_height_ratio'))
+
+    def test_round_trip(self):
+        before = self.snapshot()
+        response = self.client.post(f'/api/disasters/{self.disaster.pk}/archive/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['rows'], response.json()['batches']), (5, 3))
+        self.assertFalse(DamageAssessment.objects.filter(disaster=self.disaster).exists())
+
+        response = self.client.post(f'/api/disasters/{self.disaster.pk}/restore/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['rows'], response.json()['skipped']), (5, 0))
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(ArchivedAssessmentBatch.objects.exists())
+
+    def test_restore_skips_deleted_households(self):
+        self.client.post(f'/api/disasters/{self.disaster.pk}/archive/')
+        orphan = self.households[2]
+        orphan.delete()
+        self.assertNotIn(orphan.pk, {row.household_id for row in archived_assessments([self.disaster.pk])})
+
+        response = self.client.post(f'/api/disasters/{self.disaster.pk}/restore/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['rows'], response.json()['skipped']), (4, 1))
+        self.assertEqual(DamageAssessment.objects.filter(disaster=self.disaster).count(), 4)
+        self.assertIsNone(DisasterEvent.objects.get(pk=self.disaster.pk).archived_at)
+
+    def test_household_lookup_only_decodes_covering_batches(self):
+        self.client.post(f'/api/disasters/{self.disaster.pk}/archive/')
+        batches = list(ArchivedAssessmentBatch.objects.values_list('min_household_id', 'max_household_id'))
+        self.assertEqual(batches, [(self.households[0].pk, self.households[1].pk),
+                                   (self.households[2].pk, self.households[3].pk),
+                                   (self.households[4].pk, self.households[4].pk)])
+
+        household = self.households[3]
+        with mock.patch.object(archive, '_unpack', wraps=archive._unpack) as unpack:
+            rows = archived_assessments(household_ids=[household.pk])
+        self.assertEqual(unpack.call_count, 1)
+        self.assertEqual([(row.household_id, row.damage_status) for row in rows], [(household.pk, 'PARTIAL')])
+
+        with mock.patch.object(archive, 'HOUSEHOLD_RANGE_LOOKUPS', 1):
+            rows = archived_assessments(household_ids=[self.households[0].pk, self.households[4].pk])
+        self.assertEqual(sorted(row.household_id for row in rows), [self.households[0].pk, self.households[4].pk])
+
+
+    def test_pages_only_decode_overlapping_batches(self):
+        self.client.post(f'/api/disasters/{self.disaster.pk}/archive/')
+        household_ids = [household.pk for household in self.households]
+        self.households[4].delete()
+        pages = ArchivedAssessmentPages([self.disaster.pk])
+        with mock.patch.object(archive, '_unpack', wraps=archive._unpack) as unpack:
+            self.assertEqual(len(pages), 5)
+            self.assertEqual(unpack.call_count, 0)
+            rows = pages[1:4]
+        self.assertEqual(unpack.call_count, 2)
+        self.assertEqual([row.household_id for row in rows], household_ids[1:4])
+        self.assertEqual(rows[0].household, self.households[1])
+        # A deleted household's row keeps its place, without the household
+        orphan = pages[4:10]
+        self.assertEqual(orphan[0].household_id, household_ids[4])
+        self.assertEqual(pages[5:10], [])
+
+        hot = make_assessment(make_household(), make_disaster('Typhoon Two'))
+        data = self.client.get('/api/assessments/?include_archived=true').json()
+        self.assertEqual(data['count'], 6)
+        self.assertEqual([row['household'] for row in data['results']],
+                         [hot.household_id] + household_ids)
+        self.assertIsNone(data['results'][-1]['household_name'])
+
+# --- HOUSEHOLD HISTORY (user-040) ---
+
+@override_settings(ARCHIVE_BATCH_ROWS=2)
+class HouseholdHistoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.household = make_household()
+
+    def counters(self):
+        household = Household.objects.get(pk=self.household.pk)
+        return household.assessment_count, household.partial_damage_count, household.total_damage_count
+
+    def test_counters_follow_assessment_writes(self):
+        first, second = make_disaster('Typhoon One', is_active=False), make_disaster('Typhoon Two')
+        assessment = make_assessment(self.household, first, damage_status='PARTIAL')
+        self.assertEqual(self.counters(), (1, 1, 0))
+        other = make_assessment(self.household, second, damage_status='NONE')
+        self.assertEqual(self.counters(), (2, 1, 0))
+
+        assessment.damage_status = 'TOTAL'
+        assessment.save()
+        self.assertEqual(self.counters(), (2, 0, 1))
+        other.delete()
+        self.assertEqual(self.counters(), (1, 0, 1))
+
+        # Archiving and restoring move rows without changing the counters
+        self.client.post(f'/api/disasters/{first.pk}/archive/')
+        self.assertEqual(self.counters(), (1, 0, 1))
+        self.client.post(f'/api/disasters/{first.pk}/restore/')
+        self.assertEqual(self.counters(), (1, 0, 1))
+
+        # Deleting an archived disaster takes its archived rows out
+        self.client.post(f'/api/disasters/{first.pk}/archive/')
+        first.delete()
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_include_archived_reads_only_the_households_batches(self):
+        disaster = make_disaster('Typhoon One', is_active=False)
+        neighbours = [make_household() for _ in range(4)]
+        for household in [self.household, *neighbours]:
+            make_assessment(household, disaster, damage_status='TOTAL', flood_depth_meters=Decimal('2.00'))
+        make_assessment(self.household, make_disaster('Typhoon Two'), damage_status='PARTIAL')
+        self.client.post(f'/api/disasters/{disaster.pk}/archive/')
+
+        response = self.client.get(f'/api/households/{self.household.pk}/history/')
+        self.assertEqual(response.json()['series']['damage_status'], ['PARTIAL'])
+
+        with mock.patch.object(archive, '_unpack', wraps=archive._unpack) as unpack:
+            response = self.client.get(f'/api/households/{self.household.pk}/history/?include_archived=true')
+        self.assertEqual(unpack.call_count, 1)
+        self.assertEqual(response.json()['series']['damage_status'], ['TOTAL', 'PARTIAL'])
+        self.assertEqual(response.json()['series']['flood_depth_meters'], [2.0, None])
+
+
+# --- OFFLINE SYNC (user-030) ---
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.household = make_household()
+        self.disaster = make_disaster()
+
+    def change(self, key, damage_status, client_updated_at='2030-01-01T10:00:00Z'):
+        return {'idempotency_key': key, 'household': self.household.pk, 'disaster': self.disaster.pk,
+                'damage_status': damage_status, 'client_updated_at': client_updated_at}
+
+    def sync(self, *changes):
+        response = self.client.post('/api/assessments/sync/', {'client_id': 'tablet-07', 'changes': list(changes)},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_replay_returns_the_stored_result(self):
+        first = self.sync(self.change('k1', 'PARTIAL'))['results'][0]
+        self.assertEqual(first['outcome'], 'APPLIED')
+
+        replay = self.sync(self.change('k1', 'TOTAL'), self.change('k1', 'TOTAL'))['results']
+        self.assertEqual(replay, [{**SyncOperation.objects.get().result, 'duplicate': True}] * 2)
+        self.assertEqual(replay[0]['assessment']['damage_status'], 'PARTIAL')
+        self.assertEqual(DamageAssessment.objects.get().damage_status, 'PARTIAL')
+        self.assertEqual(SyncOperation.objects.count(), 1)
+
+    def test_older_edit_loses_to_the_server_version(self):
+        make_assessment(self.household, self.disaster, damage_status='TOTAL')
+        result = self.sync(self.change('k1', 'NONE', client_updated_at='2020-01-01T10:00:00Z'))['results'][0]
+        self.assertEqual(result['outcome'], 'CONFLICT')
+        self.assertEqual(result['assessment']['damage_status'], 'TOTAL')
+        self.assertEqual(DamageAssessment.objects.get().damage_status, 'TOTAL')
+
+    def test_device_times_are_compared_with_device_times(self):
+        # Both edits were made offline and uploaded long after; the later device edit wins
+        self.assertEqual(self.sync(self.change('k1', 'PARTIAL', '2020-01-01T10:00:00Z'))['results'][0]['outcome'], 'APPLIED')
+        self.assertEqual(self.sync(self.change('k2', 'TOTAL', '2020-01-01T11:00:00Z'))['results'][0]['outcome'], 'APPLIED')
+        self.assertEqual(self.sync(self.change('k3', 'NONE', '2020-01-01T10:30:00Z'))['results'][0]['outcome'], 'CONFLICT')
+        self.assertEqual(DamageAssessment.objects.get().damage_status, 'TOTAL')
+
+        # A server edit after the sync compares by its own time
+        assessment = DamageAssessment.objects.get()
+        assessment.damage_status = 'PARTIAL'
+        assessment.save()
+        self.assertEqual(self.sync(self.change('k4', 'NONE', '2020-01-01T12:00:00Z'))['results'][0]['outcome'], 'CONFLICT')
+
+    def test_malformed_keys_are_rejected(self):
+        changes = [{**self.change(None, 'TOTAL'), 'idempotency_key': key} for key in (['k1'], {'k': 1}, '', 7, 'k' * 101)]
+        changes.append('not a change')
+        results = self.sync(*changes, self.change('k1', 'TOTAL'))['results']
+        self.assertEqual([result['outcome'] for result in results], ['REJECTED'] * 6 + ['APPLIED'])
+        self.assertIn('idempotency_key', results[0]['errors'])
+        self.assertEqual(list(SyncOperation.objects.values_list('idempotency_key', flat=True)), ['k1'])
+
+    def test_concurrent_upload_of_the_same_key(self):
+        winner = {'idempotency_key': 'k1', 'outcome': 'APPLIED', 'assessment': {'damage_status': 'TOTAL'}}
+        SyncOperation.objects.create(idempotency_key='k1', client_id='tablet-08', outcome='APPLIED', result=winner)
+        lookup = SyncOperation.objects.filter
+        calls = []
+
+        def racing_lookup(*args, **kwargs):
+            # The other upload stored the key just after this one looked it up
+            calls.append(kwargs)
+            return SyncOperation.objects.none() if len(calls) == 1 else lookup(*args, **kwargs)
+
+        with mock.patch.object(SyncOperation.objects, 'filter', racing_lookup):
+            results = self.sync(self.change('k1', 'PARTIAL'), self.change('k2', 'NONE', '2030-01-01T11:00:00Z'))['results']
+        self.assertEqual(results[0], {**winner, 'duplicate': True})
+        self.assertEqual(results[1]['outcome'], 'APPLIED')
+        self.assertEqual(DamageAssessment.objects.get().damage_status, 'NONE')
+        self.assertEqual(sorted(SyncOperation.objects.values_list('idempotency_key', 'client_id')),
+                         [('k1', 'tablet-08'), ('k2', 'tablet-07')])
+
+
+# --- SMS OUTBOX (user-043) ---
+
+class ScriptedProvider(SmsProvider):
+    """Answers each send with the next function of `script`, called with the batch."""
+
+    def __init__(self, script):
+        super().__init__('scripted', rate_per_second=1000, batch_size=10)
+        self.script = list(script)
+
+    def send_batch(self, messages):
+        return self.script.pop(0)(messages)
+
+
+@override_settings(SMS_MAX_ATTEMPTS=2)
+class SmsSenderTests(TestCase):
+    def setUp(self):
+        self.message = SmsMessage.objects.create(
+            phone_number='+639171234567', body='Notice', provider='scripted', next_attempt_at=timezone.now(),
+        )
+
+    def send(self, *script):
+        sender = SmsSender(ScriptedProvider(script))
+        self.assertEqual(sender.send_next_batch(), 1)
+        self.message.refresh_from_db()
+        return sender
+
+    def make_due(self):
+        SmsMessage.objects.filter(pk=self.message.pk).update(next_attempt_at=timezone.now())
+
+    def test_transient_failure_is_retried_then_dead_lettered(self):
+        sender = self.send(lambda batch: [SendResult(batch[0].pk, False, error='HTTP 503')])
+        self.assertEqual((self.message.status, self.message.attempts), (SmsMessage.Status.QUEUED, 1))
+        self.assertGreater(self.message.next_attempt_at, timezone.now())
+        self.assertEqual(sender.stats['retried'], 1)
+        self.assertEqual(sender.send_next_batch(), 0)  # backing off
+
+        self.make_due()
+        sender = self.send(lambda batch: [SendResult(batch[0].pk, False, error='HTTP 503')])
+        self.assertEqual((self.message.status, self.message.attempts), (SmsMessage.Status.DEAD, 2))
+        self.assertEqual(sender.stats['dead'], 1)
+
+    def test_permanent_failure_is_dead_lettered_at_once(self):
+        self.send(lambda batch: [SendResult(batch[0].pk, False, error='bad number', retryable=False)])
+        self.assertEqual((self.message.status, self.message.last_error), (SmsMessage.Status.DEAD, 'bad number'))
+
+    def test_throttled_batch_does_not_use_up_an_attempt(self):
+        sender = self.send(lambda batch: [SendResult(batch[0].pk, False, error='HTTP 429', throttled=True)])
+        self.assertEqual((self.message.status, self.message.attempts), (SmsMessage.Status.QUEUED, 0))
+        self.assertEqual(sender.stats['throttled'], 1)
+
+        self.make_due()
+        self.send(lambda batch: [SendResult(batch[0].pk, True, provider_message_id='gw-1')])
+        self.assertEqual((self.message.status, self.message.attempts), (SmsMessage.Status.SENT, 1))
+
+    def test_receipt_before_the_sent_write(self):
+        def send_and_deliver(batch):
+            apply_receipts([Receipt(batch[0].pk, True)])
+            return [SendResult(batch[0].pk, True, provider_message_id='gw-1')]
+
+        self.send(send_and_deliver)
+        self.assertEqual(self.message.status, SmsMessage.Status.DELIVERED)
+        self.assertEqual(self.message.provider_message_id, 'gw-1')
+        self.assertIsNotNone(self.message.sent_at)
+        self.assertIsNotNone(self.message.delivered_at)
+
+    def test_receipt_after_the_sent_write(self):
+        self.send(lambda batch: [SendResult(batch[0].pk, True, provider_message_id='gw-1')])
+        self.assertEqual(apply_receipts([Receipt(self.message.pk, False, error='handset off')]), (1, 0))
+        self.assertEqual(apply_receipts([Receipt(self.message.pk, True)]), (0, 1))  # already final
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.provider_message_id, self.message.last_error),
+                         (SmsMessage.Status.UNDELIVERED, 'gw-1', 'handset off'))
+
+
+
+@override_settings(SMS_PROVIDERS={
+    'gateway': {'class': 'api.sms.HttpGatewayProvider', 'url': 'http://127.0.0.1:9', 'receipt_token': 's3cret'},
+    'open': {'class': 'api.sms.HttpGatewayProvider', 'url': 'http://127.0.0.1:9'},
+})
+class SmsReceiptCallbackTests(TestCase):
+    def setUp(self):
+        self.message = SmsMessage.objects.create(phone_number='+639171234567', body='Notice', provider='gateway',
+                                                 status=SmsMessage.Status.SENT, next_attempt_at=timezone.now())
+
+    def post(self, provider, **headers):
+        body = {'receipts': [{'reference': self.message.pk, 'message_id': 'gw-1', 'status': 'delivered'}]}
+        return APIClient().post(f'/api/sms/receipts/{provider}/', body, format='json', headers=headers)
+
+    def test_receipts_need_the_providers_token(self):
+        self.assertEqual(self.post('open').status_code, 403)  # no token configured
+        self.assertEqual(self.post('gateway').status_code, 403)
+        self.assertEqual(self.post('gateway', **{'X-Receipt-Token': 'guess'}).status_code, 403)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, SmsMessage.Status.SENT)
+
+        response = self.post('gateway', **{'X-Receipt-Token': 's3cret'})
+        self.assertEqual(response.json(), {'applied': 1, 'ignored': 0})
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, SmsMessage.Status.DELIVERED)
+        self.assertEqual(self.post('missing').status_code, 404)
+
+# --- MAP CHANGE FEED (user-028) ---
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster()
+        self.kept, self.emptied, self.removed = make_household(), make_household(), make_household()
+        self.assessment = make_assessment(self.emptied, self.disaster, damage_status='TOTAL')
+        make_assessment(self.removed, self.disaster, damage_status='PARTIAL')
+        self.since = encode_cursor(timezone.now())
+
+    def changes(self, since):
+        return self.client.get(f'/api/households/geojson/changes/?disaster_id={self.disaster.pk}&since={since}')
+
+    def test_deletes_since_the_cursor(self):
+        make_assessment(self.kept, self.disaster, damage_status='PARTIAL')
+        self.assessment.delete()
+        removed_id = self.removed.pk
+        self.removed.delete()
+        added = make_household()
+
+        data = self.changes(self.since).json()
+        self.assertFalse(data['reset'])
+        self.assertEqual([feature['properties']['id'] for feature in data['added']], [added.pk])
+        modified = {feature['properties']['id']: feature['properties']['damage_status'] for feature in data['modified']}
+        # The household whose assessment was deleted reverts to NONE
+        self.assertEqual(modified, {self.kept.pk: 'PARTIAL', self.emptied.pk: 'NONE'})
+        self.assertEqual(data['removed'], [removed_id])
+
+        self.assertEqual(self.changes(data['cursor']).json()['removed'], [removed_id])  # overlap window
+        data = self.changes(encode_cursor(timezone.now() + timedelta(seconds=5))).json()
+        self.assertEqual((data['added'], data['modified'], data['removed']), ([], [], []))
+
+    def test_old_or_malformed_cursor(self):
+        self.assertTrue(self.changes(encode_cursor(timezone.now() - timedelta(days=365))).json()['reset'])
+        self.assertEqual(self.changes('yesterday').status_code, 400)
+
+
+# --- DUPLICATE HOUSEHOLDS (user-041) ---
+
+@override_settings(DEDUP_RADIUS_METERS=30, DEDUP_MIN_SCORE=0.8)
+class DuplicateHouseholdTests(TestCase):
+    def test_grid_pairs_match_brute_force(self):
+        rng = np.random.default_rng(41)
+        latitudes = 14.6 + rng.uniform(0, 0.002, 400)
+        longitudes = 121.0 + rng.uniform(0, 0.002, 400)
+        found = set()
+        for i, j in grid_pairs(latitudes, longitudes, 30, chunk_size=64):
+            found.update(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist()))
+
+        i, j = np.triu_indices(len(latitudes), k=1)
+        near = distances_meters(latitudes[i], longitudes[i], latitudes[j], longitudes[j]) <= 30
+        self.assertEqual(found, set(zip(i[near].tolist(), j[near].tolist())))
+
+    def test_pair_across_a_cell_corner(self):
+        # The two households sit diagonally on either side of a grid cell corner near 14.6N, 121E
+        step = 30 / METERS_PER_DEGREE
+        corner_lat = math.floor(14.6 / step) * step
+        north, south = round(corner_lat + 0.00002, 6), round(corner_lat - 0.00002, 6)
+        # grid_pairs scales longitude by the cosine of the northernmost latitude
+        lon_step = step / math.cos(math.radians(north))
+        corner_lon = math.floor(121.0 / lon_step) * lon_step
+        west, east = round(corner_lon - 0.00002, 6), round(corner_lon + 0.00002, 6)
+        self.assertNotEqual(math.floor(north / step), math.floor(south / step))
+        self.assertNotEqual(math.floor(west / lon_step), math.floor(east / lon_step))
+
+        first = make_household('Juan Dela Cruz', f'{north:.6f}', f'{west:.6f}')
+        second = make_household('Dela Cruz, Juan', f'{south:.6f}', f'{east:.6f}')
+        make_household('Maria Santos', f'{south:.6f}', f'{west:.6f}')
+
+        report = find_duplicate_households()
+        self.assertEqual(report['created'], 1)
+        candidate = DuplicateHouseholdCandidate.objects.get()
+        self.assertEqual((candidate.household_id, candidate.duplicate_id), (first.pk, second.pk))
+        self.assertLess(candidate.distance_meters, 10)
+        self.assertEqual(find_duplicate_households()['created'], 0)
+
+        matches = find_matches('Juan Dela Cruz', '12 Rizal Street', second.latitude, second.longitude,
+                               exclude_id=second.pk)
+        self.assertEqual([match['household'] for match in matches], [first])
+
+
+# --- FLOOD RASTER INGEST (user-026) ---
+
+ASCII_GRID = """ncols 2
+nrows 2
+xllcorner 121.0
+yllcorner 14.6
+cellsize 0.01
+NODATA_value -9999
+1.5 -9999
+0.25 3.0
+"""
+
+
+class FloodRasterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        raster_root = override_settings(FLOOD_RASTER_ROOT=root.name)
+        raster_root.enable()
+        self.addCleanup(raster_root.disable)
+
+    def upload(self, name, content, **fields):
+        upload = io.BytesIO(content)
+        upload.name = name
+        return self.client.post(f'/api/disasters/{self.disaster.pk}/flood-raster/', {'file': upload, **fields},
+                                format='multipart')
+
+    def test_ascii_grid_fills_assessments(self):
+        assessed = make_household(latitude='14.615000', longitude='121.005000')      # north-west cell
+        make_assessment(assessed, self.disaster, damage_status='TOTAL')
+        new = make_household(latitude='14.605000', longitude='121.015000')           # south-east cell
+        make_household(latitude='14.615000', longitude='121.015000')                 # nodata cell
+        make_household(latitude='15.000000', longitude='121.005000')                 # outside the grid
+
+        response = self.upload('depth.asc', ASCII_GRID.encode())
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['households_sampled'], data['assessments_created'], data['assessments_updated']),
+                         (4, 1, 1))
+
+        rows = {a.household_id: a for a in DamageAssessment.objects.filter(disaster=self.disaster)}
+        self.assertEqual(set(rows), {assessed.pk, new.pk})
+        self.assertEqual((rows[assessed.pk].damage_status, rows[assessed.pk].flood_depth_meters),
+                         ('TOTAL', Decimal('1.50')))
+        self.assertEqual((rows[new.pk].damage_status, rows[new.pk].flood_depth_meters), ('NONE', Decimal('3.00')))
+        # Raw writes still set the risk columns and the history counters
+        self.assertEqual((rows[new.pk].flood_height_ratio, rows[new.pk].risk_tier), (Decimal('0.750'), RiskTier.MEDIUM))
+        self.assertEqual(Household.objects.get(pk=new.pk).assessment_count, 1)
+
+    def test_rows_are_stamped_at_the_end_of_the_ingest(self):
+        assessed = make_household(latitude='14.615000', longitude='121.005000')
+        make_assessment(assessed, self.disaster)
+        make_household(latitude='14.605000', longitude='121.015000')
+        polled = []
+
+        def slow_refresh_risk(assessments):
+            # A client polls the change feed while the ingest is still running
+            polled.append(timezone.now())
+            return refresh_risk(assessments)
+
+        with mock.patch('api.flood_raster.refresh_risk', slow_refresh_risk):
+            self.assertEqual(self.upload('depth.asc', ASCII_GRID.encode()).status_code, 201)
+        stamps = DamageAssessment.objects.filter(disaster=self.disaster).values_list('updated_at', flat=True)
+        self.assertEqual(len(stamps), 2)
+        self.assertTrue(all(stamp > polled[0] for stamp in stamps))
+
+    def test_npy_needs_a_georeference(self):
+        buffer = io.BytesIO()
+        np.save(buffer, np.ones((2, 2)))
+        self.assertEqual(self.upload('depth.npy', buffer.getvalue()).status_code, 400)
+        response = self.upload('depth.npy', buffer.getvalue(), xllcorner='121.0', yllcorner='14.6', cellsize='0.01')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.upload('depth.tif', b'II*').status_code, 400)
+
+
+# --- DAMAGE HEATMAP (user-027) ---
+
+@override_settings(HEATMAP_ZOOM_LEVELS=(0, 8, 14), HEATMAP_TILE_BINS=32)
+class HeatmapTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster()
+
+    def cells(self):
+        return sorted(
+            DamageHeatmapCell.objects.filter(disaster=self.disaster)
+            .exclude(total_count=0, partial_count=0, none_count=0)
+            .values_list('zoom', 'cell_x', 'cell_y', 'total_count', 'partial_count', 'none_count', 'ect_sum')
+        )
+
+    def test_signals_keep_cells_equal_to_a_rebuild(self):
+        households = [make_household(latitude=f'14.{600000 + 1500 * i}', longitude=f'121.{1700 * i:06d}')
+                      for i in range(6)]
+        assessments = [make_assessment(household, self.disaster, damage_status=status)
+                       for household, status in zip(households, ('TOTAL', 'PARTIAL', 'NONE', 'TOTAL', 'PARTIAL', 'NONE'))]
+        assessments[0].damage_status = 'NONE'
+        assessments[0].save()
+        assessments[1].delete()
+        households[2].latitude = Decimal('14.700000')
+        households[2].save()
+
+        incremental = self.cells()
+        self.assertTrue(incremental)
+        rebuild_heatmap(self.disaster.pk)
+        self.assertEqual(self.cells(), incremental)
+
+    def test_tiles(self):
+        for status in ('TOTAL', 'TOTAL', 'PARTIAL'):
+            make_assessment(make_household(), self.disaster, damage_status=status)
+
+        response = self.client.get(f'/api/disasters/{self.disaster.pk}/heatmap/0/0/0')
+        self.assertEqual(response.status_code, 200)
+        [cell] = response.json()['cells']
+        self.assertEqual(cell[2:5], [2, 1, 0])
+        # Zoom 20 is served from the level-14 grid: the one cell covering the tile
+        x, y = cell_coordinates(np.array([14.6]), np.array([121.0]), 20)
+        data = self.client.get(f'/api/disasters/{self.disaster.pk}/heatmap/20/{x[0]}/{y[0]}').json()
+        self.assertEqual(data['cell_zoom'], 19)
+        self.assertEqual(len(data['cells']), 1)
+
+        self.assertEqual(self.client.get(f'/api/disasters/{self.disaster.pk}/heatmap/1/2/0').status_code, 400)
+        self.assertEqual(self.client.get('/api/disasters/999/heatmap/0/0/0').status_code, 404)
+
+
+# --- LIVE EVENTS (user-029) ---
+
+class AssessmentEventTests(TestCase):
+    def test_writes_publish_after_commit(self):
+        broker = LocalBroker()
+        disaster, household = make_disaster(), make_household()
+        with mock.patch('api.signals.get_broker', return_value=broker), \
+                mock.patch.object(broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                assessment = make_assessment(household, disaster, damage_status='TOTAL')
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+            with self.captureOnCommitCallbacks(execute=True):
+                assessment.delete()
+
+        (saved_disaster, saved), _ = publish.call_args_list[0]
+        self.assertEqual(saved_disaster, disaster.pk)
+        self.assertEqual((saved['type'], saved['household_id'], saved['damage_status']),
+                         ('assessment', household.pk, 'TOTAL'))
+        self.assertEqual(publish.call_args_list[1][0],
+                         (disaster.pk, {'type': 'assessment_deleted', 'household_id': household.pk}))
+
+    def test_slow_subscriber_gets_resync(self):
+        async def scenario():
+            broker = LocalBroker(max_queue=2)
+            subscription = broker.subscribe(7)
+            other = broker.subscribe(8)
+            for n in range(3):
+                broker.publish(7, {'type': 'assessment', 'n': n})
+            received = [await subscription.get(), await subscription.get()]
+            subscription.close()
+            other.close()
+            return received, subscription.dropped, other.queue.qsize(), broker.subscriber_count()
+
+        received, dropped, other_queued, remaining = asyncio.run(scenario())
+        # The oldest event was dropped, so the client is told to pull the change feed first
+        self.assertEqual(received, [RESYNC_EVENT, {'type': 'assessment', 'n': 2}])
+        self.assertEqual((dropped, other_queued, remaining), (1, 0, 0))
+
+    def test_format_sse(self):
+        message = format_sse({'type': 'assessment', 'household_id': 3})
+        event, data = message.rstrip('\n').split('\n')
+        self.assertEqual(event, 'event: assessment')
+        self.assertEqual(json.loads(data[len('data: '):]), {'type': 'assessment', 'household_id': 3})
+        self.assertTrue(message.endswith('\n\n'))
+
+
+# --- PAYOUT MANIFEST (user-031) ---
+
+@override_settings(MANIFEST_CHUNK_SIZE=1)
+class ManifestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster()
+        for name, barangay, status in (('Ana', 'San Jose', 'TOTAL'), ('Ben', 'Poblacion', 'PARTIAL'),
+                                       ('Cora', 'San Jose', 'PARTIAL'), ('Dan', 'Poblacion', 'NONE')):
+            make_assessment(make_household(name, barangay=barangay), self.disaster, damage_status=status)
+
+    def manifest(self, query=''):
+        response = self.client.get(f'/api/disasters/{self.disaster.pk}/manifest.csv{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_grouped_by_barangay_with_subtotals(self):
+        rows = self.manifest()
+        self.assertEqual(rows[0][:2], ['row_type', 'household_id'])
+        self.assertEqual([(row[0], row[2], row[4], row[8]) for row in rows[1:]], [
+            ('HOUSEHOLD', 'Ben', 'Poblacion', '5000.00'),
+            ('HOUSEHOLD', 'Dan', 'Poblacion', '0.00'),
+            ('SUBTOTAL', '2 households', 'Poblacion', '5000.00'),
+            ('HOUSEHOLD', 'Ana', 'San Jose', '10000.00'),
+            ('HOUSEHOLD', 'Cora', 'San Jose', '5000.00'),
+            ('SUBTOTAL', '2 households', 'San Jose', '15000.00'),
+            ('TOTAL', '4 households', '', '20000.00'),
+        ])
+
+    def test_filters(self):
+        rows = self.manifest('?barangay=San Jose&status=partial,total')
+        self.assertEqual([row[2] for row in rows if row[0] == 'HOUSEHOLD'], ['Ana', 'Cora'])
+        rows = self.manifest('?status=TOTAL&barangay=Poblacion')
+        self.assertEqual(rows[1:], [['TOTAL', '', '0 households', '', '', '', '', '', '0.00']])
+
+        self.assertEqual(self.client.get(f'/api/disasters/{self.disaster.pk}/manifest.csv?status=SEVERE').status_code, 400)
+        self.assertEqual(self.client.get('/api/disasters/999/manifest.csv').status_code, 404)
+
+
+    def test_formulas_are_not_run_by_spreadsheets(self):
+        household = make_household('=HYPERLINK("http://example.com","Ana")', barangay='San Jose',
+                                   address='@SUM(A1)', contact_number='+639171234567')
+        make_assessment(household, self.disaster, damage_status='TOTAL')
+        row = next(row for row in self.manifest() if row[1] == str(household.pk))
+        self.assertEqual((row[2], row[3], row[5]),
+                         ('\'=HYPERLINK("http://example.com","Ana")', "'+639171234567", "'@SUM(A1)"))
+        self.assertEqual(row[8], '10000.00')
+
+# --- ANALYTICS SNAPSHOTS (user-032) ---
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        snapshot_root = override_settings(SNAPSHOT_ROOT=root.name)
+        snapshot_root.enable()
+        self.addCleanup(snapshot_root.disable)
+        make_assessment(make_household(barangay='San Jose'), self.disaster, damage_status='TOTAL',
+                        flood_depth_meters=Decimal('1.25'))
+        make_assessment(make_household(barangay='Poblacion'), self.disaster, damage_status='NONE')
+
+    def test_build_download_and_invalidate(self):
+        url = f'/api/disasters/{self.disaster.pk}/snapshot/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        # The background build starts on commit, which never comes inside the test; build it here
+        response = self.client.post(url, {'format': 'npz'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.post(url, {'format': 'npz'}, format='json').json()['id'], response.json()['id'])
+        build_snapshot(DisasterSnapshot.objects.get(pk=response.json()['id']))
+
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response.json()['row_count']), (200, 2))
+        download = self.client.get(f'{url}download/')
+        self.assertEqual(download['X-Data-Version'], response.json()['data_version'])
+        download.close()
+
+        columns = open_snapshot(DisasterSnapshot.objects.get().file_path)
+        self.assertIsInstance(columns['latitude'], np.memmap)
+        self.assertEqual([columns['barangay_values'][code] for code in columns['barangay']], ['San Jose', 'Poblacion'])
+        self.assertEqual([columns['damage_status_values'][code] for code in columns['damage_status']], ['TOTAL', 'NONE'])
+        self.assertEqual(columns['flood_depth_meters'][0], np.float32(1.25))
+        self.assertTrue(np.isnan(columns['flood_depth_meters'][1]))
+
+        # New data, new version: the old snapshot no longer counts as current
+        make_assessment(make_household(), self.disaster)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(f'{url}download/').status_code, 404)
+        self.assertEqual(self.client.post(url, {'format': 'parquet'}, format='json').status_code, 400)
+
+    def test_download_of_a_removed_file(self):
+        url = f'/api/disasters/{self.disaster.pk}/snapshot/'
+        build_snapshot(DisasterSnapshot.objects.get(pk=self.client.post(url, format='json').json()['id']))
+        # A rebuild deleted the file after the view looked the snapshot up
+        os.remove(DisasterSnapshot.objects.get().file_path)
+        self.assertEqual(self.client.get(f'{url}download/').status_code, 409)
+
+
+# --- COLUMNAR MAP FEED (user-033) ---
+
+class ColumnarFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.disaster = make_disaster()
+        make_assessment(make_household(latitude='14.612345', longitude='121.054321', barangay='San Jose'),
+                        self.disaster, damage_status='TOTAL', flood_depth_meters=Decimal('1.37'))
+        make_assessment(make_household(latitude='-0.000001', longitude='-121.000001'), self.disaster,
+                        damage_status='PARTIAL')
+        make_household(barangay='Poblacion')
+        # A store of this test's rows only; the process-wide one may hold other tests' rows
+        self.store_patch = mock.patch('api.views.get_store', return_value=ColumnarStore())
+        self.store_patch.start()
+        self.addCleanup(self.store_patch.stop)
+
+    def feed(self, encoding):
+        response = self.client.get(f'/api/households/geojson/?disaster_id={self.disaster.pk}&format=columnar'
+                                   f'&encoding={encoding}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_matches_the_geojson_feed(self):
+        features = self.client.get(f'/api/households/geojson/?disaster_id={self.disaster.pk}').json()['features']
+        expected = []
+        for feature in features:
+            properties, (lon, lat) = feature['properties'], feature['geometry']['coordinates']
+            depth = properties['flood_depth_meters']
+            expected.append((properties['id'], round(lat * 1e6), round(lon * 1e6), properties['damage_status'],
+                             round(properties['ect_amount'] * 100), -1 if depth is None else round(depth * 100),
+                             properties['barangay']))
+        expected.sort()
+
+        for encoding in ('json', 'base64'):
+            with self.subTest(encoding=encoding):
+                feed = self.feed(encoding)
+                self.assertEqual(feed['count'], 3)
+                columns = {}
+                for name, column in feed['columns'].items():
+                    data = column['data']
+                    if encoding == 'base64':
+                        data = np.frombuffer(base64.b64decode(data), dtype=np.dtype(column['dtype']).newbyteorder('<'))
+                    columns[name] = [int(value) for value in data]
+                rows = sorted(zip(
+                    columns['id'], columns['lat'], columns['lon'],
+                    [feed['status_values'][code] for code in columns['status']], columns['ect_centavos'],
+                    columns['flood_depth_cm'], [feed['barangay_values'][code] for code in columns['barangay']],
+                ))
+                self.assertEqual(rows, expected)
+
+    def test_bad_encoding(self):
+        response = self.client.get(f'/api/households/geojson/?disaster_id={self.disaster.pk}&format=columnar'
+                                   '&encoding=msgpack')
+        self.assertEqual(response.status_code, 400)
+
+
+# --- JSON ENCODING AND COMPRESSION (user-034) ---
+
+class ResponseEncodingTests(TestCase):
+    def test_dumps_matches_the_stdlib_encoder(self):
+        data = {'amount': Decimal('5000.00'), 'at': datetime(2025, 11, 1, 8, 30, 0, 123456, tzinfo=dt_timezone.utc),
+                'day': date(2025, 11, 1), 'ids': [1, 2], 'name': 'Niño'}
+        fast = renderers.dumps(data)
+        with mock.patch.object(renderers, 'orjson', None):
+            stdlib = renderers.dumps(data)
+        self.assertEqual(fast, stdlib)
+        self.assertEqual(json.loads(fast)['at'], '2025-11-01T08:30:00.123456Z')
+        self.assertIn('Niño'.encode(), fast)
+
+    def test_fallback_refuses_nan(self):
+        with mock.patch.object(renderers, 'orjson', None), self.assertRaises(ValueError):
+            renderers.dumps({'ratio': float('nan')})
+
+    def test_gzip_round_trip(self):
+        disaster = make_disaster()
+        for _ in range(20):
+            make_assessment(make_household(), disaster, damage_status='TOTAL')
+        client = APIClient()
+        plain = client.get('/api/assessments/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        compressed = client.get('/api/assessments/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(int(compressed['Content-Length']), len(compressed.content))
+        self.assertLess(len(compressed.content), len(plain.content))
+        self.assertEqual(json.loads(zlib.decompress(compressed.content, 31)), plain.json())
+
+        # Streaming responses are compressed as one stream
+        manifest = client.get(f'/api/disasters/{disaster.pk}/manifest.csv', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(manifest['Content-Encoding'], 'gzip')
+        self.assertFalse(manifest.has_header('Content-Length'))
+        body = zlib.decompress(b''.join(manifest.streaming_content), 31).decode()
+        self.assertEqual(body.count('HOUSEHOLD'), 20)
+
+    def test_skipped_responses(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        middleware = CompressionMiddleware(lambda request: None)
+        for response in (HttpResponse('x' * 100), HttpResponse('data: x\n\n' * 100, content_type='text/event-stream'),
+                         HttpResponse('x' * 1000, headers={'Content-Encoding': 'identity'})):
+            with self.subTest(content_type=response['Content-Type']):
+                content = response.content
+                response = middleware.process_response(request, response)
+                self.assertEqual(response.content, content)
+                self.assertNotEqual(response.get('Content-Encoding'), 'gzip')
+
+
+# --- COLUMNAR STORE (user-035) ---
+
+# No overlap, so rows older than the last refresh are not re-read
+@override_settings(CHANGE_FEED_OVERLAP_SECONDS=0)
+class ColumnarStoreTests(TestCase):
+    def setUp(self):
+        self.disaster = make_disaster()
+        self.first = make_household(barangay='San Jose')
+        self.second = make_household(barangay='Poblacion')
+        self.assessment = make_assessment(self.first, self.disaster, damage_status='PARTIAL')
+
+    def rows(self, frame):
+        return sorted(zip(frame['id'].tolist(), frame['damage_status'].tolist(),
+                          [frame.barangay_values[code] for code in frame['barangay']]))
+
+    def test_incremental_refresh(self):
+        store = ColumnarStore()
+        frame = store.frame(self.disaster.pk, max_age=0)
+        partial, none = (STATUS_VALUES.index(value) for value in ('PARTIAL', 'NONE'))
+        self.assertEqual(self.rows(frame), [(self.first.pk, partial, 'San Jose'), (self.second.pk, none, 'Poblacion')])
+        self.assertIs(store.frame(self.disaster.pk, max_age=0), frame)  # nothing changed: same frame
+
+        self.assessment.damage_status = 'TOTAL'
+        self.assessment.save()
+        third = make_household(barangay='Bagong Silang')
+        removed_id = self.second.pk
+        self.second.delete()
+
+        refreshed = store.frame(self.disaster.pk, max_age=0)
+        self.assertIsNot(refreshed, frame)
+        self.assertEqual(self.rows(refreshed), [(self.first.pk, STATUS_VALUES.index('TOTAL'), 'San Jose'),
+                                                (third.pk, none, 'Bagong Silang')])
+        self.assertNotIn(removed_id, refreshed['id'].tolist())
+        # The frame handed out earlier is unchanged
+        self.assertEqual(self.rows(frame)[0][1], partial)
+
+        summary = refreshed.summary()
+        self.assertEqual((summary['households'], summary['assessed'], summary['damaged']), (2, 1, 1))
+        self.assertEqual(summary['total_ect_amount'], 10000.0)
+        self.assertEqual(refreshed.summary(barangays=['Bagong Silang'])['households'], 1)
+
+    def test_least_recently_used_disaster_is_evicted(self):
+        other = make_disaster('Typhoon Two')
+        store = ColumnarStore(budget_bytes=1)
+        store.frame(self.disaster.pk, max_age=0)
+        store.frame(other.pk, max_age=0)
+        self.assertEqual(list(store.stats()['disasters']), [other.pk])
+
+
+# --- SURGE PROTECTION (user-037) ---
+
+class BlockingView:
+    """A view that holds every request until released, counting the calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, request):
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(5)
+        return JsonResponse({'calls': self.calls})
+
+
+class SurgeProtectionTests(TestCase):
+    path = '/api/disasters/1/summary/'
+
+    def run_concurrently(self, middleware, view, count):
+        """Runs `count` requests: the first enters the view, then the rest arrive."""
+        responses = [None] * count
+
+        def run(k):
+            responses[k] = middleware(RequestFactory().get(self.path))
+
+        threads = [threading.Thread(target=run, args=(k,)) for k in range(count)]
+        threads[0].start()
+        self.assertTrue(view.entered.wait(5))
+        for thread in threads[1:]:
+            thread.start()
+        return threads, responses
+
+    @override_settings(COALESCED_VIEWS=['disaster-summary'], ADMISSION_LIMITS={})
+    def test_identical_requests_share_one_computation(self):
+        view = BlockingView()
+        middleware = SurgeProtectionMiddleware(view)
+        threads, responses = self.run_concurrently(middleware, view, 3)
+        for _ in range(500):
+            if middleware.flights.coalesced == 2:
+                break
+            time.sleep(0.01)
+        view.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(view.calls, 1)
+        self.assertEqual([json.loads(response.content) for response in responses], [{'calls': 1}] * 3)
+        self.assertEqual([response.get(COALESCED_HEADER) for response in responses], [None, '1', '1'])
+        # Nothing is cached: the next request computes again
+        middleware(RequestFactory().get(self.path))
+        self.assertEqual(view.calls, 2)
+
+    @override_settings(COALESCED_VIEWS=[], ADMISSION_LIMITS={'disaster-summary': {'concurrency': 1, 'queue': 0}},
+                       ADMISSION_RETRY_AFTER_SECONDS=7)
+    def test_requests_beyond_the_limit_are_shed(self):
+        view = BlockingView()
+        middleware = SurgeProtectionMiddleware(view)
+        threads, responses = self.run_concurrently(middleware, view, 2)
+        threads[1].join(5)
+        view.release.set()
+        threads[0].join(5)
+
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertEqual(responses[1].status_code, 503)
+        self.assertEqual(responses[1]['Retry-After'], '7')
+        self.assertEqual(middleware.gates['disaster-summary'].shed, 1)
+        # Other views are not limited
+        self.assertEqual(middleware(RequestFactory().get('/api/households/')).status_code, 200)
+
+    def test_queued_request_waits_for_a_slot(self):
+        gate = Gate(concurrency=1, queue=1)
+        self.assertTrue(gate.acquire(0))
+        self.assertFalse(gate.acquire(0.01))  # queued, timed out
+        threading.Timer(0.05, gate.release).start()
+        self.assertTrue(gate.acquire(5))
+        self.assertEqual((gate.active, gate.waiting, gate.shed), (1, 0, 1))
+
+    @override_settings(COALESCED_VIEWS=['disaster-summary'], ADMISSION_LIMITS={})
+    def test_async_requests_share_one_computation(self):
+        calls = []
+
+        async def view(request):
+            calls.append(request)
+            await asyncio.sleep(0.05)
+            return JsonResponse({'calls': len(calls)})
+
+        middleware = SurgeProtectionMiddleware(view)
+
+        async def run():
+            return await asyncio.gather(*[middleware(RequestFactory().get(self.path)) for _ in range(3)])
+
+        responses = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(response.get(COALESCED_HEADER, '') for response in responses), ['', '1', '1'])
+
+
+# --- READ REPLICA (user-038) ---
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('api.replica.replica_configured', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = PrimaryReplicaRouter()
+
+    def route(self, request, view=None, status=200):
+        """(alias reads use inside the request, response); the routing flag stays in a copied context."""
+        def get_response(request):
+            if view is not None:
+                view()
+            return HttpResponse(self.router.db_for_read(Household), status=status)
+
+        response = contextvars.copy_context().run(ReplicaRoutingMiddleware(get_response), request)
+        return response.content.decode(), response
+
+    def test_read_views_use_the_replica(self):
+        factory = RequestFactory()
+        self.assertEqual(self.route(factory.get('/api/households/'))[0], 'replica')
+        self.assertEqual(self.route(factory.get('/api/disasters/1/events/'))[0], 'default')
+        self.assertEqual(self.route(factory.get('/no/such/page/'))[0], 'default')
+        # A write earlier in the request moves its reads to the primary
+        alias, _ = self.route(factory.get('/api/households/'), view=lambda: self.router.db_for_write(Household))
+        self.assertEqual(alias, 'default')
+
+    def test_writers_are_pinned_to_the_primary(self):
+        factory = RequestFactory()
+        alias, response = self.route(factory.post('/api/households/'), status=201)
+        self.assertEqual(alias, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        self.assertNotIn(PIN_COOKIE, self.route(factory.post('/api/households/'), status=400)[1].cookies)
+
+        pinned = factory.get('/api/households/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.route(pinned)[0], 'default')
+
+    def test_unconfigured_replica_is_not_used(self):
+        with mock.patch('api.replica.replica_configured', return_value=False):
+            self.assertEqual(self.route(RequestFactory().get('/api/households/'))[0], 'default')
+
+    @override_settings(CHANGE_FEED_OVERLAP_SECONDS=2)
+    def test_cursor_does_not_pass_the_last_sync(self):
+        synced_at = timezone.now() - timedelta(minutes=5)
+        with tempfile.TemporaryDirectory() as directory:
+            marker = os.path.join(directory, 'replica.sqlite3.synced')
+            with mock.patch('api.replica.synced_marker_path', return_value=marker):
+                mark_synced(synced_at)
+                request = RequestFactory().get('/api/households/geojson/changes/')
+                cursor = contextvars.copy_context().run(
+                    ReplicaRoutingMiddleware(lambda request: HttpResponse(current_cursor())), request).content.decode()
+        self.assertEqual(decode_cursor(cursor), synced_at - timedelta(seconds=2))
+        # Outside a replica read the cursor follows the clock
+        self.assertGreater(decode_cursor(current_cursor()), synced_at)
+
+    def test_backup_copies_the_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            source = sqlite3.connect(primary)
+            source.executescript('CREATE TABLE t (x INTEGER); INSERT INTO t VALUES (1), (2);')
+            source.close()
+            self.assertGreater(backup(primary, replica), 0)
+            copy = sqlite3.connect(replica)
+            self.assertEqual(copy.execute('SELECT SUM(x) FROM t').fetchone(), (3,))
+            copy.close()
+
+
+# --- ADMIN BULK ACTIONS (user-042) ---
+
+class AdminBulkActionTests(TestCase):
+    changelist = '/admin/api/damageassessment/'
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.disaster = make_disaster()
+        self.assessments = [
+            make_assessment(make_household(barangay=barangay), self.disaster, damage_status=status, flood_depth_meters=depth)
+            for barangay, status, depth in (('San Jose', 'TOTAL', '1.50'), ('Poblacion', 'PARTIAL', '0.40'),
+                                            ('San Jose', 'NONE', None))
+        ]
+
+    def act(self, action, assessments):
+        return self.client.post(self.changelist, {
+            'action': action, '_selected_action': [assessment.pk for assessment in assessments],
+        })
+
+    def test_changelist(self):
+        with override_settings(ADMIN_EXACT_COUNT_LIMIT=1):
+            response = self.client.get(self.changelist, {'damage_status__exact': 'TOTAL'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['cl'].result_count, 1)
+            # Filtered counts stop one past the limit; unfiltered lists use the estimate
+            self.assertEqual(EstimatedCountPaginator(DamageAssessment.objects.filter(disaster=self.disaster), 100).count, 2)
+            self.assertEqual(EstimatedCountPaginator(DamageAssessment.objects.all(), 100).count,
+                             estimated_row_count(DamageAssessment))
+        self.assertGreaterEqual(estimated_row_count(DamageAssessment), 3)
+
+    def test_recompute_ect(self):
+        DamageAssessment.objects.filter(pk__in=[a.pk for a in self.assessments[:2]]).update(recommended_ect_amount=1)
+        polled = []
+
+        def predict_while_polled(assessments):
+            # A client polls the change feed between the batches
+            polled.append(timezone.now())
+            return predict_ect_amounts(assessments)
+
+        with mock.patch('api.admin.rebuild_heatmap') as rebuild, override_settings(ADMIN_BULK_BATCH_SIZE=1), \
+                mock.patch('api.views.predict_ect_amounts', predict_while_polled):
+            self.assertEqual(self.act('recompute_ect', self.assessments[:2]).status_code, 302)
+        rebuild.assert_called_once_with(self.disaster.pk)
+
+        recomputed = list(DamageAssessment.objects.filter(pk__in=[a.pk for a in self.assessments[:2]])
+                          .select_related('household').order_by('pk'))
+        self.assertEqual([a.recommended_ect_amount for a in recomputed], predict_ect_amounts(recomputed))
+        self.assertNotIn(1, [a.recommended_ect_amount for a in recomputed])
+        # Stamped after the last batch, not when the action started
+        self.assertTrue(all(a.updated_at > polled[-1] for a in recomputed))
+
+    def test_mark_reviewed(self):
+        self.act('mark_reviewed', self.assessments[:2])
+        reviewed = dict(DamageAssessment.objects.values_list('pk', 'is_reviewed'))
+        self.assertEqual(reviewed, {self.assessments[0].pk: True, self.assessments[1].pk: True,
+                                    self.assessments[2].pk: False})
+        self.assertFalse(DamageAssessment.objects.filter(is_reviewed=True, reviewed_at__isnull=True).exists())
+
+    def test_export_selected(self):
+        response = self.act('export_selected', self.assessments[1:])
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="assessments.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:3], ['assessment_id', 'household_id', 'name'])
+        self.assertEqual([(row[0], row[3], row[5]) for row in rows[1:]], [
+            (str(self.assessments[1].pk), 'Poblacion', 'PARTIAL'), (str(self.assessments[2].pk), 'San Jose', 'NONE'),
+        ])
+
+    def test_export_escapes_formulas(self):
+        Household.objects.filter(pk=self.assessments[0].household_id).update(name='=1+1', barangay='-2')
+        response = self.act('export_selected', self.assessments[:1])
+        row = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))[1]
+        self.assertEqual((row[2], row[3]), ("'=1+1", "'-2"))
+
+
+# --- LOCK CONTENTION AND MIXED LOAD (user-044) ---
+
+class LockStatsTests(TestCase):
+    def monitor(self, sql, in_atomic_block=False, execute=lambda *args: None):
+        context = {'connection': SimpleNamespace(in_atomic_block=in_atomic_block)}
+        return dblocks._monitor(execute, sql, None, False, context)
+
+    def delta(self, before):
+        after = dblocks.lock_stats()
+        return {name: after[name] - before[name] for name in ('lock_acquisitions', 'lock_waits', 'lock_errors')}
+
+    @override_settings(DB_LOCK_WAIT_THRESHOLD_MS=0)
+    def test_counts_write_lock_acquisitions(self):
+        before = dblocks.lock_stats()
+        self.monitor('BEGIN IMMEDIATE')
+        self.monitor('  insert INTO api_household VALUES (1)')
+        self.monitor('UPDATE api_household SET name = 1', in_atomic_block=True)  # lock taken at BEGIN
+        self.monitor('SELECT 1')
+        self.assertEqual(self.delta(before), {'lock_acquisitions': 2, 'lock_waits': 2, 'lock_errors': 0})
+
+    def test_counts_lock_errors(self):
+        def locked(*args):
+            raise OperationalError('database is locked')
+
+        before = dblocks.lock_stats()
+        with self.assertRaises(OperationalError):
+            self.monitor('BEGIN IMMEDIATE', execute=locked)
+        self.assertEqual(self.delta(before), {'lock_acquisitions': 1, 'lock_waits': 0, 'lock_errors': 1})
+        self.assertEqual(set(APIClient().get('/api/db-locks/').json()), set(dblocks.lock_stats()))
+
+
+class MixedLoadTests(TestCase):
+    def setUp(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def respond(self, status):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def do_GET(self):
+                self.respond(200)
+
+            def do_POST(self):
+                self.respond(503)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f'http://127.0.0.1:{server.server_port}'
+
+    def test_results_per_endpoint(self):
+        results = loadtest.mix(self.url, {
+            'read': (3, lambda rng: ('GET', f'/households/{rng.randrange(10)}', None)),
+            'write': (1, lambda rng: ('POST', '/assessments/', {'damage_status': 'TOTAL'})),
+        }, concurrency=2, duration=0.3, timeout=5)
+        read, write = results['read'], results['write']
+        self.assertGreater(read.requests, 0)
+        self.assertGreater(write.requests, 0)
+        self.assertEqual((read.error_rate, write.error_rate), (0, 1))
+        self.assertEqual(set(read.statuses), {200})
+        self.assertEqual(write.statuses, {503: write.requests})
+        self.assertEqual(read.bytes_received, 2 * read.requests)
+
+    def test_percentile(self):
+        result = loadtest.LoadResult(url=self.url, concurrency=1, duration=1.0,
+                                     latencies=[0.004, 0.001, 0.003, 0.002], served_latencies=[0.001])
+        self.assertEqual((result.percentile(50), result.percentile(100)), (3.0, 4.0))
+        self.assertEqual(result.percentile(99, served=True), 1.0)
+        self.assertEqual(result.error_rate, 0.75)
+
+
+# --- DASHBOARD RENDERING (user-045) ---
+
+def distribution(value):
+    return {'p50': value, 'p95': value, 'max': value, 'samples': 1}
+
+
+# The report the benchmark page posts (templates/map_benchmark.html)
+BENCHMARK_RESULTS = {
+    'disaster_id': 1, 'households': 2, 'user_agent': 'HeadlessChrome',
+    'load': {'total_ms': 120.5, 'fetch_ms': 40, 'decode_ms': 10, 'store_ms': 5, 'first_draw_ms': 3.2,
+             'first_list_ms': 1.1},
+    'load_long_tasks': {'count': 1, 'total_ms': 60},
+    'pan_zoom': {'draw_ms': distribution(2.0), 'frame_ms': distribution(16.7), 'markers_drawn': distribution(2)},
+    'list_scroll': {'render_ms': distribution(0.5), 'frame_ms': distribution(16.7), 'rows_in_dom': 2},
+}
+
+
+class DashboardTests(TestCase):
+    def test_pages_load_the_map_scripts(self):
+        for path in ('/', '/benchmark/map/'):
+            with self.subTest(path=path):
+                page = self.client.get(path).content.decode()
+                for script in ('js/feed_worker.js', 'js/household_map.js'):
+                    self.assertIn(f'/static/{script}', page)
+                    self.assertIsNotNone(finders.find(script))
+                self.assertIn('format=columnar', page)
+
+    def test_benchmark_report(self):
+        receiver = ReportReceiver().start()
+        self.addCleanup(receiver.stop)
+        request = urllib.request.Request(receiver.url, data=json.dumps(BENCHMARK_RESULTS).encode(), method='POST')
+        self.assertEqual(urllib.request.urlopen(request, timeout=5).status, 204)
+        self.assertTrue(receiver.received.wait(5))
+        self.assertEqual(receiver.results, BENCHMARK_RESULTS)
+
+        output = io.StringIO()
+        BenchDashboardCommand(stdout=output).report(receiver.results)
+        self.assertIn('Load: 120 ms until drawn', output.getvalue())
+        self.assertIn('list rows in the DOM: 2', output.getvalue())
+
+    def test_unknown_disaster(self):
+        with self.assertRaisesMessage(CommandError, 'Disaster 999 not found'):
+            call_command('bench_dashboard', disaster=999, stdout=io.StringIO())
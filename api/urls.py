@@ -1,14 +1,31 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import HouseholdViewSet, DisasterEventViewSet, DamageAssessmentViewSet, generate_sms
+from .views import (
+    HouseholdViewSet, DisasterEventViewSet, DamageAssessmentViewSet, DuplicateHouseholdCandidateViewSet, generate_sms,
+    disaster_heatmap_tile, disaster_events, disaster_manifest, disaster_snapshot_download, sms_receipts,
+    db_lock_stats,
+)
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'households', HouseholdViewSet, basename='household')
 router.register(r'disasters', DisasterEventViewSet, basename='disaster')
 router.register(r'assessments', DamageAssessmentViewSet, basename='assessment')
+router.register(r'duplicates', DuplicateHouseholdCandidateViewSet, basename='duplicate')
 
 urlpatterns = [
+    # Before the router so snapshot/download/ is not read as a viewset action
+    path('disasters/<int:pk>/snapshot/download/', disaster_snapshot_download, name='disaster-snapshot-download'),
     path('', include(router.urls)),
     path('generate-sms/', generate_sms, name='generate-sms'),
+    path('disasters/<int:pk>/events/', disaster_events, name='disaster-events'),
+    path('disasters/<int:pk>/manifest.csv', disaster_manifest, name='disaster-manifest'),
+    path('sms/receipts/<str:provider>/', sms_receipts, name='sms-receipts'),
+    path('db-locks/', db_lock_stats, name='db-lock-stats'),
+    path('disasters/<int:pk>/heatmap/<int:z>/<int:x>/<int:y>', disaster_heatmap_tile, name='disaster-heatmap-tile'),
+    # Async versions for ASGI deployments (api/async_views.py)
+    path('async/households/geojson/', async_views.geojson, name='async-household-geojson'),
+    path('async/assessments/', async_views.assessment_list, name='async-assessment-list'),
+    path('async/generate-sms/', async_views.generate_sms, name='async-generate-sms'),
 ]
 
@@ -1,12 +1,37 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from django.http import JsonResponse
+from rest_framework.settings import api_settings
+from django.db.models import Count, F, Q
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 from django.conf import settings
+from django.utils import timezone
+import asyncio
+from decimal import Decimal, InvalidOperation
+import os
 import requests
+import secrets
 import json
-from .models import Household, DisasterEvent, DamageAssessment
-from .serializers import HouseholdSerializer, DisasterEventSerializer, DamageAssessmentSerializer
+from .models import Household, DisasterEvent, DamageAssessment, DisasterSnapshot, DuplicateHouseholdCandidate, SmsMessage
+from .serializers import HouseholdSerializer, DisasterEventSerializer, DamageAssessmentSerializer, FloodRasterSerializer, DisasterSnapshotSerializer, DuplicateHouseholdCandidateSerializer
+from .flood_raster import FloodRasterError, ingest_flood_raster
+from .heatmap import heatmap_tile
+from .changes import ChangeFeedError, current_cursor, encode_cursor, geojson_changes
+from .events import format_sse, get_broker
+from .sync import apply_sync_batch
+from .manifest import manifest_csv_lines
+from .snapshot import current_snapshot, request_snapshot
+from .columnar import columnar_feed
+from .store import get_store
+from .renderers import ColumnarJSONRenderer, FastJsonResponse
+from .archive import ArchiveError, ArchivedAssessmentPages, archive_disaster, archived_assessments, restore_disaster
+from .history import history_queryset, household_history
+from .dedup import find_matches, record_matches
+from .dblocks import lock_stats
+from .risk import risk_tier
+from .sms import UnknownProvider, default_provider_name, enqueue_disaster_notices, get_provider, apply_receipts
 
 import pandas as pd
 import numpy as np
@@ -95,6 +120,89 @@ def preprocess_and_predict(assessment_instance):
       
    return int(prediction)
 
+
+def predict_ect_amounts(assessments):
+   """
+   Batch version of preprocess_and_predict: one DataFrame and one model call for
+   many assessments (with household selected), instead of one per row.
+   Returns predicted ECT amounts in the same order.
+   """
+   if loadModel is None or not assessments:
+       return [preprocess_and_predict(assessment) for assessment in assessments]
+
+   def number(value):
+       return float(value) if value is not None else np.nan
+
+   X_new = pd.DataFrame({
+       'Barangay_ID': [a.household.barangay for a in assessments],
+       'Latitude': [number(a.household.latitude) for a in assessments],
+       'Longitude': [number(a.household.longitude) for a in assessments],
+       'Flood_Depth_Meters': [number(a.flood_depth_meters) for a in assessments],
+       'House_Height_Meters': [number(a.household.house_height_meters) for a in assessments],
+       'House_Width_Meters': [number(a.household.house_width_meters) for a in assessments],
+       'Damage_Classification': [a.damage_status for a in assessments],
+       'Is_4Ps_Recipient': [int(a.household.is_4ps_recipient) for a in assessments],
+   })
+   X_new['Flood_Height_Ratio'] = np.minimum(X_new['Flood_Depth_Meters'] / X_new['House_Height_Meters'], 1.0)
+   return [int(prediction) for prediction in loadModel.predict(X_new).flatten()]
+
+
+def household_feature(household, assessment=None):
+    """
+    Builds the GeoJSON Feature for one household on the map.
+    Households without an assessment for the disaster are shown as NONE.
+
+    Marker colors follow damage_status:
+    - Red: Total Damage (₱10,000)
+    - Orange: Partial Damage (₱5,000)
+    - Green: No Damage (₱0)
+    """
+    if assessment is not None:
+        damage_status = assessment.damage_status
+        ect_amount = float(assessment.recommended_ect_amount)
+        flood_depth = float(assessment.flood_depth_meters) if assessment.flood_depth_meters is not None else None
+    else:
+        damage_status = 'NONE'
+        ect_amount = 0
+        flood_depth = None
+
+    # Determine color based on damage status
+    if damage_status == 'TOTAL':
+        marker_color = 'red'
+    elif damage_status == 'PARTIAL':
+        marker_color = 'orange'
+    else:
+        marker_color = 'green'
+
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [
+                float(household.longitude),
+                float(household.latitude)
+            ]
+        },
+        'properties': {
+            'id': household.id,
+            'name': household.name,
+            'address': household.address,
+            'barangay': household.barangay,
+            'contact_number': household.contact_number or '',
+            'damage_status': damage_status,
+            'ect_amount': ect_amount,
+            'flood_depth_meters': flood_depth,
+            'marker_color': marker_color,
+            'popup_content': f"""
+                <strong>{household.name}</strong><br>
+                {household.address}<br>
+                <strong>Status:</strong> {damage_status}<br>
+                <strong>ECT Amount:</strong> ₱{ect_amount:,.2f}
+            """
+        }
+    }
+
+
 class HouseholdViewSet(viewsets.ModelViewSet):
     """
     REST API ViewSet for Household model.
@@ -103,7 +211,38 @@ class HouseholdViewSet(viewsets.ModelViewSet):
     queryset = Household.objects.all()
     serializer_class = HouseholdSerializer
 
-    @action(detail=False, methods=['get'])
+    def create(self, request, *args, **kwargs):
+        """
+        Refuses (409) a household that looks like one already registered nearby,
+        listing the matches. Resend with ?force=true to create it anyway; the
+        matches are then recorded as duplicate candidates for review.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        matches = []
+        if getattr(settings, 'DEDUP_CHECK_ON_CREATE', True):
+            data = serializer.validated_data
+            matches = find_matches(data['name'], data['address'], data['latitude'], data['longitude'])
+        if matches and not _query_flag(request, 'force'):
+            return Response({
+                'error': 'Possible duplicate of an existing household; resend with ?force=true to create it anyway',
+                'matches': [
+                    {
+                        'id': match['household'].pk,
+                        'name': match['household'].name,
+                        'address': match['household'].address,
+                        'distance_meters': match['distance_meters'],
+                        'score': match['score'],
+                    }
+                    for match in matches
+                ],
+            }, status=status.HTTP_409_CONFLICT)
+
+        self.perform_create(serializer)
+        record_matches(serializer.instance, matches)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(serializer.data))
+
+    @action(detail=False, methods=['get'], renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer])
     def geojson(self, request):
         """
         CRITICAL IMPLEMENTATION: Custom GeoJSON endpoint for Leaflet.js map.
@@ -118,6 +257,9 @@ class HouseholdViewSet(viewsets.ModelViewSet):
         - Red: Total Damage (₱10,000)
         - Orange: Partial Damage (₱5,000)
         - Green: No Damage (₱0)
+
+        With ?format=columnar the same data comes as parallel typed arrays without
+        names, addresses or popups (see api/columnar.py); details come from map-detail.
         """
         disaster_id = request.query_params.get('disaster_id', None)
         
@@ -135,68 +277,121 @@ class HouseholdViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        if request.query_params.get('format') == 'columnar':
+            encoding = request.query_params.get('encoding', 'base64')
+            if encoding not in ('base64', 'json'):
+                return Response({'error': 'encoding must be base64 or json'}, status=status.HTTP_400_BAD_REQUEST)
+            frame = get_store().frame(disaster.pk)
+            return FastJsonResponse(columnar_feed(frame, encode_cursor(frame.as_of), encoding))
+
         # Build GeoJSON structure
+        cursor = current_cursor()
         features = []
         
+        # One query for the disaster's assessments instead of one per household
+        if disaster.archived_at is not None and _query_flag(request, 'include_archived'):
+            rows = archived_assessments([disaster.pk], with_related=False)
+        else:
+            rows = DamageAssessment.objects.filter(disaster=disaster).iterator(chunk_size=2000)
+        assessments = {assessment.household_id: assessment for assessment in rows}
         households = Household.objects.all()
-        for household in households:
-            # Get assessment for this household and disaster
-            try:
-                assessment = DamageAssessment.objects.get(
-                    household=household,
-                    disaster=disaster
-                )
-                damage_status = assessment.damage_status
-                ect_amount = float(assessment.recommended_ect_amount)
-            except DamageAssessment.DoesNotExist:
-                damage_status = 'NONE'
-                ect_amount = 0
-
-            # Determine color based on damage status
-            if damage_status == 'TOTAL':
-                color = '#dc3545'  # Red
-                marker_color = 'red'
-            elif damage_status == 'PARTIAL':
-                color = '#fd7e14'  # Orange
-                marker_color = 'orange'
-            else:
-                color = '#28a745'  # Green
-                marker_color = 'green'
-
-            feature = {
-                'type': 'Feature',
-                'geometry': {
-                    'type': 'Point',
-                    'coordinates': [
-                        float(household.longitude),
-                        float(household.latitude)
-                    ]
-                },
-                'properties': {
-                    'id': household.id,
-                    'name': household.name,
-                    'address': household.address,
-                    'barangay': household.barangay,
-                    'contact_number': household.contact_number or '',
-                    'damage_status': damage_status,
-                    'ect_amount': ect_amount,
-                    'marker_color': marker_color,
-                    'popup_content': f"""
-                        <strong>{household.name}</strong><br>
-                        {household.address}<br>
-                        <strong>Status:</strong> {damage_status}<br>
-                        <strong>ECT Amount:</strong> ₱{ect_amount:,.2f}
-                    """
-                }
-            }
-            features.append(feature)
+        for household in households.iterator(chunk_size=2000):
+            features.append(household_feature(household, assessments.get(household.id)))
 
         geojson = {
             'type': 'FeatureCollection',
-            'features': features
+            'features': features,
+            'cursor': cursor
         }
 
-        return JsonResponse(geojson)
+        return FastJsonResponse(geojson)
+
+    @action(detail=True, methods=['get'], url_path='map-detail')
+    def map_detail(self, request, pk=None):
+        """
+        Popup details for one household on the map: /api/households/{id}/map-detail/?disaster_id=1
+        Returns the properties of the household's GeoJSON feature (name, address, contact, status...).
+        """
+        household = self.get_object()
+        disaster_id = request.query_params.get('disaster_id', '')
+        assessment = None
+        if disaster_id.isdigit():
+            assessment = DamageAssessment.objects.filter(household=household, disaster_id=disaster_id).first()
+        return JsonResponse(household_feature(household, assessment)['properties'])
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        Damage history of one household across disasters: /api/households/{id}/history/
+        Counters over every disaster plus a per-disaster series, oldest first
+        (add ?include_archived=true for archived disasters in the series).
+        """
+        household = get_object_or_404(history_queryset(self.get_queryset()), pk=pk)
+        data = household_history([household], _query_flag(request, 'include_archived'))
+        return FastJsonResponse({'disasters': data['disasters'], **data['households'][0]})
+
+    @action(detail=False, methods=['get'], url_path='history')
+    def bulk_history(self, request):
+        """
+        Damage history of many households: /api/households/history/?ids=1,2,3
+        or ?barangay=Barangay 4, optionally ?min_damaged=2 for repeat victims only.
+        Paginated like the household list; all assessments come from one prefetch query.
+        """
+        ids = _query_list(request, 'ids')
+        barangay = request.query_params.get('barangay')
+        min_damaged = request.query_params.get('min_damaged', '')
+        if not (ids or barangay or min_damaged):
+            return Response({'error': 'ids, barangay or min_damaged parameter is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not all(value.isdigit() for value in ids) or (min_damaged and not min_damaged.isdigit()):
+            return Response({'error': 'ids and min_damaged must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        households = self.get_queryset()
+        if ids:
+            households = households.filter(pk__in=ids)
+        if barangay:
+            households = households.filter(barangay=barangay)
+        if min_damaged:
+            households = households.alias(
+                damaged=F('partial_damage_count') + F('total_damage_count')
+            ).filter(damaged__gte=int(min_damaged))
+
+        page = self.paginate_queryset(history_queryset(households))
+        return self.get_paginated_response(household_history(page, _query_flag(request, 'include_archived')))
+
+    @action(detail=False, methods=['get'], url_path='geojson/changes')
+    def geojson_changes(self, request):
+        """
+        Delta feed for the map: /api/households/geojson/changes/?disaster_id=1&since=<cursor>
+
+        Returns only the features added, modified or removed since the cursor
+        (taken from the last geojson or changes response) plus a new cursor.
+        If the cursor is too old or too much changed, `reset` is true and the
+        client should reload the full GeoJSON.
+        """
+        disaster_id = request.query_params.get('disaster_id', None)
+        since = request.query_params.get('since', None)
+
+        if not disaster_id or not since:
+            return Response(
+                {'error': 'disaster_id and since parameters are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            disaster = DisasterEvent.objects.get(pk=disaster_id)
+        except DisasterEvent.DoesNotExist:
+            return Response(
+                {'error': 'Disaster not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            changes = geojson_changes(disaster, since, household_feature)
+        except ChangeFeedError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return FastJsonResponse(changes)
 
 
 class DisasterEventViewSet(viewsets.ModelViewSet):
@@ -204,6 +399,136 @@ class DisasterEventViewSet(viewsets.ModelViewSet):
     queryset = DisasterEvent.objects.all()
     serializer_class = DisasterEventSerializer
 
+    @action(detail=True, methods=['post'], url_path='flood-raster')
+    def flood_raster(self, request, pk=None):
+        """
+        Upload a flood-depth raster (.npy, .npz or .asc) for this disaster.
+        Depths are sampled under every household and written to the assessments in bulk.
+        Optional form fields: xllcorner, yllcorner, cellsize, nodata (required for .npy).
+        """
+        disaster = self.get_object()
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        extension = os.path.splitext(upload.name)[1].lower()
+        if extension not in ('.npy', '.npz', '.asc', '.txt'):
+            return Response({'error': f'Unsupported raster format: {extension}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        os.makedirs(settings.FLOOD_RASTER_ROOT, exist_ok=True)
+        path = os.path.join(
+            settings.FLOOD_RASTER_ROOT,
+            f"disaster{disaster.pk}_{timezone.now():%Y%m%d%H%M%S}{extension}"
+        )
+        with open(path, 'wb') as fh:
+            for chunk in upload.chunks():
+                fh.write(chunk)
+
+        try:
+            raster = ingest_flood_raster(
+                disaster,
+                path,
+                xllcorner=request.data.get('xllcorner'),
+                yllcorner=request.data.get('yllcorner'),
+                cellsize=request.data.get('cellsize'),
+                nodata=request.data.get('nodata'),
+            )
+        except (FloodRasterError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(FloodRasterSerializer(raster).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def archive(self, request, pk=None):
+        """
+        Move a closed disaster's assessments to compressed cold storage: POST /api/disasters/{id}/archive/
+        They stay readable with ?include_archived=true and can be restored.
+        """
+        disaster = self.get_object()
+        try:
+            report = archive_disaster(disaster)
+        except ArchiveError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({**report, 'disaster': self.get_serializer(disaster).data})
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        """Move an archived disaster's assessments back: POST /api/disasters/{id}/restore/"""
+        disaster = self.get_object()
+        try:
+            report = restore_disaster(disaster)
+        except ArchiveError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({**report, 'disaster': self.get_serializer(disaster).data})
+
+    @action(detail=True, methods=['get', 'post'])
+    def sms(self, request, pk=None):
+        """
+        ECT notices by SMS: POST /api/disasters/{id}/sms/ queues one message per assessed
+        household with a contact number; the send_sms command delivers them.
+        Body (all optional): {"statuses": ["TOTAL", "PARTIAL"], "campaign": "...", "provider": "stub"}
+        GET counts this disaster's messages per status (?campaign= to narrow it down).
+        """
+        disaster = self.get_object()
+        if request.method == 'GET':
+            messages = SmsMessage.objects.filter(assessment__disaster=disaster)
+            if request.GET.get('campaign'):
+                messages = messages.filter(campaign=request.GET['campaign'])
+            counts = dict(messages.order_by().values_list('status').annotate(count=Count('id')))
+            return Response({value: counts.get(value, 0) for value in SmsMessage.Status.values})
+
+        statuses = [value.upper() for value in request.data.get('statuses') or []]
+        invalid = set(statuses) - set(DamageAssessment.DamageStatus.values)
+        if invalid:
+            return Response({'error': f'Invalid status: {", ".join(sorted(invalid))}'}, status=status.HTTP_400_BAD_REQUEST)
+        provider = request.data.get('provider') or default_provider_name()
+        if provider not in getattr(settings, 'SMS_PROVIDERS', {}):
+            return Response({'error': f'Unknown SMS provider: {provider}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queued = enqueue_disaster_notices(disaster, statuses, request.data.get('campaign') or None, provider)
+        return Response({'queued': queued}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """
+        Household counts and ECT totals per damage status and per barangay: /api/disasters/{id}/summary/
+        Optional filters: ?barangay=Barangay 1,Barangay 2&status=TOTAL,PARTIAL
+        Computed from the in-process columnar store, not from ORM rows.
+        """
+        disaster = self.get_object()
+        statuses = [value.upper() for value in _query_list(request, 'status')]
+        invalid = set(statuses) - set(DamageAssessment.DamageStatus.values)
+        if invalid:
+            return Response({'error': f'Invalid status: {", ".join(sorted(invalid))}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        frame = get_store().frame(disaster.pk)
+        return Response(frame.summary(_query_list(request, 'barangay'), statuses))
+
+    @action(detail=True, methods=['get', 'post'])
+    def snapshot(self, request, pk=None):
+        """
+        Columnar snapshot of this disaster's data for analysts.
+        POST starts a background build unless the current data already has one (202 while pending).
+        GET reports the snapshot for the current data; download it from snapshot/download/.
+        """
+        disaster = self.get_object()
+        if request.method == 'POST':
+            file_format = request.data.get('format') or None
+            if file_format not in (None, *DisasterSnapshot.FileFormat.values):
+                return Response({'error': f'Unsupported snapshot format: {file_format}'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                snapshot = request_snapshot(disaster, file_format)
+            except ImportError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            snapshot = current_snapshot(disaster)
+            if snapshot is None:
+                return Response({'error': 'No snapshot of the current data; POST to build one'},
+                                status=status.HTTP_404_NOT_FOUND)
+
+        code = status.HTTP_200_OK if snapshot.status == DisasterSnapshot.Status.READY else status.HTTP_202_ACCEPTED
+        return Response(DisasterSnapshotSerializer(snapshot).data, status=code)
+
 
 class DamageAssessmentViewSet(viewsets.ModelViewSet):
     """REST API ViewSet for DamageAssessment model."""
@@ -212,9 +537,10 @@ class DamageAssessmentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """
-        Optionally filter by disaster_id or household_id
+        Optionally filter by disaster_id or household_id, and by risk (see _risk_query)
         """
-        queryset = DamageAssessment.objects.all()
+        # The serializer reads household and disaster names from every row
+        queryset = DamageAssessment.objects.select_related('household', 'disaster')
         disaster_id = self.request.query_params.get('disaster_id', None)
         household_id = self.request.query_params.get('household_id', None)
         
@@ -222,11 +548,365 @@ class DamageAssessmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(disaster_id=disaster_id)
         if household_id:
             queryset = queryset.filter(household_id=household_id)
+
+        try:
+            filters, ordering = _risk_query(self.request)
+        except ValueError:
+            # list() answers 400; other actions ignore list parameters
+            return queryset
+        queryset = queryset.filter(**filters)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
             
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        With ?include_archived=true, assessments of archived disasters follow the
+        active ones (same disaster_id / household_id filters).
+
+        Triage, e.g. the highest-risk 4Ps households of a disaster:
+        ?disaster_id=1&is_4ps=true&risk_tier=HIGH&ordering=-flood_height_ratio
+        """
+        try:
+            _risk_query(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not _query_flag(request, 'include_archived'):
+            return super().list(request, *args, **kwargs)
+
+        if any(name in request.query_params for name in RISK_PARAMS):
+            return Response({'error': 'Risk filters and ordering do not apply to archived assessments'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        disaster_id = request.query_params.get('disaster_id')
+        household_id = request.query_params.get('household_id')
+        if (disaster_id and not disaster_id.isdigit()) or (household_id and not household_id.isdigit()):
+            return Response({'error': 'disaster_id and household_id must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = HotAndArchivedRows(self.filter_queryset(self.get_queryset()), archived_rows(disaster_id, household_id),
+                                  self.get_serializer_class())
+        return self.get_paginated_response(self.paginate_queryset(rows))
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Offline sync for field assessors: POST /api/assessments/sync/
+
+        Body:
+        {
+            "client_id": "tablet-07",
+            "since": "<cursor from the previous sync>",
+            "disaster_ids": [1],
+            "changes": [{"idempotency_key": "...", "household": 12, "disaster": 1,
+                         "damage_status": "TOTAL", "flood_depth_meters": "1.20",
+                         "client_updated_at": "2025-11-01T10:00:00Z"}]
+        }
+
+        Returns one result per change (APPLIED, CONFLICT or REJECTED; retried keys
+        are marked duplicate), the server changes since `since` and a new cursor.
+        """
+        changes = request.data.get('changes', [])
+        if not isinstance(changes, list):
+            return Response({'error': 'changes must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(changes) > getattr(settings, 'SYNC_MAX_BATCH_SIZE', 10000):
+            return Response({'error': 'Too many changes in one batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = apply_sync_batch(
+                request.data.get('client_id', ''),
+                changes,
+                since=request.data.get('since'),
+                disaster_ids=request.data.get('disaster_ids'),
+            )
+        except ChangeFeedError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result)
+
+    @action(detail=False, methods=['post'])
+    def predict(self, request):
+        """
+        Bulk ECT prediction: POST /api/assessments/predict/
+        Body: {"disaster_id": 1} for every assessment of a disaster, or {"ids": [1, 2, 3]}.
+        Runs the CatBoost model once over all rows; nothing is saved.
+        """
+        ids = request.data.get('ids')
+        disaster_id = request.data.get('disaster_id')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(value, int) for value in ids):
+                return Response({'error': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = DamageAssessment.objects.filter(id__in=ids)
+        elif disaster_id is not None:
+            queryset = DamageAssessment.objects.filter(disaster_id=disaster_id)
+        else:
+            return Response({'error': 'ids or disaster_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_rows = getattr(settings, 'BULK_PREDICT_MAX_ROWS', 10000)
+        assessments = list(queryset.select_related('household').order_by('id')[:max_rows + 1])
+        if len(assessments) > max_rows:
+            return Response({'error': f'Too many assessments (limit {max_rows})'}, status=status.HTTP_400_BAD_REQUEST)
+
+        predictions = predict_ect_amounts(assessments)
+        return FastJsonResponse({
+            'count': len(assessments),
+            'predictions': [
+                {
+                    'id': assessment.id,
+                    'household_id': assessment.household_id,
+                    'recommended_ect_amount': assessment.recommended_ect_amount,
+                    'predicted_ect_amount': predicted,
+                }
+                for assessment, predicted in zip(assessments, predictions)
+            ],
+        })
+
+
+class DuplicateHouseholdCandidateViewSet(viewsets.ModelViewSet):
+    """
+    Likely duplicate households for review: /api/duplicates/?status=OPEN
+    PATCH {"status": "CONFIRMED"} or {"status": "DISMISSED"} to record the decision.
+    """
+    serializer_class = DuplicateHouseholdCandidateSerializer
+    http_method_names = ['get', 'patch', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = DuplicateHouseholdCandidate.objects.select_related('household', 'duplicate')
+        statuses = _query_list(self.request, 'status')
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        household_id = self.request.query_params.get('household_id')
+        if household_id:
+            queryset = queryset.filter(Q(household_id=household_id) | Q(duplicate_id=household_id))
+        return queryset
+
+    def perform_update(self, serializer):
+        serializer.save(reviewed_at=timezone.now())
+
+
+@api_view(['GET'])
+def disaster_heatmap_tile(request, pk, z, x, y):
+    """
+    Precomputed damage heatmap tile for a disaster.
+    Returns aggregate cells (count per damage status and ECT sum) inside tile z/x/y.
+    """
+    if z > 22 or x >= 2 ** z or y >= 2 ** z:
+        return Response({'error': 'Invalid tile coordinates'}, status=status.HTTP_400_BAD_REQUEST)
+    if not DisasterEvent.objects.filter(pk=pk).exists():
+        return Response({'error': 'Disaster not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return FastJsonResponse(heatmap_tile(pk, z, x, y))
+
+
+@api_view(['POST'])
+def sms_receipts(request, provider):
+    """
+    Delivery receipt callback for an SMS provider: POST /api/sms/receipts/{provider}/
+    The body format is the provider's (see SmsProvider.parse_receipts). The provider must
+    send its configured receipt_token in the X-Receipt-Token header; without one configured,
+    receipts are refused, since they mark messages delivered or failed.
+    """
+    try:
+        gateway = get_provider(provider)
+    except UnknownProvider:
+        return Response({'error': f'Unknown SMS provider: {provider}'}, status=status.HTTP_404_NOT_FOUND)
+    token = gateway.options.get('receipt_token')
+    if not token:
+        return Response({'error': f'No receipt_token configured for SMS provider: {provider}'},
+                        status=status.HTTP_403_FORBIDDEN)
+    if not secrets.compare_digest(request.headers.get('X-Receipt-Token', ''), token):
+        return Response({'error': 'Invalid receipt token'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        receipts = gateway.parse_receipts(request.data)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return Response({'error': f'Malformed receipts: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    applied, ignored = apply_receipts(receipts)
+    return Response({'applied': applied, 'ignored': ignored})
+
+
+@api_view(['GET'])
+def db_lock_stats(request):
+    """SQLite write-lock contention counters of this process since it started (see api.dblocks)."""
+    return Response(lock_stats())
+
+
+def _query_list(request, name):
+    """Values of a query parameter given either repeated or comma-separated."""
+    return [value for item in request.GET.getlist(name) for value in item.split(',') if value]
+
+
+def _query_flag(request, name):
+    """True for ?name=1, ?name=true or ?name=yes."""
+    return request.GET.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+# ?ordering= for assessments. The tier leads (it only rises with the ratio), so within a
+# disaster the (disaster, risk_tier, flood_height_ratio) index serves the sort.
+RISK_ORDERINGS = {
+    'flood_height_ratio': ['risk_tier', 'flood_height_ratio', 'id'],
+    '-flood_height_ratio': ['-risk_tier', '-flood_height_ratio', '-id'],
+}
+RISK_ORDERINGS['risk_tier'] = RISK_ORDERINGS['flood_height_ratio']
+RISK_ORDERINGS['-risk_tier'] = RISK_ORDERINGS['-flood_height_ratio']
+RISK_PARAMS = ('risk_tier', 'min_ratio', 'max_ratio', 'is_4ps', 'ordering')
+
+
+def _risk_query(request):
+    """
+    Filters and ordering from ?risk_tier=HIGH,MEDIUM, ?min_ratio=, ?max_ratio=,
+    ?is_4ps=true and ?ordering=-flood_height_ratio. Raises ValueError on bad values.
+    """
+    filters = {}
+    tiers = [value.upper() for value in _query_list(request, 'risk_tier')]
+    if tiers:
+        unknown = set(tiers) - set(DamageAssessment.RiskTier.names)
+        if unknown:
+            raise ValueError(f'Unknown risk_tier: {", ".join(sorted(unknown))}')
+        filters['risk_tier__in'] = [DamageAssessment.RiskTier[name] for name in tiers]
+    tier_bounds = {}
+    for name, lookup in (('min_ratio', 'gte'), ('max_ratio', 'lte')):
+        if request.GET.get(name):
+            try:
+                ratio = Decimal(request.GET[name])
+            except InvalidOperation:
+                ratio = None
+            if ratio is None or not ratio.is_finite():
+                raise ValueError(f'{name} must be a number')
+            filters[f'flood_height_ratio__{lookup}'] = ratio
+            tier_bounds[lookup] = risk_tier(ratio)
+    # The tiers the ratio range falls in, so the index seeks instead of scanning the disaster;
+    # a single tier as an equality lets it seek on the ratio as well
+    if 'gte' in tier_bounds and tier_bounds['gte'] in (tier_bounds.get('lte'), DamageAssessment.RiskTier.HIGH):
+        tier_bounds = {'exact': tier_bounds['gte']}
+    filters.update({f'risk_tier__{lookup}': tier for lookup, tier in tier_bounds.items()})
+    if 'is_4ps' in request.GET:
+        filters['household__is_4ps_recipient'] = _query_flag(request, 'is_4ps')
+
+    ordering = request.GET.get('ordering')
+    if ordering and ordering not in RISK_ORDERINGS:
+        raise ValueError(f'ordering must be one of: {", ".join(RISK_ORDERINGS)}')
+    return filters, RISK_ORDERINGS.get(ordering)
+
+
+def archived_rows(disaster_id=None, household_id=None):
+    """Archived assessments for ?include_archived=true, given the list's (validated) disaster_id / household_id."""
+    disaster_ids = [int(disaster_id)] if disaster_id else None
+    if household_id:
+        # Only the batches covering the household are read
+        return archived_assessments(disaster_ids, household_ids=[int(household_id)])
+    return ArchivedAssessmentPages(disaster_ids)
+
+
+class HotAndArchivedRows:
+    """
+    Paginator input for ?include_archived=true: the filtered hot queryset followed
+    by archived assessments (a list or ArchivedAssessmentPages), serialized page by page.
+    """
+
+    def __init__(self, queryset, archived, serializer_class):
+        self.queryset = queryset
+        self.archived = archived
+        self.serializer_class = serializer_class
+
+    def count(self):
+        self.hot_count = self.queryset.count()
+        return self.hot_count + len(self.archived)
+
+    def __getitem__(self, page):
+        hot = list(self.queryset[page]) if page.start < self.hot_count else []
+        archived_start = max(page.start - self.hot_count, 0)
+        archived = self.archived[archived_start:max(page.stop - self.hot_count, 0)]
+        return self.serializer_class([*hot, *archived], many=True).data
+
+
+@require_GET
+def disaster_manifest(request, pk):
+    """
+    Payout manifest for cash disbursement as streaming CSV: /api/disasters/{id}/manifest.csv
+
+    Optional filters: ?barangay=Poblacion,San Jose&status=TOTAL,PARTIAL
+    Households are grouped by barangay, each followed by a SUBTOTAL row; the last row is the TOTAL.
+    """
+    disaster = DisasterEvent.objects.filter(pk=pk).first()
+    if disaster is None:
+        return JsonResponse({'error': 'Disaster not found'}, status=404)
+
+    statuses = [value.upper() for value in _query_list(request, 'status')]
+    invalid = set(statuses) - set(DamageAssessment.DamageStatus.values)
+    if invalid:
+        return JsonResponse({'error': f'Invalid status: {", ".join(sorted(invalid))}'}, status=400)
+
+    response = StreamingHttpResponse(
+        manifest_csv_lines(disaster.pk, _query_list(request, 'barangay'), statuses),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="manifest-disaster-{disaster.pk}.csv"'
+    return response
+
+
+@require_GET
+def disaster_snapshot_download(request, pk):
+    """Downloads the disaster's snapshot file for the current data version."""
+    disaster = DisasterEvent.objects.filter(pk=pk).first()
+    if disaster is None:
+        return JsonResponse({'error': 'Disaster not found'}, status=404)
+    snapshot = current_snapshot(disaster)
+    if snapshot is None or snapshot.status != DisasterSnapshot.Status.READY:
+        return JsonResponse({'error': 'No ready snapshot of the current data; POST to snapshot/ to build one'}, status=404)
+
+    try:
+        snapshot_file = open(snapshot.file_path, 'rb')
+    except FileNotFoundError:
+        # A newer build removed this file between the lookup and the open
+        return JsonResponse({'error': 'Snapshot was replaced by a newer build; retry the download'}, status=409)
+    response = FileResponse(snapshot_file, as_attachment=True, filename=os.path.basename(snapshot.file_path))
+    response['X-Data-Version'] = snapshot.data_version
+    return response
+
+
+async def disaster_events(request, pk):
+    """
+    Server-Sent Events stream of assessment changes for a disaster: /api/disasters/{id}/events/
+
+    Event types:
+    - assessment: an assessment was saved (household_id, damage_status, ect_amount, ...)
+    - assessment_deleted: the household reverts to NONE
+    - bulk_update / resync: too much changed or the client fell behind; pull the change feed
+
+    Intended to run under ASGI (BantayAyuda/asgi.py) so idle connections do not hold a thread.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    if not await DisasterEvent.objects.filter(pk=pk).aexists():
+        return JsonResponse({'error': 'Disaster not found'}, status=404)
+
+    heartbeat = getattr(settings, 'ASSESSMENT_EVENT_HEARTBEAT_SECONDS', 15)
+
+    async def stream():
+        subscription = get_broker().subscribe(pk)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 
 # Gemini API endpoint for SMS generation
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent'
+GEMINI_TIMEOUT_SECONDS = 30
+
+
 @api_view(['POST'])
 def generate_sms(request):
     """
@@ -252,7 +932,7 @@ def generate_sms(request):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         # Call Gemini API
-        url = f'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={api_key}'
+        url = f"{getattr(settings, 'GEMINI_API_URL', GEMINI_API_URL)}?key={api_key}"
         
         payload = {
             'contents': [{
@@ -266,7 +946,7 @@ def generate_sms(request):
             'Content-Type': 'application/json'
         }
         
-        response = requests.post(url, json=payload, headers=headers)
+        response = requests.post(url, json=payload, headers=headers, timeout=GEMINI_TIMEOUT_SECONDS)
         
         if response.status_code == 200:
             result = response.json()
@@ -0,0 +1,81 @@
+/*
+ * Decodes the columnar map feed (/api/households/geojson/?format=columnar, see api/columnar.py).
+ *
+ * As a Web Worker it fetches the feed itself, so downloading, JSON parsing and base64
+ * decoding of large payloads never block the dashboard; the decoded typed arrays are
+ * transferred back without copying. Loaded with a <script> tag instead, it defines
+ * decodeHouseholdFeed() for browsers without workers.
+ */
+
+const FEED_COLUMN_TYPES = {
+    'uint8': Uint8Array, 'int8': Int8Array, 'uint16': Uint16Array, 'int16': Int16Array,
+    'uint32': Uint32Array, 'int32': Int32Array, 'float32': Float32Array, 'float64': Float64Array
+};
+
+// One column as a typed array (base64 columns are little-endian)
+function decodeFeedColumn(column, encoding) {
+    const ArrayType = FEED_COLUMN_TYPES[column.dtype];
+    if (encoding === 'json') return ArrayType.from(column.data);
+    const binary = atob(column.data);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+    return new ArrayType(bytes.buffer);
+}
+
+/*
+ * The columns HouseholdStore works with: degrees, Web Mercator x/y in 0..1 (so the
+ * map layer projects with two multiplications), ECT in pesos and depth in metres (NaN
+ * when unknown). Status and barangay stay indexes into statusValues / barangayValues.
+ */
+function decodeHouseholdFeed(feed) {
+    const count = feed.count;
+    const raw = {};
+    Object.entries(feed.columns).forEach(([name, column]) => {
+        raw[name] = decodeFeedColumn(column, feed.encoding);
+    });
+
+    const ids = new Float64Array(count);
+    const lat = new Float64Array(count);
+    const lon = new Float64Array(count);
+    const x = new Float64Array(count);
+    const y = new Float64Array(count);
+    const ect = new Float64Array(count);
+    const depth = new Float32Array(count);
+    const scale = feed.coordinate_scale;
+    for (let i = 0; i < count; i++) {
+        ids[i] = raw.id[i];
+        lat[i] = raw.lat[i] / scale;
+        lon[i] = raw.lon[i] / scale;
+        x[i] = (lon[i] + 180) / 360;
+        const sin = Math.sin(lat[i] * Math.PI / 180);
+        y[i] = 0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI);
+        ect[i] = raw.ect_centavos[i] / 100;
+        depth[i] = raw.flood_depth_cm[i] < 0 ? NaN : raw.flood_depth_cm[i] / 100;
+    }
+    return {
+        count, cursor: feed.cursor, statusValues: feed.status_values, barangayValues: feed.barangay_values,
+        ids, lat, lon, x, y, ect, depth,
+        status: Uint8Array.from(raw.status),
+        barangay: Uint32Array.from(raw.barangay)
+    };
+}
+
+if (typeof WorkerGlobalScope !== 'undefined' && self instanceof WorkerGlobalScope) {
+    self.onmessage = event => {
+        const started = performance.now();
+        fetch(event.data.url)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(feed => {
+                const fetched = performance.now();
+                const columns = decodeHouseholdFeed(feed);
+                columns.timings = { fetchMs: fetched - started, decodeMs: performance.now() - fetched };
+                const buffers = ['ids', 'lat', 'lon', 'x', 'y', 'ect', 'depth', 'status', 'barangay']
+                    .map(name => columns[name].buffer);
+                self.postMessage({ columns }, buffers);
+            })
+            .catch(error => self.postMessage({ error: String(error) }));
+    };
+}
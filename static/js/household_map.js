@@ -0,0 +1,481 @@
+/*
+ * Dashboard map and household list for large disasters (templates/index.html,
+ * templates/map_benchmark.html). Needs Leaflet and static/js/feed_worker.js.
+ *
+ * - HouseholdStore: the disaster's households as typed-array columns with an
+ *   id -> row lookup; change-feed and live-event updates patch rows in place.
+ * - HouseholdCanvasLayer: every marker on one canvas. A redraw projects with the
+ *   precomputed Web Mercator columns, skips rows outside the viewport and, when
+ *   markers are small, skips markers landing on a cell already painted in their colour.
+ * - VirtualList: keeps only the list rows in (or near) view in the DOM.
+ * - loadHouseholdFeed(): downloads and decodes the columnar feed in a Web Worker.
+ */
+
+const STATUS_COLORS = { 'TOTAL': '#dc3545', 'PARTIAL': '#fd7e14', 'NONE': '#28a745' };
+// Drawn in this order, so the most damaged households end up on top
+const STATUS_DRAW_ORDER = ['NONE', 'PARTIAL', 'TOTAL'];
+const FALLBACK_COLOR = '#66B2FF';
+
+function escapeHtml(value) {
+    return String(value).replace(/[&<>"']/g, c => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[c]);
+}
+
+function mercatorX(lon) {
+    return (lon + 180) / 360;
+}
+
+function mercatorY(lat) {
+    const sin = Math.sin(lat * Math.PI / 180);
+    return 0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI);
+}
+
+
+// --- STORE ---
+
+const STORE_COLUMNS = {
+    ids: Float64Array, lat: Float64Array, lon: Float64Array, x: Float64Array, y: Float64Array,
+    ect: Float64Array, depth: Float32Array, status: Uint8Array, barangay: Uint32Array
+};
+
+class HouseholdStore {
+    constructor(columns) {
+        this.count = columns.count;
+        this.capacity = columns.count;
+        Object.keys(STORE_COLUMNS).forEach(name => { this[name] = columns[name]; });
+        this.statusValues = columns.statusValues.slice();
+        this.barangayValues = columns.barangayValues.slice();
+        this.barangayIndex = new Map(this.barangayValues.map((name, i) => [name, i]));
+        this.indexById = new Map();
+        for (let i = 0; i < this.count; i++) this.indexById.set(this.ids[i], i);
+    }
+
+    indexOf(id) {
+        const index = this.indexById.get(id);
+        return index === undefined ? -1 : index;
+    }
+
+    statusCode(damageStatus) {
+        let code = this.statusValues.indexOf(damageStatus);
+        if (code < 0) code = this.statusValues.push(damageStatus) - 1;
+        return code;
+    }
+
+    barangayCode(name) {
+        let code = this.barangayIndex.get(name);
+        if (code === undefined) {
+            code = this.barangayValues.push(name) - 1;
+            this.barangayIndex.set(name, code);
+        }
+        return code;
+    }
+
+    _grow() {
+        this.capacity = Math.max(16, this.capacity * 2);
+        Object.entries(STORE_COLUMNS).forEach(([name, ArrayType]) => {
+            const grown = new ArrayType(this.capacity);
+            grown.set(this[name].subarray(0, this.count));
+            this[name] = grown;
+        });
+    }
+
+    // Adds or updates a household from a GeoJSON feature of the change feed; returns its row
+    upsertFeature(feature) {
+        const props = feature.properties;
+        const [lon, lat] = feature.geometry.coordinates;
+        let i = this.indexOf(props.id);
+        if (i < 0) {
+            if (this.count === this.capacity) this._grow();
+            i = this.count++;
+            this.ids[i] = props.id;
+            this.indexById.set(props.id, i);
+        }
+        this.lat[i] = lat;
+        this.lon[i] = lon;
+        this.x[i] = mercatorX(lon);
+        this.y[i] = mercatorY(lat);
+        this.barangay[i] = this.barangayCode(props.barangay);
+        this.setAssessment(i, props.damage_status, props.ect_amount, props.flood_depth_meters);
+        return i;
+    }
+
+    setAssessment(i, damageStatus, ectAmount, floodDepth) {
+        this.status[i] = this.statusCode(damageStatus);
+        this.ect[i] = Number(ectAmount);
+        this.depth[i] = floodDepth === null || floodDepth === undefined ? NaN : Number(floodDepth);
+    }
+
+    // Removes a household by moving the last row into its place
+    remove(id) {
+        const i = this.indexOf(id);
+        if (i < 0) return;
+        const last = --this.count;
+        if (i !== last) {
+            Object.keys(STORE_COLUMNS).forEach(name => { this[name][i] = this[name][last]; });
+            this.indexById.set(this.ids[i], i);
+        }
+        this.indexById.delete(id);
+    }
+
+    props(i) {
+        const depth = this.depth[i];
+        return {
+            id: this.ids[i],
+            barangay: this.barangayValues[this.barangay[i]],
+            damage_status: this.statusValues[this.status[i]],
+            ect_amount: this.ect[i],
+            flood_depth_meters: Number.isNaN(depth) ? null : depth
+        };
+    }
+
+    summary() {
+        const none = this.statusValues.indexOf('NONE');
+        let damaged = 0;
+        let ect = 0;
+        for (let i = 0; i < this.count; i++) {
+            if (this.status[i] !== none) damaged++;
+            ect += this.ect[i];
+        }
+        return { households: this.count, damaged, ect };
+    }
+
+    bounds() {
+        if (!this.count) return null;
+        let south = Infinity, west = Infinity, north = -Infinity, east = -Infinity;
+        for (let i = 0; i < this.count; i++) {
+            if (this.lat[i] < south) south = this.lat[i];
+            if (this.lat[i] > north) north = this.lat[i];
+            if (this.lon[i] < west) west = this.lon[i];
+            if (this.lon[i] > east) east = this.lon[i];
+        }
+        return L.latLngBounds([south, west], [north, east]);
+    }
+}
+
+
+// --- CANVAS LAYER ---
+
+function markerRadius(zoom) {
+    return zoom >= 16 ? 8 : zoom >= 14 ? 6 : zoom >= 12 ? 4 : 2.5;
+}
+
+const HouseholdCanvasLayer = L.Layer.extend({
+    options: {
+        pane: 'overlayPane',
+        onClick: null,  // function (row index)
+        label: null     // function (row index) -> tooltip text
+    },
+
+    initialize(options) {
+        L.setOptions(this, options);
+        this._store = null;
+        this._selectedId = null;
+        this._frame = null;
+        this.stats = { drawMs: 0, drawn: 0, visible: 0 };
+    },
+
+    setStore(store) {
+        this._store = store;
+        this.redraw();
+        return this;
+    },
+
+    setSelected(id) {
+        this._selectedId = id;
+        this.redraw();
+    },
+
+    onAdd(map) {
+        this._canvas = L.DomUtil.create('canvas', 'household-canvas leaflet-zoom-animated');
+        this.getPane().appendChild(this._canvas);
+        this._tooltip = L.tooltip({ direction: 'top', offset: [0, -6] });
+        map.on('moveend resize', this._reset, this);
+        map.on('click', this._onClick, this);
+        map.on('mousemove', this._onMouseMove, this);
+        if (map._zoomAnimated) map.on('zoomanim', this._animateZoom, this);
+        this._reset();
+    },
+
+    onRemove(map) {
+        map.off('moveend resize', this._reset, this);
+        map.off('click', this._onClick, this);
+        map.off('mousemove', this._onMouseMove, this);
+        map.off('zoomanim', this._animateZoom, this);
+        map.closeTooltip(this._tooltip);
+        L.DomUtil.remove(this._canvas);
+        if (this._frame) L.Util.cancelAnimFrame(this._frame);
+        this._frame = null;
+    },
+
+    // Coalesces redraw requests into one per animation frame
+    redraw() {
+        if (this._map && !this._frame) {
+            this._frame = L.Util.requestAnimFrame(() => {
+                this._frame = null;
+                this.draw();
+            });
+        }
+    },
+
+    _reset() {
+        const size = this._map.getSize();
+        const ratio = window.devicePixelRatio || 1;
+        this._canvas.width = size.x * ratio;
+        this._canvas.height = size.y * ratio;
+        this._canvas.style.width = `${size.x}px`;
+        this._canvas.style.height = `${size.y}px`;
+        L.DomUtil.setPosition(this._canvas, this._map.containerPointToLayerPoint([0, 0]));
+        this.draw();
+    },
+
+    _animateZoom(event) {
+        const scale = this._map.getZoomScale(event.zoom);
+        const offset = this._map._latLngBoundsToNewLayerBounds(this._map.getBounds(), event.zoom, event.center).min;
+        L.DomUtil.setTransform(this._canvas, offset, scale);
+    },
+
+    // What draw() and hitTest() need to turn the x/y columns into container pixels
+    _viewport() {
+        const map = this._map;
+        return {
+            size: map.getSize(),
+            worldSize: 256 * Math.pow(2, map.getZoom()),
+            origin: map.getPixelBounds().min,
+            radius: markerRadius(map.getZoom())
+        };
+    },
+
+    draw() {
+        if (!this._map) return;
+        const started = performance.now();
+        const ratio = window.devicePixelRatio || 1;
+        const ctx = this._canvas.getContext('2d');
+        ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+        const { size, worldSize, origin, radius } = this._viewport();
+        ctx.clearRect(0, 0, size.x, size.y);
+        const store = this._store;
+        if (!store) return;
+
+        // One path and one occupancy grid per status: a marker whose cell already has
+        // a marker of the same colour would not change the picture
+        const statusCount = store.statusValues.length;
+        const paths = [];
+        const cell = Math.max(1, Math.ceil(radius));
+        const columns = Math.ceil(size.x / cell) + 1;
+        const rows = Math.ceil(size.y / cell) + 1;
+        const occupied = [];
+        for (let s = 0; s < statusCount; s++) {
+            paths.push(new Path2D());
+            occupied.push(new Uint8Array(columns * rows));
+        }
+
+        const { x, y, status } = store;
+        let visible = 0;
+        let drawn = 0;
+        for (let i = 0; i < store.count; i++) {
+            const px = x[i] * worldSize - origin.x;
+            const py = y[i] * worldSize - origin.y;
+            if (px < -radius || py < -radius || px > size.x + radius || py > size.y + radius) continue;
+            visible++;
+            const s = status[i];
+            const slot = Math.floor((py + radius) / cell) * columns + Math.floor((px + radius) / cell);
+            if (slot >= 0 && slot < occupied[s].length) {
+                if (occupied[s][slot]) continue;
+                occupied[s][slot] = 1;
+            }
+            paths[s].moveTo(px + radius, py);
+            paths[s].arc(px, py, radius, 0, 2 * Math.PI);
+            drawn++;
+        }
+
+        const order = STATUS_DRAW_ORDER.map(name => store.statusValues.indexOf(name)).filter(s => s >= 0);
+        for (let s = 0; s < statusCount; s++) if (!order.includes(s)) order.unshift(s);
+        ctx.globalAlpha = 0.75;
+        ctx.lineWidth = radius >= 6 ? 2 : 1;
+        ctx.strokeStyle = '#333';
+        order.forEach(s => {
+            ctx.fillStyle = STATUS_COLORS[store.statusValues[s]] || FALLBACK_COLOR;
+            ctx.fill(paths[s]);
+            if (radius >= 4) ctx.stroke(paths[s]);
+        });
+        ctx.globalAlpha = 1;
+
+        const selected = this._selectedId === null ? -1 : store.indexOf(this._selectedId);
+        if (selected >= 0) {
+            ctx.beginPath();
+            ctx.arc(x[selected] * worldSize - origin.x, y[selected] * worldSize - origin.y, radius + 4, 0, 2 * Math.PI);
+            ctx.lineWidth = 3;
+            ctx.strokeStyle = '#4682B4';
+            ctx.stroke();
+        }
+        this.stats = { drawMs: performance.now() - started, drawn, visible };
+    },
+
+    // Row of the marker under a container point, or -1 (topmost wins, as drawn)
+    hitTest(point) {
+        const store = this._store;
+        if (!store) return -1;
+        const { worldSize, origin, radius } = this._viewport();
+        const reach = (radius + 3) * (radius + 3);
+        const priority = STATUS_DRAW_ORDER.map(name => store.statusValues.indexOf(name));
+        let best = -1;
+        let bestRank = -1;
+        let bestDistance = Infinity;
+        for (let i = 0; i < store.count; i++) {
+            const dx = store.x[i] * worldSize - origin.x - point.x;
+            const dy = store.y[i] * worldSize - origin.y - point.y;
+            const distance = dx * dx + dy * dy;
+            if (distance > reach) continue;
+            const rank = priority.indexOf(store.status[i]);
+            if (rank > bestRank || (rank === bestRank && distance < bestDistance)) {
+                best = i;
+                bestRank = rank;
+                bestDistance = distance;
+            }
+        }
+        return best;
+    },
+
+    _onClick(event) {
+        const i = this.hitTest(event.containerPoint);
+        if (i >= 0 && this.options.onClick) this.options.onClick(i);
+    },
+
+    _onMouseMove(event) {
+        this._hoverPoint = event.containerPoint;
+        if (this._hoverFrame) return;
+        this._hoverFrame = L.Util.requestAnimFrame(() => {
+            this._hoverFrame = null;
+            const i = this.hitTest(this._hoverPoint);
+            this._map.getContainer().style.cursor = i >= 0 ? 'pointer' : '';
+            if (i >= 0 && this.options.label) {
+                this._tooltip.setLatLng([this._store.lat[i], this._store.lon[i]]).setContent(this.options.label(i));
+                if (!this._map.hasLayer(this._tooltip)) this._map.openTooltip(this._tooltip);
+            } else {
+                this._map.closeTooltip(this._tooltip);
+            }
+        });
+    }
+});
+
+
+// --- VIRTUAL LIST ---
+
+class VirtualList {
+    /*
+     * options: rowHeight (px, fixed), renderRow(element, index), onClick(index), overscan (rows)
+     * The container scrolls; rows are absolutely positioned over a spacer of full height,
+     * so their CSS must give them a height that fits rowHeight.
+     */
+    constructor(container, options) {
+        this.container = container;
+        this.options = Object.assign({ overscan: 4 }, options);
+        this.count = 0;
+        this.rows = [];
+        this.frame = null;
+        this.stats = { renderMs: 0, rendered: 0 };
+
+        container.innerHTML = '';
+        container.style.position = 'relative';
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'virtual-list-spacer';
+        container.appendChild(this.spacer);
+
+        container.addEventListener('scroll', () => this.refresh());
+        container.addEventListener('click', event => {
+            const row = event.target.closest('[data-index]');
+            if (row && this.options.onClick) this.options.onClick(Number(row.dataset.index));
+        });
+    }
+
+    setCount(count) {
+        this.count = count;
+        this.spacer.style.height = `${count * this.options.rowHeight}px`;
+        this.refresh();
+    }
+
+    // Re-renders the visible rows on the next frame (after scrolling or data changes)
+    refresh() {
+        if (this.frame) return;
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.render();
+        });
+    }
+
+    scrollToIndex(index) {
+        const { rowHeight } = this.options;
+        const top = index * rowHeight;
+        if (top < this.container.scrollTop || top + rowHeight > this.container.scrollTop + this.container.clientHeight) {
+            this.container.scrollTop = top - (this.container.clientHeight - rowHeight) / 2;
+        }
+        this.refresh();
+    }
+
+    render() {
+        const started = performance.now();
+        const { rowHeight, overscan } = this.options;
+        const first = Math.max(0, Math.floor(this.container.scrollTop / rowHeight) - overscan);
+        const last = Math.min(this.count, Math.ceil((this.container.scrollTop + this.container.clientHeight) / rowHeight) + overscan);
+        const needed = Math.max(0, last - first);
+
+        while (this.rows.length < needed) {
+            const row = document.createElement('div');
+            row.style.position = 'absolute';
+            this.container.appendChild(row);
+            this.rows.push(row);
+        }
+        this.rows.forEach((row, k) => {
+            if (k >= needed) {
+                row.style.display = 'none';
+                delete row.dataset.index;
+                return;
+            }
+            const index = first + k;
+            row.style.display = '';
+            row.style.top = `${index * rowHeight}px`;
+            row.dataset.index = index;
+            this.options.renderRow(row, index);
+        });
+        this.stats = { renderMs: performance.now() - started, rendered: needed };
+    }
+}
+
+
+// --- LOADING ---
+
+/*
+ * Fetches and decodes the columnar feed at `url`; resolves with HouseholdStore columns
+ * (plus timings). Runs in a Web Worker from workerUrl where available.
+ */
+function loadHouseholdFeed(url, workerUrl) {
+    const absoluteUrl = new URL(url, window.location.href).href;
+    if (!window.Worker) {
+        const started = performance.now();
+        return fetch(absoluteUrl)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(feed => {
+                const fetched = performance.now();
+                const columns = decodeHouseholdFeed(feed);
+                columns.timings = { fetchMs: fetched - started, decodeMs: performance.now() - fetched };
+                return columns;
+            });
+    }
+    return new Promise((resolve, reject) => {
+        const worker = new Worker(workerUrl);
+        worker.onmessage = event => {
+            worker.terminate();
+            if (event.data.error) reject(new Error(event.data.error));
+            else resolve(event.data.columns);
+        };
+        worker.onerror = event => {
+            worker.terminate();
+            reject(new Error(event.message));
+        };
+        worker.postMessage({ url: absoluteUrl });
+    });
+}